@@ -1,96 +1,427 @@
 # agent.py - Core agent logic
 import json
-import re
-from typing import Dict, Callable, Any
+from typing import Dict, Callable, Any, Iterable, Iterator, List, Optional, Tuple
 import os
-import toml
+import time
+from concurrent.futures import Future, ThreadPoolExecutor, TimeoutError as FutureTimeoutError
 from deepseek import ChatModel
-import toml
+from llm_cache import CachedChatModel, ResponseCache
+from context_window import ConversationWindow
+from tool_registry import ToolRegistry
+from tool_cache import ToolCache
+from tool_results import READ_RESULT_TOOL, ResultShaper
+from tool_stream import TOOL_CALL_PATTERN, ToolBlockParser
+from tool_manifest import build_manifest
+from router import IntentRouter
+from metrics import REGISTRY, MetricsRegistry, TurnTrace
+from settings import deepseek_api_key
 
-config = toml.load('config.toml')
-DEEPSEEK_API = config['secrets']['DEEPSEEK_API']
+
+def __getattr__(name):
+    # DEEPSEEK_API is read from config.toml on first access, not at import time
+    if name == "DEEPSEEK_API":
+        return deepseek_api_key()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+# Read-only or idempotent tools that may start before the completion finishes;
+# a running call cannot be cancelled, so anything with side effects waits for the full response
+SPECULATIVE_TOOLS = frozenset({
+    "calculator", "calculate_many", "read_file", "search_files", "web_search", READ_RESULT_TOOL
+})
 
 
 class Agent:
-    def __init__(self, tools: Dict[str, Callable],api_key=DEEPSEEK_API):
-        self.tools = tools
+    def __init__(self, tools: Dict[str, Callable],api_key=None,
+                 temperature: float = 0.7, max_tokens: int = 512,
+                 cache: Optional[ResponseCache] = None,
+                 context_window: Optional[ConversationWindow] = None,
+                 manifest_style: str = "compact",
+                 max_tool_workers: int = 4, tool_timeout: float = 30.0,
+                 tool_timeouts: Optional[Dict[str, float]] = None,
+                 router: Optional[IntentRouter] = None,
+                 chat_model: Optional[ChatModel] = None,
+                 metrics: Optional[MetricsRegistry] = REGISTRY,
+                 tool_executor: Optional[ThreadPoolExecutor] = None,
+                 tool_cache: Optional[ToolCache] = None,
+                 result_shaper: Optional[ResultShaper] = None,
+                 speculate: bool = True,
+                 speculative_tools: Optional[Iterable[str]] = None):
+        self.tools = ToolRegistry(tools)
+        # Deterministic tools are answered from here; the cache may be shared across sessions
+        self.tool_cache = tool_cache
+        # Caps what each tool result adds to the history; full results stay addressable by handle
+        self.result_shaper = result_shaper or ResultShaper()
+        if READ_RESULT_TOOL not in self.tools:
+            self.tools[READ_RESULT_TOOL] = self.result_shaper.read
+        # Every finished turn's trace is recorded in the registry and passed to the hooks
+        self.metrics = metrics
+        self.turn_hooks: List[Callable[[TurnTrace], None]] = []
+        # Answers tool-shaped inputs locally, without an LLM round trip
+        self.router = router
+        # Default per-call timeout, with per-tool overrides for slow tools
+        self.tool_timeout = tool_timeout
+        self.tool_timeouts = tool_timeouts or {}
+        # Start tools as soon as their block closes in a streamed completion
+        self.speculate = speculate
+        self.speculative_tools = frozenset(SPECULATIVE_TOOLS if speculative_tools is None else speculative_tools)
+        # Servers hosting many sessions pass one shared pool instead of a pool per agent
+        self._owns_tool_executor = tool_executor is None
+        self._tool_executor = tool_executor or ThreadPoolExecutor(max_workers=max_tool_workers, thread_name_prefix="tool")
+        self.manifest_style = manifest_style
+        # System prompt memoized against the registry version
+        self._system_message = None
+        self._system_message_key = None
         self.conversation_history = []
+        # Bounds the payload sent each turn; the full history is kept locally
+        self.context_window = context_window or ConversationWindow()
+        if api_key is None and chat_model is None:
+            api_key = deepseek_api_key()
         self.api_key = api_key
+        self.temperature = temperature
+        self.max_tokens = max_tokens
 
-        self.deepseek_model = ChatModel(
+        # Sessions may share one pooled client instead of opening their own
+        self.deepseek_model = chat_model or ChatModel(
                     api_key=api_key,  
                     model="deepseek-chat",             
                 )
         
+        # Serve repeated deterministic requests from the response cache
+        if cache is not None:
+            self.deepseek_model = CachedChatModel(self.deepseek_model, cache)
+        
+        
+    def get_state(self) -> Dict[str, Any]:
+        """
+        Snapshot the per-session conversation state as JSON-serialisable data.
         
+        Returns:
+            The full history plus the context window's rolling summary
+        """
+        return {
+            "conversation_history": list(self.conversation_history),
+            "summary_lines": list(self.context_window.summary_lines),
+            "folded": self.context_window.folded
+        }
+    
+    def load_state(self, state: Dict[str, Any]) -> None:
+        """Restore conversation state previously returned by get_state()"""
+        self.conversation_history = list(state.get("conversation_history", []))
+        self.context_window.summary_lines = list(state.get("summary_lines", []))
+        self.context_window.folded = state.get("folded", 0)
+    
+    def close(self) -> None:
+        """Release the tool pool if this agent created it"""
+        if self._owns_tool_executor:
+            self._tool_executor.shutdown(wait=False)
+    
+    def add_turn_hook(self, hook: Callable[[TurnTrace], None]) -> None:
+        """Call hook with the TurnTrace of every finished turn"""
+        self.turn_hooks.append(hook)
+    
     def process(self, user_input: str) -> str:
+        trace = TurnTrace(user_input)
+        with trace.span("turn"):
+            response = self._process(user_input, trace)
+        self._finish_trace(trace)
+        return response
+    
+    def _process(self, user_input: str, trace: TurnTrace) -> str:
         # Add user input to conversation history
         self.conversation_history.append({"role": "user", "content": user_input})
-         
-        # Create system message with tool descriptions
-        system_message = self._create_system_message()
         
-        # Generate response from LLM
-        messages = [system_message] + self.conversation_history
+        routed_response = self._route(user_input, trace)
+        if routed_response is not None:
+            self.conversation_history.append({"role": "assistant", "content": routed_response})
+            return routed_response
+        
+        with trace.span("prompt"):
+            # Create system message with tool descriptions
+            system_message = self._create_system_message()
+            
+            # Generate response from LLM within the token budget
+            messages = self.context_window.build(system_message, self.conversation_history)
         
         try:
             # Call DeepSeek API to get the response
-            completion = self.deepseek_model.chat(
-                messages=messages,
-                temperature=0.7,  # You can tweak these parameters as needed
-                max_tokens=512
-            )
-
+            with trace.span("llm"):
+                completion = self.deepseek_model.chat(
+                    messages=messages,
+                    temperature=self.temperature,
+                    max_tokens=self.max_tokens,
+                    trace=trace
+                )
+            self._record_usage(trace, completion)
             
             # Extract the assistant's response
             assistant_response = completion['choices'][0]['message']['content']
             
-            # Check if the response contains a tool call
-            tool_call_match = re.search(r'```tool\s+(.*?)\s+(.*?)```', assistant_response, re.DOTALL)
-            
-            if tool_call_match:
-                # Extract tool name and parameters
-                tool_name = tool_call_match.group(1).strip()
-                tool_params_str = tool_call_match.group(2).strip()
-                
-                # Execute the tool
-                tool_result = self._execute_tool(tool_name, tool_params_str)
-                
-                # Replace the tool call with the result
-                clean_response = assistant_response.replace(tool_call_match.group(0), f"I used {tool_name} and got: {tool_result}")
-            else:
-                clean_response = assistant_response
-                
-            # Add assistant response to conversation history
-            self.conversation_history.append({"role": "assistant", "content": clean_response})
+            clean_response, _ = self._finish_turn(assistant_response, trace)
             
             return clean_response
             
         except Exception as e:
             error_message = f"Error processing request: {str(e)}"
+            trace.set("error", str(e))
             self.conversation_history.append({"role": "assistant", "content": error_message})
             return error_message
     
-    def _create_system_message(self) -> dict:
-        tools_description = ""
-        for tool_name, tool_func in self.tools.items():
-            tools_description += f"- {tool_name}: {tool_func.__doc__ or 'No description available'}\n"
+    def process_stream(self, user_input: str) -> Iterator[str]:
+        """
+        Streaming variant of process() that yields text deltas as they arrive.
+        
+        The completion is streamed as the model writes it; if it contains a tool
+        call, the tool result is yielded once the stream ends. The cleaned
+        response lands in conversation_history exactly as process() records it.
         
-        system_content = f"""
-        You are SmolaGent, a helpful AI assistant with access to tools.
+        Args:
+            user_input: The user's message
+            
+        Yields:
+            Text deltas of the assistant's reply
+        """
+        trace = TurnTrace(user_input)
+        started = time.perf_counter()
+        try:
+            yield from self._process_stream(user_input, trace)
+        finally:
+            trace.add_span("turn", time.perf_counter() - started)
+            self._finish_trace(trace)
+    
+    def _process_stream(self, user_input: str, trace: TurnTrace) -> Iterator[str]:
+        self.conversation_history.append({"role": "user", "content": user_input})
+        
+        routed_response = self._route(user_input, trace)
+        if routed_response is not None:
+            self.conversation_history.append({"role": "assistant", "content": routed_response})
+            yield routed_response
+            return
         
-        Available tools:
-        {tools_description}
+        with trace.span("prompt"):
+            messages = self.context_window.build(self._create_system_message(), self.conversation_history)
+        
+        parser = ToolBlockParser()
+        speculative = {}
+        try:
+            started = time.perf_counter()
+            for delta in self.deepseek_model.chat_stream(
+                messages=messages,
+                temperature=self.temperature,
+                max_tokens=self.max_tokens,
+                trace=trace
+            ):
+                if not parser.text:
+                    trace.add_span("llm.first_token", time.perf_counter() - started)
+                for match in parser.feed(delta):
+                    self._speculate(match, speculative, trace)
+                yield delta
+            trace.add_span("llm", time.perf_counter() - started)
+            
+            _, tool_notes = self._finish_turn(parser.text, trace, speculative)
+            
+            # The raw tool blocks were already streamed; follow them with the results
+            if tool_notes:
+                yield "\n" + "\n".join(tool_notes)
         
-        When you need to use a tool, use the following format:
-        ```tool tool_name
-        parameters in JSON format
-        ```
+        except Exception as e:
+            for future, _ in speculative.values():
+                future.cancel()
+            error_message = f"Error processing request: {str(e)}"
+            trace.set("error", str(e))
+            self.conversation_history.append({"role": "assistant", "content": error_message})
+            yield error_message
+    
+    def _speculate(self, match, speculative: Dict[Tuple[int, str, str], Tuple[Future, float]],
+                   trace: Optional[TurnTrace] = None) -> None:
+        """Start a tool whose block just closed in the stream, if it is safe to start early and its call is valid"""
+        if not self.speculate:
+            return
+        tool_name, params_str = match.group(1).strip(), match.group(2).strip()
+        if tool_name not in self.speculative_tools or tool_name not in self.tools:
+            return
+        try:
+            json.loads(params_str)
+        except json.JSONDecodeError:
+            return
+        speculative[(match.start(), tool_name, params_str)] = self._submit_tool(tool_name, params_str, trace)
+        if trace is not None:
+            trace.set("speculative_tool_calls", len(speculative))
+    
+    @staticmethod
+    def _record_usage(trace: TurnTrace, completion: Dict[str, Any]) -> None:
+        usage = completion.get("usage") or {}
+        for key in ("prompt_tokens", "completion_tokens", "total_tokens"):
+            if key in usage:
+                trace.set(key, usage[key])
+    
+    def _finish_trace(self, trace: TurnTrace) -> None:
+        if self.metrics is not None:
+            self.metrics.record_turn(trace)
+        for hook in self.turn_hooks:
+            hook(trace)
+    
+    def _route(self, user_input: str, trace: Optional[TurnTrace] = None) -> Optional[str]:
+        """
+        Try to answer the input with a direct tool call.
         
-        Always respond in a helpful, safe, and ethical manner.
+        Returns:
+            The assistant response, or None when no route is confident enough
+            (or the routed tool failed) and the LLM should handle the input
         """
+        if self.router is None:
+            return None
         
-        return {"role": "system", "content": system_content.strip()}
+        started = time.perf_counter()
+        routed = self.router.route(user_input, self.tools)
+        if trace is not None:
+            trace.add_span("route", time.perf_counter() - started)
+        if routed is None:
+            return None
+        
+        route, params = routed
+        started = time.perf_counter()
+        tool_result = self._call_tool(route.tool_name, params)
+        if trace is not None:
+            trace.add_span(f"tool:{route.tool_name}", time.perf_counter() - started)
+        if route.fallback_on_error and isinstance(tool_result, str) and tool_result.startswith("Error"):
+            return None
+        
+        if trace is not None:
+            trace.set("routed", route.tool_name)
+        return f"I used {route.tool_name} and got: {self.result_shaper.shape(route.tool_name, tool_result)}"
+    
+    def _finish_turn(self, assistant_response: str, trace: Optional[TurnTrace] = None,
+                     speculative: Optional[Dict[Tuple[int, str, str], Tuple[Future, float]]] = None) -> Tuple[str, List[str]]:
+        """
+        Run every tool call in the response and record the cleaned reply in history.
+        
+        Args:
+            assistant_response: The complete model output
+            speculative: Calls already started while the response was streamed,
+                         keyed by (block offset, tool name, parameters)
+        
+        Returns:
+            The cleaned response and the tool notes that replaced each tool block
+        """
+        started = time.perf_counter()
+        tool_calls = list(TOOL_CALL_PATTERN.finditer(assistant_response))
+        if trace is not None:
+            trace.add_span("tool_parse", time.perf_counter() - started)
+            trace.set("tool_calls", len(tool_calls))
+        tool_notes = []
+        
+        if tool_calls:
+            calls = [(match.group(1).strip(), match.group(2).strip()) for match in tool_calls]
+            
+            # Reuse calls started during streaming; anything else starts now
+            speculative = dict(speculative or {})
+            submitted = [
+                speculative.pop((match.start(), tool_name, params_str), None)
+                for match, (tool_name, params_str) in zip(tool_calls, calls)
+            ]
+            
+            # Execute all calls concurrently, then splice results back in order
+            results = self._execute_tools(calls, trace, submitted)
+            
+            pieces = []
+            position = 0
+            for match, (tool_name, tool_result) in zip(tool_calls, results):
+                tool_note = f"I used {tool_name} and got: {self.result_shaper.shape(tool_name, tool_result)}"
+                tool_notes.append(tool_note)
+                pieces.append(assistant_response[position:match.start()])
+                pieces.append(tool_note)
+                position = match.end()
+            pieces.append(assistant_response[position:])
+            clean_response = "".join(pieces)
+        else:
+            clean_response = assistant_response
+        
+        for future, _ in (speculative or {}).values():
+            # Started for a block the final parse did not confirm
+            future.cancel()
+            
+        # Add assistant response to conversation history
+        self.conversation_history.append({"role": "assistant", "content": clean_response})
+        
+        return clean_response, tool_notes
+    
+    def _submit_tool(self, tool_name: str, params_str: str, trace: Optional[TurnTrace] = None) -> Tuple[Future, float]:
+        """Start one tool call on the tool pool; returns the future and its submission time"""
+        # Tool names come from model output; only registered ones get their own metric label
+        phase = f"tool:{tool_name}" if tool_name in self.tools else "tool:unknown"
+        
+        def timed_call():
+            call_started = time.perf_counter()
+            try:
+                return self._execute_tool(tool_name, params_str)
+            finally:
+                if trace is not None:
+                    trace.add_span(phase, time.perf_counter() - call_started)
+        
+        return self._tool_executor.submit(timed_call), time.monotonic()
+    
+    def _execute_tools(self, calls: List[Tuple[str, str]], trace: Optional[TurnTrace] = None,
+                       submitted: Optional[List[Optional[Tuple[Future, float]]]] = None) -> List[Tuple[str, Any]]:
+        """
+        Execute independent tool calls in parallel on the bounded tool pool.
+        
+        Args:
+            calls: (tool_name, params_str) pairs in the order they appeared
+            submitted: Per call, a (future, submission time) pair if it is already
+                       running, or None to start it now
+            
+        Returns:
+            (tool_name, result) pairs in the same order; a call that exceeds
+            its timeout or raises yields an error string instead of its result
+        """
+        submitted = submitted or [None] * len(calls)
+        running = [
+            existing or self._submit_tool(tool_name, params_str, trace)
+            for (tool_name, params_str), existing in zip(calls, submitted)
+        ]
+        
+        results = []
+        for (tool_name, _), (future, started) in zip(calls, running):
+            # Every call's deadline counts from its submission, not from the previous result
+            timeout = self.tool_timeouts.get(tool_name, self.tool_timeout)
+            try:
+                result = future.result(timeout=max(0.0, started + timeout - time.monotonic()))
+            except FutureTimeoutError:
+                future.cancel()
+                result = f"Error: Tool '{tool_name}' timed out after {timeout}s"
+            except Exception as e:
+                # One failing call must not take the other results of the turn with it
+                result = f"Error executing tool '{tool_name}': {str(e)}"
+            results.append((tool_name, result))
+        return results
+    
+    def _create_system_message(self) -> dict:
+        # Rebuild only when tools were registered/removed or the style changed,
+        # keeping the prompt prefix byte-identical across turns
+        key = (id(self.tools), self.tools.version, self.manifest_style)
+        if self._system_message is not None and self._system_message_key == key:
+            return self._system_message
+        
+        tools_description = build_manifest(self.tools, self.manifest_style)
+        
+        system_content = (
+            "You are SmolaGent, a helpful AI assistant with access to tools.\n"
+            "\n"
+            "Available tools:\n"
+            f"{tools_description}\n"
+            "\n"
+            "When you need to use a tool, use the following format:\n"
+            "```tool tool_name\n"
+            "parameters in JSON format\n"
+            "```\n"
+            "\n"
+            "Always respond in a helpful, safe, and ethical manner."
+        )
+        
+        self._system_message = {"role": "system", "content": system_content}
+        self._system_message_key = key
+        return self._system_message
     
     def _execute_tool(self, tool_name: str, params_str: str) -> Any:
         if tool_name not in self.tools:
@@ -99,12 +430,29 @@ class Agent:
         try:
             # Parse parameters as JSON
             params = json.loads(params_str)
-            
+        except json.JSONDecodeError:
+            return f"Error: Invalid JSON parameters for tool '{tool_name}'"
+        
+        return self._call_tool(tool_name, params)
+    
+    def _call_tool(self, tool_name: str, params: Dict[str, Any]) -> Any:
+        if tool_name not in self.tools:
+            return f"Error: Tool '{tool_name}' not found"
+        if not isinstance(params, dict):
+            return f"Error executing tool '{tool_name}': parameters must be a JSON object"
+        
+        # Handles of truncated results stand in for the full values
+        params = self.result_shaper.resolve(tool_name, params)
+        
+        if self.tool_cache is not None and self.tool_cache.cacheable(tool_name):
+            return self.tool_cache.call(tool_name, params, self._invoke_tool)
+        return self._invoke_tool(tool_name, params)
+    
+    def _invoke_tool(self, tool_name: str, params: Dict[str, Any]) -> Any:
+        try:
             # Execute the tool with the parameters
             result = self.tools[tool_name](**params)
             
             return result
-        except json.JSONDecodeError:
-            return f"Error: Invalid JSON parameters for tool '{tool_name}'"
         except Exception as e:
             return f"Error executing tool '{tool_name}': {str(e)}"
\ No newline at end of file
@@ -0,0 +1,115 @@
+# batch.py - Headless batch runner for many isolated agent sessions
+import json
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Any, Callable, Dict, Iterator, List
+
+from metrics import latency_summary
+
+
+def read_sessions(input_path: str) -> Iterator[Dict[str, Any]]:
+    """
+    Read session scripts from JSONL.
+
+    Each line is either {"id": ..., "prompt": "..."} for a single turn or
+    {"id": ..., "turns": ["...", "..."]} for a multi-turn script. Lines without
+    an id are numbered by their position in the file.
+    """
+    with open(input_path, "r", encoding="utf-8") as f:
+        for line_number, line in enumerate(f, 1):
+            line = line.strip()
+            if not line:
+                continue
+            record = json.loads(line)
+            turns = record.get("turns")
+            if turns is None:
+                turns = [record["prompt"]]
+            yield {"id": record.get("id", line_number), "turns": turns}
+
+
+def run_session(agent, session: Dict[str, Any]) -> Dict[str, Any]:
+    """Run one session's turns in order on a fresh agent and time each turn"""
+    turns = []
+    errors = 0
+    started = time.perf_counter()
+    for user_input in session["turns"]:
+        turn_started = time.perf_counter()
+        response = agent.process(user_input)
+        latency_ms = (time.perf_counter() - turn_started) * 1000
+        if response.startswith("Error processing request"):
+            errors += 1
+        turns.append({"input": user_input, "response": response, "latency_ms": round(latency_ms, 3)})
+
+    return {
+        "id": session["id"],
+        "turns": turns,
+        "errors": errors,
+        "latency_ms": round((time.perf_counter() - started) * 1000, 3)
+    }
+
+
+def run_batch(input_path: str, output_path: str, agent_factory: Callable[[], Any],
+              concurrency: int = 8) -> Dict[str, Any]:
+    """
+    Run every session in the input file concurrently and stream results to JSONL.
+
+    Args:
+        input_path: JSONL file of session scripts (see read_sessions)
+        output_path: JSONL file receiving one result line per finished session
+        agent_factory: Returns a fresh Agent; every session gets its own, closed when the session ends
+        concurrency: Maximum number of sessions running at once
+
+    Returns:
+        Report with session/turn counts, throughput and turn latency percentiles
+    """
+    sessions = read_sessions(input_path)
+    turn_latencies: List[float] = []
+    completed_sessions = 0
+    failed_turns = 0
+
+    def job(session):
+        agent = agent_factory()
+        try:
+            return run_session(agent, session)
+        finally:
+            # Releases the agent's tool pool unless it was given a shared one
+            close = getattr(agent, "close", None)
+            if close is not None:
+                close()
+
+    started = time.perf_counter()
+    with open(output_path, "w", encoding="utf-8") as out, \
+            ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="session") as executor:
+        pending = set()
+        exhausted = False
+        while pending or not exhausted:
+            # Keep at most `concurrency` sessions in flight so huge inputs stay in flat memory
+            while not exhausted and len(pending) < concurrency:
+                session = next(sessions, None)
+                if session is None:
+                    exhausted = True
+                else:
+                    pending.add(executor.submit(job, session))
+            if not pending:
+                break
+
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                result = future.result()
+                out.write(json.dumps(result, ensure_ascii=False) + "\n")
+                out.flush()
+                completed_sessions += 1
+                failed_turns += result["errors"]
+                turn_latencies.extend(turn["latency_ms"] for turn in result["turns"])
+
+    elapsed = time.perf_counter() - started
+    return {
+        "sessions": completed_sessions,
+        "turns": len(turn_latencies),
+        "failed_turns": failed_turns,
+        "concurrency": concurrency,
+        "elapsed_s": round(elapsed, 3),
+        "sessions_per_s": round(completed_sessions / elapsed, 3) if elapsed else 0.0,
+        "turns_per_s": round(len(turn_latencies) / elapsed, 3) if elapsed else 0.0,
+        "turn_latency_ms": latency_summary(turn_latencies)
+    }
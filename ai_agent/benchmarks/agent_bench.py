@@ -0,0 +1,219 @@
+# benchmarks/agent_bench.py - Throughput, latency and memory benchmark for Agent
+import argparse
+import gc
+import json
+import platform
+import subprocess
+import sys
+import time
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional, Sequence
+
+from agent import Agent
+from batch import run_session
+from deepseek import ChatModel
+from metrics import MetricsRegistry, latency_summary
+from resilience import RetryPolicy
+from tools import calculator, text_processor
+from benchmarks.mock_server import MockConfig, MockServerProcess
+
+DEFAULT_LEVELS = (1, 2, 4, 8, 16, 32, 64, 128, 256)
+
+
+def bench_tools():
+    """Dependency-free tools the mock server's tool calls resolve to"""
+    return {
+        "calculator": calculator.calculate,
+        "summarize_text": text_processor.summarize,
+        "extract_entities": text_processor.extract_entities,
+    }
+
+
+def make_agent(chat_model: ChatModel, tool_executor: ThreadPoolExecutor) -> Agent:
+    # A private registry keeps benchmark turns out of the process-wide metrics; sessions share
+    # the tool pool as in batch and server mode, so no session starts threads of its own
+    return Agent(tools=bench_tools(), chat_model=chat_model, metrics=MetricsRegistry(),
+                 tool_executor=tool_executor)
+
+
+def make_sessions(count: int, turns: int) -> List[Dict[str, Any]]:
+    return [
+        {"id": i, "turns": [f"Session {i} turn {t}: what should I do next?" for t in range(turns)]}
+        for i in range(count)
+    ]
+
+
+def run_level(url: str, concurrency: int, sessions: int, turns: int) -> Dict[str, Any]:
+    """Run `sessions` sessions with `concurrency` in flight and summarise turn latency"""
+    chat_model = ChatModel(api_key="bench", url=url, pool_maxsize=concurrency,
+                           retry_policy=RetryPolicy(max_retries=0))
+    scripts = make_sessions(sessions, turns)
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="tool") as tool_executor, \
+            ThreadPoolExecutor(max_workers=concurrency) as executor:
+        results = list(executor.map(lambda s: run_session(make_agent(chat_model, tool_executor), s), scripts))
+    elapsed = time.perf_counter() - started
+    chat_model.close()
+
+    latencies = [turn["latency_ms"] for result in results for turn in result["turns"]]
+    return {
+        "concurrency": concurrency,
+        "sessions": sessions,
+        "turns": len(latencies),
+        "errors": sum(result["errors"] for result in results),
+        "elapsed_s": round(elapsed, 3),
+        "turns_per_s": round(len(latencies) / elapsed, 3),
+        "latency_ms": latency_summary(latencies)
+    }
+
+
+def measure_session_memory(url: str, sessions: int, turns: int) -> Dict[str, float]:
+    """Bytes retained per live session after `turns` turns, measured with tracemalloc"""
+    chat_model = ChatModel(api_key="bench", url=url)
+    # Created before the baseline so the pool's threads are not billed to the sessions
+    tool_executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix="tool")
+    scripts = make_sessions(sessions, turns)
+
+    gc.collect()
+    tracemalloc.start()
+    baseline = tracemalloc.get_traced_memory()[0]
+    agents = []
+    for script in scripts:
+        agent = make_agent(chat_model, tool_executor)
+        run_session(agent, script)
+        agents.append(agent)
+    gc.collect()
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    tool_executor.shutdown()
+    chat_model.close()
+
+    return {
+        "sessions": sessions,
+        "turns_per_session": turns,
+        "bytes_per_session": round((current - baseline) / sessions, 1),
+        "peak_bytes": peak - baseline
+    }
+
+
+def git_revision() -> Optional[str]:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_benchmark(config: MockConfig, levels: Sequence[int] = DEFAULT_LEVELS, sessions_per_level: int = 0,
+                  turns: int = 3, memory_sessions: int = 50) -> Dict[str, Any]:
+    """
+    Benchmark the agent against a fresh mock server.
+
+    Args:
+        config: Mock server behaviour (latency, token rate, tool-call mix)
+        levels: Concurrency levels to run
+        sessions_per_level: Sessions per level (0 means 4x the concurrency, at least 8)
+        turns: Turns per session
+        memory_sessions: Sessions kept alive for the memory measurement (0 skips it)
+
+    Returns:
+        JSON-serialisable report with environment metadata and per-level results
+    """
+    report = {
+        "meta": {
+            "revision": git_revision(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "timestamp": time.time(),
+            "server": config.to_dict(),
+            "turns_per_session": turns
+        },
+        "levels": []
+    }
+
+    with MockServerProcess(config) as server:
+        for concurrency in levels:
+            sessions = sessions_per_level or max(8, 4 * concurrency)
+            report["levels"].append(run_level(server.url, concurrency, sessions, turns))
+        if memory_sessions:
+            report["memory"] = measure_session_memory(server.url, memory_sessions, turns)
+    return report
+
+
+def compare(current: Dict[str, Any], baseline: Dict[str, Any], tolerance: float = 0.10) -> List[str]:
+    """
+    List regressions of current against baseline beyond tolerance (a fraction).
+    """
+    regressions = []
+    baseline_levels = {level["concurrency"]: level for level in baseline.get("levels", [])}
+    for level in current["levels"]:
+        before = baseline_levels.get(level["concurrency"])
+        if before is None:
+            continue
+        if level["turns_per_s"] < before["turns_per_s"] * (1 - tolerance):
+            regressions.append(f"c={level['concurrency']}: turns/s {before['turns_per_s']} -> {level['turns_per_s']}")
+        for q in ("p50", "p95", "p99"):
+            if level["latency_ms"][q] > before["latency_ms"][q] * (1 + tolerance):
+                regressions.append(
+                    f"c={level['concurrency']}: {q} {before['latency_ms'][q]}ms -> {level['latency_ms'][q]}ms"
+                )
+
+    if "memory" in current and "memory" in baseline:
+        before, after = baseline["memory"]["bytes_per_session"], current["memory"]["bytes_per_session"]
+        if after > before * (1 + tolerance):
+            regressions.append(f"memory/session {before}B -> {after}B")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark Agent against a local mock DeepSeek server')
+    parser.add_argument('--levels', default=",".join(map(str, DEFAULT_LEVELS)),
+                      help='Comma-separated concurrency levels (default: 1..256)')
+    parser.add_argument('--sessions', type=int, default=0,
+                      help='Sessions per level (default: 4x concurrency, at least 8)')
+    parser.add_argument('--turns', type=int, default=3, help='Turns per session (default: 3)')
+    parser.add_argument('--latency-ms', type=float, default=50.0)
+    parser.add_argument('--jitter-ms', type=float, default=10.0)
+    parser.add_argument('--tokens-per-s', type=float, default=0.0)
+    parser.add_argument('--completion-tokens', type=int, default=32)
+    parser.add_argument('--tool-call-ratio', type=float, default=0.3)
+    parser.add_argument('--memory-sessions', type=int, default=50)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', default='bench_results.json', help='Where to write the JSON report')
+    parser.add_argument('--compare', metavar='BASELINE_JSON',
+                      help='Fail if results regress against an earlier report')
+    parser.add_argument('--tolerance', type=float, default=0.10,
+                      help='Allowed regression as a fraction (default: 0.10)')
+    args = parser.parse_args()
+
+    config = MockConfig(
+        latency_ms=args.latency_ms, jitter_ms=args.jitter_ms, tokens_per_s=args.tokens_per_s,
+        completion_tokens=args.completion_tokens, tool_call_ratio=args.tool_call_ratio, seed=args.seed
+    )
+    levels = [int(level) for level in args.levels.split(",")]
+    report = run_benchmark(config, levels, args.sessions, args.turns, args.memory_sessions)
+
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+
+    for level in report["levels"]:
+        latency = level["latency_ms"]
+        print(f"c={level['concurrency']:>4}  {level['turns_per_s']:>9.1f} turns/s  "
+              f"p50={latency['p50']:.1f}ms p95={latency['p95']:.1f}ms p99={latency['p99']:.1f}ms  "
+              f"errors={level['errors']}")
+    if "memory" in report:
+        print(f"memory: {report['memory']['bytes_per_session']:.0f} bytes/session")
+
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as f:
+            regressions = compare(report, json.load(f), args.tolerance)
+        for regression in regressions:
+            print(f"REGRESSION {regression}")
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,213 @@
+# benchmarks/mock_server.py - Local mock of the DeepSeek chat-completions API
+import argparse
+import json
+import random
+import socket
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from multiprocessing import Process
+from typing import Any, Dict, Optional
+
+# Tool calls the mock emits, with parameters the real tools accept
+DEFAULT_TOOL_MIX = {
+    "calculator": {"weight": 1.0, "params": {"expression": "(2 + 3) * 4"}},
+    "summarize_text": {"weight": 1.0, "params": {"text": "First sentence. Second sentence.", "max_length": 20}},
+    "extract_entities": {"weight": 1.0, "params": {"text": "Mail ops@example.com by 12/05/2025"}},
+}
+
+
+class MockConfig:
+    """Behaviour of the mock server"""
+
+    def __init__(self, latency_ms: float = 50.0, jitter_ms: float = 0.0, tokens_per_s: float = 0.0,
+                 completion_tokens: int = 32, tool_call_ratio: float = 0.0,
+                 tool_mix: Optional[Dict[str, Dict[str, Any]]] = None, error_ratio: float = 0.0, seed: int = 0):
+        """
+        Args:
+            latency_ms: Fixed delay before the first byte of every response
+            jitter_ms: Extra uniformly random delay added to latency_ms
+            tokens_per_s: Generation speed; 0 sends the completion instantly
+            completion_tokens: Words in every completion
+            tool_call_ratio: Fraction of completions that contain a tool call
+            tool_mix: {tool name: {"weight": w, "params": {...}}} to draw tool calls from
+            error_ratio: Fraction of requests answered with a 503
+            seed: Seed for the server's random choices, for reproducible runs
+        """
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.tokens_per_s = tokens_per_s
+        self.completion_tokens = completion_tokens
+        self.tool_call_ratio = tool_call_ratio
+        self.tool_mix = tool_mix or DEFAULT_TOOL_MIX
+        self.error_ratio = error_ratio
+        self.seed = seed
+
+    def to_dict(self) -> Dict[str, Any]:
+        return dict(vars(self))
+
+
+class MockChatServer(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 1024
+
+    def __init__(self, address, config: MockConfig):
+        super().__init__(address, MockChatHandler)
+        self.config = config
+        self.random = random.Random(config.seed)
+        self.lock = threading.Lock()
+
+    def plan(self, payload: Dict[str, Any]) -> Dict[str, Any]:
+        """Decide delay, failure and content of one response"""
+        config = self.config
+        with self.lock:
+            delay = (config.latency_ms + self.random.uniform(0, config.jitter_ms)) / 1000.0
+            fail = self.random.random() < config.error_ratio
+            tool_call = self.random.random() < config.tool_call_ratio
+            names = list(config.tool_mix)
+            tool_name = self.random.choices(names, [config.tool_mix[n]["weight"] for n in names])[0]
+
+        words = ["lorem"] * config.completion_tokens
+        if tool_call:
+            params = json.dumps(config.tool_mix[tool_name]["params"])
+            words += [f"\n```tool {tool_name}\n{params}\n```"]
+        prompt_tokens = sum(len(m.get("content", "")) // 4 for m in payload.get("messages", []))
+        return {
+            "delay": delay,
+            "fail": fail,
+            "words": words,
+            "usage": {
+                "prompt_tokens": prompt_tokens,
+                "completion_tokens": config.completion_tokens,
+                "total_tokens": prompt_tokens + config.completion_tokens
+            }
+        }
+
+
+class MockChatHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    # Headers and body go out in separate writes; don't let Nagle delay the body
+    disable_nagle_algorithm = True
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length", 0))
+        payload = json.loads(self.rfile.read(length) or b"{}")
+        plan = self.server.plan(payload)
+        time.sleep(plan["delay"])
+
+        if plan["fail"]:
+            self._send_json(503, {"error": {"message": "injected failure"}})
+        elif payload.get("stream"):
+            self._send_stream(plan)
+        else:
+            if self.server.config.tokens_per_s:
+                time.sleep(len(plan["words"]) / self.server.config.tokens_per_s)
+            content = " ".join(plan["words"])
+            self._send_json(200, {
+                "choices": [{"message": {"role": "assistant", "content": content}}],
+                "usage": plan["usage"]
+            })
+
+    def _send_json(self, status, body):
+        data = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _send_stream(self, plan):
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+
+        tokens_per_s = self.server.config.tokens_per_s
+        events = [{"choices": [{"delta": {"content": word + " "}}]} for word in plan["words"]]
+        events.append({"choices": [{"delta": {}}], "usage": plan["usage"]})
+        for event in [json.dumps(e) for e in events] + ["[DONE]"]:
+            if tokens_per_s:
+                time.sleep(1.0 / tokens_per_s)
+            data = f"data: {event}\n\n".encode()
+            self.wfile.write(b"%x\r\n%s\r\n" % (len(data), data))
+            self.wfile.flush()
+        self.wfile.write(b"0\r\n\r\n")
+
+    def log_message(self, format, *args):
+        pass
+
+
+def serve(port: int, config: MockConfig) -> None:
+    server = MockChatServer(("127.0.0.1", port), config)
+    server.serve_forever(poll_interval=0.05)
+
+
+class MockServerProcess:
+    """Runs the mock server in a child process so it does not compete for the client's GIL"""
+
+    def __init__(self, config: Optional[MockConfig] = None, port: int = 0):
+        self.config = config or MockConfig()
+        self.port = port
+        self.process = None
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self.port}/v1/chat/completions"
+
+    def start(self) -> "MockServerProcess":
+        if not self.port:
+            # Reserve a free port up front; the child binds it right away
+            with socket.socket() as sock:
+                sock.bind(("127.0.0.1", 0))
+                self.port = sock.getsockname()[1]
+
+        self.process = Process(target=serve, args=(self.port, self.config), daemon=True)
+        self.process.start()
+        self._wait_until_listening()
+        return self
+
+    def _wait_until_listening(self, timeout: float = 10.0) -> None:
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            try:
+                socket.create_connection(("127.0.0.1", self.port), timeout=0.2).close()
+                return
+            except OSError:
+                time.sleep(0.02)
+        raise RuntimeError(f"Mock server did not start on port {self.port}")
+
+    def stop(self) -> None:
+        if self.process is not None:
+            self.process.terminate()
+            self.process.join()
+            self.process = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Run a mock DeepSeek chat-completions server')
+    parser.add_argument('--port', type=int, default=8089)
+    parser.add_argument('--latency-ms', type=float, default=50.0)
+    parser.add_argument('--jitter-ms', type=float, default=0.0)
+    parser.add_argument('--tokens-per-s', type=float, default=0.0)
+    parser.add_argument('--completion-tokens', type=int, default=32)
+    parser.add_argument('--tool-call-ratio', type=float, default=0.0)
+    parser.add_argument('--error-ratio', type=float, default=0.0)
+    args = parser.parse_args()
+
+    config = MockConfig(
+        latency_ms=args.latency_ms, jitter_ms=args.jitter_ms, tokens_per_s=args.tokens_per_s,
+        completion_tokens=args.completion_tokens, tool_call_ratio=args.tool_call_ratio,
+        error_ratio=args.error_ratio
+    )
+    print(f"Mock DeepSeek server on http://127.0.0.1:{args.port}/v1/chat/completions")
+    serve(args.port, config)
+
+
+if __name__ == "__main__":
+    main()
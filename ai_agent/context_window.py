@@ -0,0 +1,107 @@
+# context_window.py - Token-budgeted conversation window
+import math
+import re
+from typing import Callable, Dict, List, Optional
+
+from tools.text_processor import summarize
+
+# Rough BPE behaviour: words and punctuation are tokens, long words split every ~4 chars
+_TOKEN_PATTERN = re.compile(r"\w+|[^\w\s]")
+MESSAGE_OVERHEAD_TOKENS = 4
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    Cheaply estimate how many tokens a text will cost.
+
+    Args:
+        text: The text to measure
+
+    Returns:
+        Approximate token count
+    """
+    return sum(math.ceil(len(piece) / 4) for piece in _TOKEN_PATTERN.findall(text))
+
+
+def message_tokens(message: Dict[str, str]) -> int:
+    """Estimate the tokens a chat message costs, including role framing"""
+    return estimate_tokens(message["content"]) + MESSAGE_OVERHEAD_TOKENS
+
+
+def summarize_turn(message: Dict[str, str]) -> str:
+    """Default folding of one turn into a single summary line"""
+    return f"{message['role']}: {summarize(message['content'], 160)}"
+
+
+class ConversationWindow:
+    """Keeps recent turns verbatim and folds older turns into a rolling summary"""
+
+    def __init__(self, max_tokens: int = 6000, summary_max_tokens: int = 800,
+                 summarizer: Callable[[Dict[str, str]], str] = summarize_turn):
+        """
+        Args:
+            max_tokens: Token budget for the whole request payload
+            summary_max_tokens: Token budget for the rolling summary of older turns
+            summarizer: Turns a folded message into one summary line
+        """
+        self.max_tokens = max_tokens
+        self.summary_max_tokens = summary_max_tokens
+        self.summarizer = summarizer
+        self.summary_lines: List[str] = []
+        # Number of history messages already folded into the summary
+        self.folded = 0
+
+    def reset(self) -> None:
+        self.summary_lines = []
+        self.folded = 0
+
+    def summary_message(self) -> Optional[Dict[str, str]]:
+        if not self.summary_lines:
+            return None
+        content = "Summary of the earlier conversation:\n" + "\n".join(self.summary_lines)
+        return {"role": "system", "content": content}
+
+    def build(self, system_message: Dict[str, str], history: List[Dict[str, str]]) -> List[Dict[str, str]]:
+        """
+        Build the request payload for the next turn within the token budget.
+
+        Args:
+            system_message: The system prompt, always sent first
+            history: Full conversation history; it is never modified
+
+        Returns:
+            Messages to send: system prompt, rolling summary (if any) and recent turns
+        """
+        if len(history) < self.folded:
+            # History was cleared or replaced since the last turn
+            self.reset()
+
+        budget = self.max_tokens - message_tokens(system_message) - self.summary_max_tokens
+
+        # Walk back from the newest turn; the latest message is always kept
+        start = len(history)
+        used = 0
+        while start > self.folded:
+            cost = message_tokens(history[start - 1])
+            if used + cost > budget and start < len(history):
+                break
+            used += cost
+            start -= 1
+
+        if start > self.folded:
+            self._fold(history[self.folded:start])
+            self.folded = start
+
+        messages = [system_message]
+        summary = self.summary_message()
+        if summary is not None:
+            messages.append(summary)
+        return messages + history[start:]
+
+    def _fold(self, messages: List[Dict[str, str]]) -> None:
+        self.summary_lines.extend(self.summarizer(message) for message in messages)
+
+        # Keep the summary bounded by dropping its oldest lines first
+        total = sum(estimate_tokens(line) + 1 for line in self.summary_lines)
+        while self.summary_lines and total > self.summary_max_tokens:
+            total -= estimate_tokens(self.summary_lines.pop(0)) + 1
@@ -1,23 +1,426 @@
+# deepseek.py - DeepSeek chat-completions client
+import asyncio
+import json
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
 import requests
+from requests.adapters import HTTPAdapter
 
-class ChatModel:
-    def __init__(self, api_key, model="deepseek-chat"):
+from resilience import LatencyTracker, RetryPolicy, parse_retry_after
+
+# aiohttp is only needed for AsyncChatModel and is imported when one is created
+aiohttp = None
+
+DEFAULT_URL = "https://api.deepseek.com/v1/chat/completions"
+
+
+class SSEDecoder:
+    """Incremental decoder for server-sent-event streams, fed one line at a time"""
+
+    def __init__(self):
+        self._data = []
+
+    def feed(self, line):
+        """
+        Consume a single line of the event stream.
+
+        Args:
+            line: Line as bytes or str, with or without its trailing newline
+
+        Returns:
+            The event's data payload once a blank line completes it, otherwise None
+        """
+        if isinstance(line, bytes):
+            line = line.decode("utf-8")
+        line = line.rstrip("\r\n")
+
+        if not line:
+            if not self._data:
+                return None
+            payload = "\n".join(self._data)
+            self._data = []
+            return payload
+
+        if line.startswith(":"):
+            # Comment / keep-alive line
+            return None
+
+        field, _, value = line.partition(":")
+        if field == "data":
+            self._data.append(value[1:] if value.startswith(" ") else value)
+        return None
+
+
+def _delta_content(payload):
+    """Extract the text delta from a streamed chunk payload"""
+    event = json.loads(payload)
+    choices = event.get("choices") or [{}]
+    return (choices[0].get("delta") or {}).get("content")
+
+
+def _backoff(seconds, cancelled=None):
+    """Sleep before a retry, waking early if the request is cancelled"""
+    if cancelled is None:
+        time.sleep(seconds)
+    else:
+        cancelled.wait(seconds)
+
+
+class _ChatClient:
+    """Request encoding, response decoding and resilience settings shared by both clients"""
+
+    def __init__(self, api_key, model, url, timeout, rate_limiter, retry_policy):
         self.api_key = api_key
         self.model = model
-        self.url = "https://api.deepseek.com/v1/chat/completions"
+        self.url = url
+        self.timeout = timeout
         self.headers = {
             "Authorization": f"Bearer {self.api_key}",
             "Content-Type": "application/json"
         }
+        self.rate_limiter = rate_limiter
+        self.retry_policy = retry_policy if retry_policy is not None else RetryPolicy()
+        self.latency = LatencyTracker()
 
-    def chat(self, messages, temperature=0.7, max_tokens=512):
+    def _payload(self, messages, temperature, max_tokens, stream=False):
         payload = {
             "model": self.model,
             "messages": messages,
             "temperature": temperature,
             "max_tokens": max_tokens
         }
+        if stream:
+            payload["stream"] = True
+        return payload
+
+    @staticmethod
+    def _encode(payload):
+        return json.dumps(payload, ensure_ascii=False).encode("utf-8")
+
+    @staticmethod
+    def _decode(body, content, started, trace):
+        """Parse a completion fetched since `started`, recording network/decode spans and sizes"""
+        fetched = time.perf_counter()
+        completion = json.loads(content)
+
+        if trace is not None:
+            trace.add_span("llm.network", fetched - started)
+            trace.add_span("llm.decode", time.perf_counter() - fetched)
+            trace.set("request_bytes", len(body))
+            trace.set("response_bytes", len(content))
+        return completion
+
+
+class ChatModel(_ChatClient):
+    def __init__(self, api_key, model="deepseek-chat", url=DEFAULT_URL,
+                 pool_connections=10, pool_maxsize=10, timeout=60,
+                 rate_limiter=None, retry_policy=None, hedge_after=None):
+        """
+        Synchronous client backed by a pooled keep-alive session.
+
+        Args:
+            api_key: DeepSeek API key
+            model: Model name sent with every request
+            url: Chat-completions endpoint (override to target a local server)
+            pool_connections: Number of host pools to cache
+            pool_maxsize: Maximum number of connections kept alive per host
+            timeout: Request timeout in seconds
+            rate_limiter: TokenBucket shared by every request (None disables limiting)
+            retry_policy: RetryPolicy for 429/5xx and connection errors
+                          (defaults to RetryPolicy(); use max_retries=0 to disable)
+            hedge_after: Send a duplicate request if chat() has not answered after
+                         this many seconds, or after the observed latency
+                         percentile when given as "p95"/"p99" (None disables hedging)
+        """
+        super().__init__(api_key, model, url, timeout, rate_limiter, retry_policy)
+        self.hedge_after = hedge_after
+        self.hedges_sent = 0
+        # Hedged requests whose response was closed unread because the other one won
+        self.hedges_abandoned = 0
+        # Hedge counters are updated from caller and hedge worker threads
+        self._hedge_lock = threading.Lock()
+        self._hedge_executor = None
+        self._pool_maxsize = pool_maxsize
+
+        # One session per model so every turn reuses the same TCP/TLS connections
+        self.session = requests.Session()
+        self.session.headers.update(self.headers)
+        adapter = HTTPAdapter(pool_connections=pool_connections, pool_maxsize=pool_maxsize)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
+    def _hedge_delay(self):
+        if self.hedge_after is None:
+            return None
+        if isinstance(self.hedge_after, str):
+            # Adaptive: hedge requests slower than the given latency percentile
+            return self.latency.quantile(float(self.hedge_after.lstrip("p")))
+        return self.hedge_after
+
+    def _send(self, body, stream=False, cancelled=None):
+        """
+        POST the encoded body through the rate limiter, retrying transient failures.
+
+        Returns None without sending again once the optional `cancelled` event is set.
+        """
+        attempt = 0
+        while True:
+            if cancelled is not None and cancelled.is_set():
+                return None
+            if self.rate_limiter is not None:
+                self.rate_limiter.acquire()
+
+            started = time.monotonic()
+            try:
+                response = self.session.post(self.url, data=body, timeout=self.timeout, stream=stream)
+            except (requests.ConnectionError, requests.Timeout):
+                if not self.retry_policy.should_retry(attempt):
+                    raise
+                _backoff(self.retry_policy.delay(attempt), cancelled)
+                attempt += 1
+                continue
+
+            status = response.status_code
+            if status < 400:
+                if self.rate_limiter is not None:
+                    self.rate_limiter.on_success()
+                if not stream:
+                    self.latency.record(time.monotonic() - started)
+                return response
+
+            retry_after = parse_retry_after(response.headers.get("Retry-After"))
+            if status == 429 and self.rate_limiter is not None:
+                self.rate_limiter.on_throttle(retry_after)
+            # Closed before raising, or a streamed response would keep its pooled connection
+            response.close()
+            if not self.retry_policy.should_retry(attempt, status):
+                response.raise_for_status()
+            _backoff(self.retry_policy.delay(attempt, retry_after), cancelled)
+            attempt += 1
+
+    def _fetch(self, body):
+        """Send the body and read the whole response"""
+        return self._send(body).content
+
+    def _fetch_unless(self, body, cancelled):
+        """Send the body and read the whole response, closing it unread once cancelled is set"""
+        started = time.monotonic()
+        chunks = []
+        response = self._send(body, stream=True, cancelled=cancelled)
+        if response is not None:
+            with response:
+                for chunk in response.iter_content(chunk_size=64 * 1024):
+                    if cancelled.is_set():
+                        break
+                    chunks.append(chunk)
+            # A slow loser still counts towards the latency percentiles that trigger hedging
+            self.latency.record(time.monotonic() - started)
+        if cancelled.is_set():
+            with self._hedge_lock:
+                self.hedges_abandoned += 1
+            return None
+        return b"".join(chunks)
+
+    def _fetch_hedged(self, body, hedge_delay):
+        if self._hedge_executor is None:
+            self._hedge_executor = ThreadPoolExecutor(max_workers=2 * self._pool_maxsize, thread_name_prefix="hedge")
+
+        # Race a duplicate request against a slow primary
+        cancelled = threading.Event()
+        futures = {self._hedge_executor.submit(self._fetch_unless, body, cancelled)}
+        try:
+            done, _ = wait(futures, timeout=hedge_delay)
+            if not done:
+                with self._hedge_lock:
+                    self.hedges_sent += 1
+                futures.add(self._hedge_executor.submit(self._fetch_unless, body, cancelled))
+
+            while True:
+                done, futures = wait(futures, return_when=FIRST_COMPLETED)
+                for future in done:
+                    if future.exception() is None or not futures:
+                        return future.result()
+        finally:
+            # A request blocked on the server cannot be interrupted, but the loser closes
+            # its response as soon as it arrives instead of holding a pooled connection to read it
+            cancelled.set()
+            for future in futures:
+                future.cancel()
+
+    def chat(self, messages, temperature=0.7, max_tokens=512, trace=None):
+        """
+        Request a completion.
+
+        Args:
+            messages: Chat messages to send
+            temperature: Sampling temperature
+            max_tokens: Completion token limit
+            trace: Optional TurnTrace receiving network/decode spans and payload sizes
+
+        Returns:
+            The full chat-completions response dict
+        """
+        body = self._encode(self._payload(messages, temperature, max_tokens))
+
+        started = time.perf_counter()
+        hedge_delay = self._hedge_delay()
+        if hedge_delay is None:
+            content = self._fetch(body)
+        else:
+            content = self._fetch_hedged(body, hedge_delay)
+        return self._decode(body, content, started, trace)  # <-- Return the full dict, not just message
+
+    def chat_stream(self, messages, temperature=0.7, max_tokens=512, trace=None):
+        """
+        Stream a completion, yielding text deltas as the server sends them.
+        """
+        body = self._encode(self._payload(messages, temperature, max_tokens, stream=True))
+        if trace is not None:
+            trace.set("request_bytes", len(body))
+
+        with self._send(body, stream=True) as response:
+            decoder = SSEDecoder()
+            # chunk_size=None hands lines over as soon as they arrive
+            for line in response.iter_lines(chunk_size=None):
+                data = decoder.feed(line)
+                if data is None:
+                    continue
+                if data == "[DONE]":
+                    break
+                delta = _delta_content(data)
+                if delta:
+                    yield delta
+
+    def close(self):
+        self.session.close()
+        if self._hedge_executor is not None:
+            self._hedge_executor.shutdown(wait=False)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+class AsyncChatModel(_ChatClient):
+    def __init__(self, api_key, model="deepseek-chat", url=DEFAULT_URL,
+                 pool_maxsize=100, keepalive_timeout=30, timeout=60,
+                 rate_limiter=None, retry_policy=None):
+        """
+        asyncio client with the same API as ChatModel; chat() is a coroutine.
+        Rate limiting and retries behave as in ChatModel; hedging is not supported.
+        Use it with `async with` (or await close()) so the aiohttp session is closed.
+
+        Args:
+            api_key: DeepSeek API key
+            model: Model name sent with every request
+            url: Chat-completions endpoint (override to target a local server)
+            pool_maxsize: Maximum number of simultaneous connections
+            keepalive_timeout: Seconds an idle connection is kept open
+            timeout: Request timeout in seconds
+            rate_limiter: TokenBucket shared by every request (None disables limiting)
+            retry_policy: RetryPolicy for 429/5xx and connection errors
+        """
+        global aiohttp
+        if aiohttp is None:
+            try:
+                import aiohttp
+            except ImportError:
+                raise ImportError("AsyncChatModel requires the 'aiohttp' package")
+
+        super().__init__(api_key, model, url, timeout, rate_limiter, retry_policy)
+        self.pool_maxsize = pool_maxsize
+        self.keepalive_timeout = keepalive_timeout
+        # Created lazily so the session binds to the running event loop
+        self.session = None
+
+    def _get_session(self):
+        if self.session is None or self.session.closed:
+            connector = aiohttp.TCPConnector(
+                limit=self.pool_maxsize,
+                keepalive_timeout=self.keepalive_timeout
+            )
+            self.session = aiohttp.ClientSession(
+                headers=self.headers,
+                connector=connector,
+                timeout=aiohttp.ClientTimeout(total=self.timeout)
+            )
+        return self.session
+
+    async def _send(self, body):
+        """POST the encoded body through the rate limiter, retrying transient failures"""
+        session = self._get_session()
+        attempt = 0
+        while True:
+            if self.rate_limiter is not None:
+                wait_seconds = self.rate_limiter.reserve()
+                if wait_seconds > 0:
+                    await asyncio.sleep(wait_seconds)
+
+            started = time.monotonic()
+            try:
+                response = await session.post(self.url, data=body)
+            except (aiohttp.ClientConnectionError, asyncio.TimeoutError):
+                if not self.retry_policy.should_retry(attempt):
+                    raise
+                await asyncio.sleep(self.retry_policy.delay(attempt))
+                attempt += 1
+                continue
+
+            status = response.status
+            if status < 400:
+                if self.rate_limiter is not None:
+                    self.rate_limiter.on_success()
+                self.latency.record(time.monotonic() - started)
+                return response
+
+            retry_after = parse_retry_after(response.headers.get("Retry-After"))
+            if status == 429 and self.rate_limiter is not None:
+                self.rate_limiter.on_throttle(retry_after)
+            if not self.retry_policy.should_retry(attempt, status):
+                response.release()
+                response.raise_for_status()
+            response.release()
+            await asyncio.sleep(self.retry_policy.delay(attempt, retry_after))
+            attempt += 1
+
+    async def chat(self, messages, temperature=0.7, max_tokens=512, trace=None):
+        body = self._encode(self._payload(messages, temperature, max_tokens))
+
+        started = time.perf_counter()
+        async with await self._send(body) as response:
+            content = await response.read()
+        return self._decode(body, content, started, trace)
+
+    async def chat_stream(self, messages, temperature=0.7, max_tokens=512, trace=None):
+        """
+        Stream a completion, yielding text deltas as the server sends them.
+        """
+        body = self._encode(self._payload(messages, temperature, max_tokens, stream=True))
+        if trace is not None:
+            trace.set("request_bytes", len(body))
+
+        async with await self._send(body) as response:
+            decoder = SSEDecoder()
+            async for line in response.content:
+                data = decoder.feed(line)
+                if data is None:
+                    continue
+                if data == "[DONE]":
+                    break
+                delta = _delta_content(data)
+                if delta:
+                    yield delta
+
+    async def close(self):
+        if self.session is not None:
+            await self.session.close()
+            self.session = None
+
+    async def __aenter__(self):
+        return self
 
-        response = requests.post(self.url, headers=self.headers, json=payload)
-        response.raise_for_status()
-        return response.json()  # <-- Return the full dict, not just message
+    async def __aexit__(self, *exc_info):
+        await self.close()
@@ -0,0 +1,199 @@
+# llm_cache.py - Content-addressed cache for chat completions
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Iterator, List, Optional
+
+
+def cache_key(model: str, messages: List[Dict[str, Any]], temperature: float, max_tokens: int) -> str:
+    """
+    Compute a canonical hash for a chat request.
+
+    Args:
+        model: Model name
+        messages: Chat messages sent to the model
+        temperature: Sampling temperature
+        max_tokens: Completion token limit
+
+    Returns:
+        Hex SHA-256 digest of the canonical JSON form of the request
+    """
+    canonical = json.dumps(
+        {"model": model, "messages": messages, "temperature": float(temperature), "max_tokens": max_tokens},
+        sort_keys=True,
+        separators=(",", ":"),
+        ensure_ascii=False
+    )
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+class ResponseCache:
+    """In-memory LRU with TTL, backed by an optional on-disk tier"""
+
+    def __init__(self, max_entries: int = 1024, ttl: Optional[float] = 3600, disk_dir: Optional[str] = None):
+        """
+        Args:
+            max_entries: Maximum number of responses kept in memory
+            ttl: Seconds an entry stays valid (None for no expiry)
+            disk_dir: Directory for the persistent tier (None keeps the cache in memory only)
+        """
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.disk_dir = disk_dir
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+        if disk_dir:
+            os.makedirs(disk_dir, exist_ok=True)
+
+    def _expired(self, stored_at: float) -> bool:
+        return self.ttl is not None and time.time() - stored_at > self.ttl
+
+    def _disk_path(self, key: str) -> str:
+        return os.path.join(self.disk_dir, key[:2], f"{key}.json")
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """Return the cached response for key, or None on a miss"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                stored_at, value = entry
+                if not self._expired(stored_at):
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._entries[key]
+
+        if self.disk_dir:
+            entry = self._read_disk(key)
+            if entry is not None:
+                stored_at, value = entry
+                with self._lock:
+                    self._remember(key, stored_at, value)
+                    self.disk_hits += 1
+                return value
+
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def put(self, key: str, value: Dict[str, Any]) -> None:
+        """Store a response under key in memory and, if enabled, on disk"""
+        stored_at = time.time()
+        with self._lock:
+            self._remember(key, stored_at, value)
+
+        if self.disk_dir:
+            self._write_disk(key, stored_at, value)
+
+    def _remember(self, key: str, stored_at: float, value: Dict[str, Any]) -> None:
+        self._entries[key] = (stored_at, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def _read_disk(self, key: str):
+        path = self._disk_path(key)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                record = json.load(f)
+        except (OSError, ValueError):
+            return None
+
+        if self._expired(record["stored_at"]):
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            return None
+        return record["stored_at"], record["response"]
+
+    def _write_disk(self, key: str, stored_at: float, value: Dict[str, Any]) -> None:
+        path = self._disk_path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+
+        # Write then rename so concurrent readers never see a partial file
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"stored_at": stored_at, "response": value}, f)
+        os.replace(tmp_path, path)
+
+    def clear(self) -> None:
+        """Drop every in-memory entry (the disk tier is left untouched)"""
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        """Return hit/miss counters and the current in-memory size"""
+        with self._lock:
+            lookups = self.hits + self.disk_hits + self.misses
+            return {
+                "hits": self.hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "hit_rate": (self.hits + self.disk_hits) / lookups if lookups else 0.0,
+                "size": len(self._entries)
+            }
+
+
+class CachedChatModel:
+    """Wraps a ChatModel and answers repeated requests from a ResponseCache"""
+
+    def __init__(self, model, cache: Optional[ResponseCache] = None, max_temperature: float = 0.0):
+        """
+        Args:
+            model: The ChatModel to wrap
+            cache: Cache to use (a fresh in-memory ResponseCache by default)
+            max_temperature: Requests sampled above this temperature bypass the cache,
+                             since their completions are not meant to be repeatable
+        """
+        self.model = model
+        self.cache = cache if cache is not None else ResponseCache()
+        self.max_temperature = max_temperature
+
+    def __getattr__(self, name):
+        return getattr(self.model, name)
+
+    def _key(self, messages, temperature, max_tokens) -> Optional[str]:
+        if temperature > self.max_temperature:
+            return None
+        return cache_key(self.model.model, messages, temperature, max_tokens)
+
+    def chat(self, messages, temperature=0.7, max_tokens=512, trace=None):
+        key = self._key(messages, temperature, max_tokens)
+        if key is not None:
+            cached = self.cache.get(key)
+            if trace is not None:
+                trace.set("cache_hit", cached is not None)
+            if cached is not None:
+                return cached
+
+        completion = self.model.chat(messages, temperature=temperature, max_tokens=max_tokens, trace=trace)
+
+        if key is not None:
+            self.cache.put(key, completion)
+        return completion
+
+    def chat_stream(self, messages, temperature=0.7, max_tokens=512, trace=None) -> Iterator[str]:
+        key = self._key(messages, temperature, max_tokens)
+        if key is not None:
+            cached = self.cache.get(key)
+            if trace is not None:
+                trace.set("cache_hit", cached is not None)
+            if cached is not None:
+                yield cached["choices"][0]["message"]["content"]
+                return
+
+        chunks = []
+        for delta in self.model.chat_stream(messages, temperature=temperature, max_tokens=max_tokens, trace=trace):
+            chunks.append(delta)
+            yield delta
+
+        if key is not None:
+            self.cache.put(key, {"choices": [{"message": {"role": "assistant", "content": "".join(chunks)}}]})
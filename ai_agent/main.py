@@ -1,31 +1,152 @@
 # main.py - Main orchestration script with task management integration
 import os
 import json
-from tools import web_search, calculator, file_operations, task_manager
+import argparse
 from agent import Agent
-import toml
+from router import default_router
+from deepseek import ChatModel
+from llm_cache import ResponseCache
+from settings import deepseek_api_key
+from tool_registry import LazyTool
+from tool_cache import CachePolicy, ToolCache, collapse_whitespace, remove_whitespace
+import batch
+
+def build_tools():
+    """Return the tools every SmolaGent session is started with"""
+    # Tools are imported on first call, so startup never loads their dependencies
+    return {
+        # Original tools
+        "web_search": LazyTool("tools.web_search", "search"),
+        "calculator": LazyTool("tools.calculator", "calculate"),
+        "calculate_many": LazyTool("tools.calculator", "calculate_many"),
+        "read_file": LazyTool("tools.file_operations", "read_file"),
+        "write_file": LazyTool("tools.file_operations", "write_file"),
+        "search_files": LazyTool("tools.file_search", "search_files"),
+        
+        # Task management tools
+        "decompose_task": LazyTool("tools.task_manager", "decompose_task"),
+        "prioritize_tasks": LazyTool("tools.task_manager", "prioritize_tasks"),
+        "schedule_tasks": LazyTool("tools.task_manager", "schedule_tasks"),
+        "visualize_tasks": LazyTool("tools.task_manager", "visualize_tasks"),
+        "run_task_script": LazyTool("tools.task_manager", "run_task_script")
+    }
+
+# Deterministic tools and how their results are memoized across sessions
+TOOL_CACHE_POLICIES = {
+    "calculator": CachePolicy(max_entries=4096, normalize={"expression": remove_whitespace}),
+    # Subtask deadlines are relative to now, so decompositions only stay fresh for a while
+    "decompose_task": CachePolicy(max_entries=512, ttl=3600, defaults={"complexity_level": 1},
+                                  normalize={"task_description": collapse_whitespace})
+}
+
+def build_tool_cache():
+    """Return a tool cache with the default policies"""
+    return ToolCache(TOOL_CACHE_POLICIES)
+
+def run_batch_mode(args):
+    """Run the sessions in args.batch headlessly and print the throughput report"""
+    from concurrent.futures import ThreadPoolExecutor
+    
+    # All sessions share one pooled client, (optionally) one response cache, the tools and the tool pool
+    chat_model = ChatModel(api_key=deepseek_api_key(), pool_maxsize=args.concurrency)
+    cache = ResponseCache(disk_dir=args.cache_dir) if args.cache_dir else None
+    router = default_router()
+    tools = build_tools()
+    tool_executor = ThreadPoolExecutor(max_workers=args.concurrency, thread_name_prefix="tool")
+    tool_cache = build_tool_cache()
+    
+    def agent_factory():
+        return Agent(
+            tools=tools,
+            api_key=deepseek_api_key(),
+            temperature=args.temperature,
+            cache=cache,
+            router=router,
+            chat_model=chat_model,
+            tool_executor=tool_executor,
+            tool_cache=tool_cache
+        )
+    
+    try:
+        report = batch.run_batch(args.batch, args.output, agent_factory, concurrency=args.concurrency)
+    finally:
+        tool_executor.shutdown(wait=False)
+    if cache is not None:
+        report["cache"] = cache.stats()
+    report["tool_cache"] = tool_cache.stats()
+    print(json.dumps(report, indent=2))
+
+def run_server_mode(args):
+    """Serve many isolated sessions over HTTP/WebSocket from this process"""
+    # Imported here so the REPL and batch modes never load aiohttp
+    from concurrent.futures import ThreadPoolExecutor
+    import server
+    
+    # Sessions share the connection pool, response cache, router and tool pool
+    chat_model = ChatModel(api_key=deepseek_api_key(), pool_maxsize=args.workers)
+    cache = ResponseCache(disk_dir=args.cache_dir) if args.cache_dir else None
+    router = default_router()
+    tools = build_tools()
+    tool_executor = ThreadPoolExecutor(max_workers=args.workers, thread_name_prefix="tool")
+    tool_cache = build_tool_cache()
+    
+    def agent_factory():
+        return Agent(
+            tools=tools,
+            temperature=args.temperature,
+            cache=cache,
+            router=router,
+            chat_model=chat_model,
+            tool_executor=tool_executor,
+            tool_cache=tool_cache
+        )
+    
+    server.serve(
+        agent_factory,
+        state_dir=args.state_dir,
+        host=args.host,
+        port=args.port,
+        idle_timeout=args.idle_timeout,
+        turn_workers=args.workers
+    )
 
-config = toml.load('config.toml')
-DEEPSEEK_API = config['secrets']['DEEPSEEK_API']
 def main():
+    parser = argparse.ArgumentParser(description='SmolaGent AI Assistant')
+    parser.add_argument('--batch', metavar='INPUT_JSONL',
+                      help='Run prompts or multi-turn scripts from a JSONL file instead of the REPL')
+    parser.add_argument('--output', default='batch_results.jsonl',
+                      help='JSONL file for batch results (default: batch_results.jsonl)')
+    parser.add_argument('--concurrency', type=int, default=8,
+                      help='Maximum number of batch sessions running at once (default: 8)')
+    parser.add_argument('--temperature', type=float, default=0.7,
+                      help='Sampling temperature for batch sessions (default: 0.7)')
+    parser.add_argument('--cache-dir',
+                      help='Persist a response cache here; only temperature 0 requests are cached')
+    parser.add_argument('--serve', action='store_true',
+                      help='Run the multi-session HTTP/WebSocket server instead of the REPL')
+    parser.add_argument('--host', default='127.0.0.1',
+                      help='Interface the server binds to (default: 127.0.0.1)')
+    parser.add_argument('--port', type=int, default=8765,
+                      help='Port the server listens on (default: 8765)')
+    parser.add_argument('--state-dir', default='sessions',
+                      help='Directory for sessions evicted from memory (default: sessions)')
+    parser.add_argument('--idle-timeout', type=float, default=900.0,
+                      help='Seconds before an idle session is evicted to disk (default: 900)')
+    parser.add_argument('--workers', type=int, default=64,
+                      help='Agent turns the server runs at once (default: 64)')
+    args = parser.parse_args()
+    
+    if args.batch:
+        run_batch_mode(args)
+        return
+    
+    if args.serve:
+        run_server_mode(args)
+        return
+    
     # Initialize agent with available tools
-    agent = Agent(
-        tools={
-            # Original tools
-            "web_search": web_search.search,
-            "calculator": calculator.calculate,
-            "read_file": file_operations.read_file,
-            "write_file": file_operations.write_file,
-            
-            # Task management tools
-            "decompose_task": task_manager.decompose_task,
-            "prioritize_tasks": task_manager.prioritize_tasks,
-            "schedule_tasks": task_manager.schedule_tasks,
-            "visualize_tasks": task_manager.visualize_tasks,
-            "run_task_script": task_manager.run_task_script
-        },
-        api_key=DEEPSEEK_API
-    )
+    agent = Agent(tools=build_tools(), api_key=deepseek_api_key(), router=default_router(),
+                  tool_cache=build_tool_cache())
     
     print("🤖 SmolaGent AI Assistant initialized. Type 'exit' to quit.")
     print("🔧 Enhanced with Task Management capabilities!")
@@ -36,8 +157,11 @@ def main():
             print("🤖 SmolaGent: Goodbye!")
             break
             
-        response = agent.process(user_input)
-        print(f"\n🤖 SmolaGent: {response}")
+        # Print tokens as they arrive instead of waiting for the full reply
+        print("\n🤖 SmolaGent: ", end="", flush=True)
+        for delta in agent.process_stream(user_input):
+            print(delta, end="", flush=True)
+        print()
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -0,0 +1,221 @@
+# metrics.py - Turn tracing and an in-process metrics registry
+import json
+import math
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+# Seconds; spans range from sub-millisecond regex work to multi-second completions
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+# Bytes, for payload sizes
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+
+
+def percentile(sorted_values: Sequence[float], q: float) -> float:
+    """
+    Nearest-rank percentile of already sorted values.
+
+    Args:
+        sorted_values: Values in ascending order
+        q: Percentile between 0 and 100
+
+    Returns:
+        The percentile, or 0.0 for an empty sequence
+    """
+    if not sorted_values:
+        return 0.0
+    rank = max(1, math.ceil(q / 100.0 * len(sorted_values)))
+    return sorted_values[rank - 1]
+
+
+def latency_summary(latencies_ms: List[float]) -> Dict[str, float]:
+    """p50/p95/p99/max/mean of a list of latencies in milliseconds"""
+    values = sorted(latencies_ms)
+    return {
+        "p50": round(percentile(values, 50), 3),
+        "p95": round(percentile(values, 95), 3),
+        "p99": round(percentile(values, 99), 3),
+        "max": round(values[-1], 3) if values else 0.0,
+        "mean": round(sum(values) / len(values), 3) if values else 0.0
+    }
+
+
+class TurnTrace:
+    """Timed spans and attributes recorded while the agent handles one turn"""
+
+    def __init__(self, user_input: str = ""):
+        self.user_input = user_input
+        self.started_at = time.time()
+        self.spans: List[Tuple[str, float]] = []
+        self.attributes: Dict[str, Any] = {}
+        # Tool spans are recorded from worker threads
+        self._lock = threading.Lock()
+
+    def add_span(self, name: str, seconds: float) -> None:
+        with self._lock:
+            self.spans.append((name, seconds))
+
+    @contextmanager
+    def span(self, name: str):
+        """Time the enclosed block as a span called name"""
+        started = time.perf_counter()
+        try:
+            yield self
+        finally:
+            self.add_span(name, time.perf_counter() - started)
+
+    def set(self, key: str, value: Any) -> None:
+        with self._lock:
+            self.attributes[key] = value
+
+    def duration(self, name: str) -> float:
+        """Total seconds spent in spans called name"""
+        return sum(seconds for span_name, seconds in self.spans if span_name == name)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "started_at": self.started_at,
+            "spans": [{"name": name, "seconds": round(seconds, 6)} for name, seconds in self.spans],
+            "attributes": dict(self.attributes)
+        }
+
+
+def _label_key(labels: Optional[Dict[str, str]]) -> Tuple[Tuple[str, str], ...]:
+    return tuple(sorted((labels or {}).items()))
+
+
+def _escape_label_value(value: Any) -> str:
+    """Escape a label value as the Prometheus text format requires"""
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(labels: Tuple[Tuple[str, str], ...], extra: str = "") -> str:
+    parts = [f'{name}="{_escape_label_value(value)}"' for name, value in labels]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+class Histogram:
+    """Cumulative-bucket histogram, one per metric name and label set"""
+
+    def __init__(self, buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self.buckets = tuple(sorted(buckets))
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float) -> None:
+        with self._lock:
+            self.counts[bisect_left(self.buckets, value)] += 1
+            self.count += 1
+            self.sum += value
+
+    def cumulative(self) -> List[Tuple[str, int]]:
+        """(upper bound, cumulative count) pairs ending with +Inf"""
+        with self._lock:
+            counts = list(self.counts)
+        total = 0
+        result = []
+        for bound, count in zip(list(self.buckets) + [math.inf], counts):
+            total += count
+            result.append(("+Inf" if bound == math.inf else repr(bound), total))
+        return result
+
+
+class Counter:
+    def __init__(self):
+        self.value = 0.0
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1.0) -> None:
+        with self._lock:
+            self.value += amount
+
+
+class MetricsRegistry:
+    """Named histograms and counters, exportable as Prometheus text or JSON lines"""
+
+    def __init__(self):
+        self._metrics: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+
+    def _get(self, name: str, kind: str, help_text: str, labels, factory):
+        with self._lock:
+            family = self._metrics.setdefault(name, {"type": kind, "help": help_text, "series": {}})
+            if family["type"] != kind:
+                raise ValueError(f"Metric '{name}' is already registered as a {family['type']}")
+            series = family["series"]
+            key = _label_key(labels)
+            if key not in series:
+                series[key] = factory()
+            return series[key]
+
+    def histogram(self, name: str, help_text: str = "", labels: Optional[Dict[str, str]] = None,
+                  buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+        return self._get(name, "histogram", help_text, labels, lambda: Histogram(buckets))
+
+    def counter(self, name: str, help_text: str = "", labels: Optional[Dict[str, str]] = None) -> Counter:
+        return self._get(name, "counter", help_text, labels, Counter)
+
+    def _families(self):
+        with self._lock:
+            return [(name, family["type"], family["help"], list(family["series"].items()))
+                    for name, family in sorted(self._metrics.items())]
+
+    def to_prometheus(self) -> str:
+        """Render every metric in the Prometheus text exposition format"""
+        lines = []
+        for name, kind, help_text, series in self._families():
+            if help_text:
+                lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+            for labels, metric in series:
+                if kind == "counter":
+                    lines.append(f"{name}{_format_labels(labels)} {metric.value}")
+                    continue
+                for bound, count in metric.cumulative():
+                    bucket_labels = _format_labels(labels, f'le="{bound}"')
+                    lines.append(f"{name}_bucket{bucket_labels} {count}")
+                lines.append(f"{name}_sum{_format_labels(labels)} {metric.sum}")
+                lines.append(f"{name}_count{_format_labels(labels)} {metric.count}")
+        return "\n".join(lines) + "\n"
+
+    def to_json_lines(self) -> str:
+        """Render one JSON object per metric series"""
+        lines = []
+        for name, kind, _, series in self._families():
+            for labels, metric in series:
+                record = {"name": name, "type": kind, "labels": dict(labels)}
+                if kind == "counter":
+                    record["value"] = metric.value
+                else:
+                    record.update(count=metric.count, sum=metric.sum, buckets=dict(metric.cumulative()))
+                lines.append(json.dumps(record))
+        return "\n".join(lines) + "\n" if lines else ""
+
+    def record_turn(self, trace: TurnTrace) -> None:
+        """Fold a finished turn's spans, payload sizes and token usage into the registry"""
+        for name, seconds in list(trace.spans):
+            self.histogram("agent_phase_seconds", "Time spent in each phase of a turn",
+                           {"phase": name}).observe(seconds)
+
+        attributes = trace.attributes
+        for key in ("request_bytes", "response_bytes"):
+            if key in attributes:
+                self.histogram(f"agent_{key}", "Chat-completions payload size",
+                               buckets=SIZE_BUCKETS).observe(attributes[key])
+        for kind in ("prompt", "completion"):
+            tokens = attributes.get(f"{kind}_tokens")
+            if tokens:
+                self.counter("agent_tokens_total", "Tokens reported by the API", {"kind": kind}).inc(tokens)
+
+        outcome = "error" if "error" in attributes else "routed" if attributes.get("routed") else "ok"
+        self.counter("agent_turns_total", "Turns handled by outcome", {"outcome": outcome}).inc()
+
+
+# Process-wide registry used by agents unless they are given their own
+REGISTRY = MetricsRegistry()
@@ -0,0 +1,144 @@
+# resilience.py - Rate limiting, retry and hedging policies for the chat clients
+import random
+import threading
+import time
+from collections import deque
+from email.utils import parsedate_to_datetime
+from typing import Optional
+
+from metrics import percentile
+
+# Statuses worth retrying: throttling and transient server-side failures
+RETRY_STATUSES = frozenset({408, 429, 500, 502, 503, 504})
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """
+    Parse a Retry-After header given in seconds or as an HTTP date.
+
+    Returns:
+        Seconds to wait, or None if the header is missing or malformed
+    """
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+class TokenBucket:
+    """
+    Client-side token bucket that adapts its rate to server throttling.
+
+    The rate halves on every 429 (AIMD) and all callers pause until any
+    Retry-After has elapsed; each success then nudges the rate back up.
+    """
+
+    def __init__(self, rate: float = 10.0, capacity: Optional[float] = None,
+                 min_rate: float = 0.5, max_rate: Optional[float] = None, increase: float = 0.1):
+        """
+        Args:
+            rate: Initial requests per second
+            capacity: Burst size (defaults to one second's worth of requests)
+            min_rate: Floor the rate never drops below
+            max_rate: Ceiling for recovery (defaults to the initial rate)
+            increase: Requests per second regained after each success
+        """
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else max(1.0, rate)
+        self.min_rate = min_rate
+        self.max_rate = max_rate if max_rate is not None else rate
+        self.increase = increase
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+        self._lock = threading.Lock()
+
+    def reserve(self) -> float:
+        """
+        Take a token, possibly one that only becomes available in the future.
+
+        Returns:
+            Seconds the caller must wait before sending its request
+        """
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            self._tokens -= 1
+            wait = -self._tokens / self.rate if self._tokens < 0 else 0.0
+            return max(wait, self._paused_until - now)
+
+    def acquire(self) -> None:
+        """Block until the caller may send a request"""
+        wait = self.reserve()
+        if wait > 0:
+            time.sleep(wait)
+
+    def on_throttle(self, retry_after: Optional[float] = None) -> None:
+        """Record a 429: halve the rate and honour the server's Retry-After"""
+        with self._lock:
+            self.rate = max(self.min_rate, self.rate / 2)
+            if retry_after:
+                self._paused_until = max(self._paused_until, time.monotonic() + retry_after)
+
+    def on_success(self) -> None:
+        with self._lock:
+            self.rate = min(self.max_rate, self.rate + self.increase)
+
+
+class RetryPolicy:
+    """Bounded retries with full-jitter exponential backoff"""
+
+    def __init__(self, max_retries: int = 3, base_delay: float = 0.5, max_delay: float = 20.0,
+                 retry_statuses=RETRY_STATUSES):
+        """
+        Args:
+            max_retries: Retries after the first attempt (0 disables retrying)
+            base_delay: Backoff ceiling for the first retry, doubled on every attempt
+            max_delay: Upper bound for any single wait
+            retry_statuses: HTTP statuses that are retried
+        """
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.retry_statuses = frozenset(retry_statuses)
+
+    def should_retry(self, attempt: int, status: Optional[int] = None) -> bool:
+        """Whether attempt (0-based) may be retried; status None means a connection error"""
+        if attempt >= self.max_retries:
+            return False
+        return status is None or status in self.retry_statuses
+
+    def delay(self, attempt: int, retry_after: Optional[float] = None) -> float:
+        """Seconds to wait before the next attempt"""
+        if retry_after is not None:
+            # The server knows best; jitter a little so clients don't return in lockstep
+            return min(self.max_delay, retry_after) + random.uniform(0, self.base_delay)
+        return random.uniform(0, min(self.max_delay, self.base_delay * (2 ** attempt)))
+
+
+class LatencyTracker:
+    """Rolling window of request latencies used to pick the hedging delay"""
+
+    def __init__(self, window: int = 200, min_samples: int = 20):
+        self._samples = deque(maxlen=window)
+        self.min_samples = min_samples
+        self._lock = threading.Lock()
+
+    def record(self, seconds: float) -> None:
+        with self._lock:
+            self._samples.append(seconds)
+
+    def quantile(self, q: float) -> Optional[float]:
+        """Latency at percentile q, or None until enough samples were seen"""
+        with self._lock:
+            if len(self._samples) < self.min_samples:
+                return None
+            values = sorted(self._samples)
+        return percentile(values, q)
@@ -0,0 +1,153 @@
+# router.py - Local fast-path routing of tool-shaped inputs
+import json
+import re
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+# A matcher inspects user input and returns (confidence, tool parameters) or None
+Matcher = Callable[[str], Optional[Tuple[float, Dict[str, Any]]]]
+
+
+class Route:
+    """A deterministic pattern that maps user input straight to a tool call"""
+
+    def __init__(self, tool_name: str, matcher: Matcher, threshold: float = 0.9,
+                 fallback_on_error: bool = True):
+        """
+        Args:
+            tool_name: Tool to call when the route matches
+            matcher: Returns (confidence, params) for inputs it recognises, else None
+            threshold: Minimum confidence needed to skip the LLM
+            fallback_on_error: Hand the input to the LLM when the tool returns an error
+        """
+        self.tool_name = tool_name
+        self.matcher = matcher
+        self.threshold = threshold
+        self.fallback_on_error = fallback_on_error
+
+    def match(self, user_input: str) -> Optional[Tuple[float, Dict[str, Any]]]:
+        result = self.matcher(user_input)
+        if result is None or result[0] < self.threshold:
+            return None
+        return result
+
+
+class IntentRouter:
+    """Picks the most confident route for an input, if any clears its threshold"""
+
+    def __init__(self, routes: Optional[List[Route]] = None):
+        self.routes: List[Route] = list(routes or [])
+
+    def add_route(self, route: Route) -> None:
+        self.routes.append(route)
+
+    def route(self, user_input: str, available_tools=None) -> Optional[Tuple[Route, Dict[str, Any]]]:
+        """
+        Find the best route for the input.
+
+        Args:
+            user_input: The user's message
+            available_tools: Only consider routes whose tool is in this collection (optional)
+
+        Returns:
+            (route, tool parameters) for the most confident match, or None to use the LLM
+        """
+        best = None
+        for route in self.routes:
+            if available_tools is not None and route.tool_name not in available_tools:
+                continue
+            matched = route.match(user_input)
+            if matched is not None and (best is None or matched[0] > best[0]):
+                best = (matched[0], route, matched[1])
+
+        if best is None:
+            return None
+        return best[1], best[2]
+
+
+_QUESTION_PREFIX = re.compile(
+    r"^\s*(?:(what\s+is|what's|calculate|compute|evaluate|solve)\s*:?\s*)?(.*?)\s*[?=]?\s*$",
+    re.IGNORECASE | re.DOTALL
+)
+# Cues that ask for a calculation outright, unlike "what is"
+_CALCULATION_CUE = re.compile(r"calculate|compute|evaluate|solve", re.IGNORECASE)
+# Plain numeric arithmetic (a subset of what the calculator accepts), with at least one binary operator
+_ARITHMETIC = re.compile(r"^[\d\+\-\*\/\(\)\.\s]*$")
+_BINARY_OPERATION = re.compile(r"[\d)]\s*[\+\-\*\/]+\s*[\d(.]")
+# Dates (12/25/2024, 2024-12-25) and phone numbers (555-1234, 555-123-4567, (555) 123-4567)
+# are valid arithmetic but rarely meant as such
+_DATE_OR_PHONE = re.compile(
+    r"^(?:\d{1,4}([/\-])\d{1,2}\1\d{1,4}"
+    r"|(?:\d-)?(?:\(\d{3}\)\s*|\d{3}-)?\d{3}-\d{4})$"
+)
+
+
+def match_arithmetic(user_input: str) -> Optional[Tuple[float, Dict[str, Any]]]:
+    """
+    Recognise plain arithmetic such as "what is (2+3)*4".
+
+    Date and phone-number shapes are only taken as arithmetic after an explicit
+    "calculate"/"compute"/"evaluate"/"solve".
+    """
+    cue, expression = _QUESTION_PREFIX.match(user_input).groups()
+    if not expression or not _ARITHMETIC.match(expression) or not _BINARY_OPERATION.search(expression):
+        return None
+    if _DATE_OR_PHONE.match(expression) and not (cue and _CALCULATION_CUE.match(cue)):
+        return None
+
+    # A bare expression is unambiguous; a wrapped one is almost always a calculation too
+    confidence = 1.0 if expression == user_input.strip() else 0.95
+    return confidence, {"expression": expression}
+
+
+_PRIORITIZE = re.compile(
+    r"^\s*(?:please\s+)?(?:prioriti[sz]e|rank|order)\s+(?:these|the|my|the\s+following)?\s*tasks?\b\s*[:\-]?\s*(.*)$",
+    re.IGNORECASE | re.DOTALL
+)
+
+
+# Plain-list matches score below the default 0.9 threshold, so they only route
+# when the route's threshold is lowered (see default_router)
+PLAIN_LIST_CONFIDENCE = 0.85
+
+
+def match_prioritize(user_input: str) -> Optional[Tuple[float, Dict[str, Any]]]:
+    """
+    Recognise "prioritize these tasks: ..." followed by a JSON list or a plain list.
+
+    JSON lists of task objects score 0.95; newline, semicolon or comma separated
+    descriptions score PLAIN_LIST_CONFIDENCE.
+    """
+    match = _PRIORITIZE.match(user_input)
+    if not match or not match.group(1).strip():
+        return None
+    body = match.group(1).strip()
+
+    try:
+        tasks = json.loads(body)
+    except ValueError:
+        tasks = None
+    if isinstance(tasks, list) and tasks and all(isinstance(task, dict) for task in tasks):
+        return 0.95, {"tasks": tasks}
+
+    # Newline, semicolon or comma separated descriptions are plausible but less certain
+    items = [item.strip(" -*\t") for item in re.split(r"[\n;,]", body)]
+    items = [item for item in items if item]
+    if len(items) < 2:
+        return None
+    tasks = [{"id": i, "description": item, "dependencies": []} for i, item in enumerate(items, 1)]
+    return PLAIN_LIST_CONFIDENCE, {"tasks": tasks}
+
+
+def default_router(plain_task_lists: bool = False) -> IntentRouter:
+    """
+    Router with the built-in calculator and task prioritization routes.
+
+    Args:
+        plain_task_lists: Also route plain-list prioritization requests; by default
+                          only JSON task lists clear the prioritization threshold
+    """
+    return IntentRouter([
+        Route("calculator", match_arithmetic, threshold=0.9),
+        Route("prioritize_tasks", match_prioritize,
+              threshold=PLAIN_LIST_CONFIDENCE if plain_task_lists else 0.9),
+    ])
@@ -0,0 +1,431 @@
+# server.py - Multi-session HTTP/WebSocket server hosting many agents in one process
+import asyncio
+import json
+import os
+import re
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, AsyncIterator, Callable, Dict, Optional
+
+from aiohttp import WSMsgType, web
+
+from metrics import REGISTRY, MetricsRegistry
+
+# Session IDs double as file names in the state directory
+SESSION_ID_PATTERN = re.compile(r'^[A-Za-z0-9_-]{1,64}$')
+
+
+class SessionStore:
+    """One JSON file per evicted session, sharded by the first two characters of its ID"""
+
+    def __init__(self, state_dir: str):
+        """
+        Args:
+            state_dir: Directory that receives the session files
+        """
+        self.state_dir = state_dir
+        os.makedirs(state_dir, exist_ok=True)
+
+    def _path(self, session_id: str) -> str:
+        return os.path.join(self.state_dir, session_id[:2], f"{session_id}.json")
+
+    def exists(self, session_id: str) -> bool:
+        return os.path.exists(self._path(session_id))
+
+    def save(self, session_id: str, state: Dict[str, Any]) -> None:
+        path = self._path(session_id)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+
+        # Write then rename so a crash never leaves a truncated session behind
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(state, f, ensure_ascii=False)
+        os.replace(tmp_path, path)
+
+    def load(self, session_id: str) -> Optional[Dict[str, Any]]:
+        try:
+            with open(self._path(session_id), "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def delete(self, session_id: str) -> None:
+        try:
+            os.remove(self._path(session_id))
+        except OSError:
+            pass
+
+
+class Session:
+    """A live agent plus the lock that serialises its turns"""
+
+    def __init__(self, session_id: str, agent):
+        self.session_id = session_id
+        self.agent = agent
+        # Turns of one session run in order; different sessions run concurrently
+        self.lock = asyncio.Lock()
+        self.last_used = time.monotonic()
+        # Turns running or queued on the lock; busy sessions are never evicted
+        self.active = 0
+
+    @property
+    def busy(self) -> bool:
+        return self.active > 0
+
+    def touch(self) -> None:
+        self.last_used = time.monotonic()
+
+
+class SessionManager:
+    """
+    Keeps recently used sessions in memory and the rest on disk.
+
+    All methods run on the event loop thread, so the session table needs no
+    locking; disk reads and writes are small and done inline, which also means
+    a session can never be restored twice by concurrent requests.
+    """
+
+    def __init__(self, agent_factory: Callable[[], Any], store: SessionStore,
+                 idle_timeout: float = 900.0, max_live: int = 5000,
+                 metrics: Optional[MetricsRegistry] = REGISTRY):
+        """
+        Args:
+            agent_factory: Returns a fresh Agent for a new or restored session
+            store: Where evicted sessions are persisted
+            idle_timeout: Seconds without a turn before a session is evicted
+            max_live: Sessions kept in memory before the least recently used are evicted
+            metrics: Registry receiving session lifecycle counters (None disables them)
+        """
+        self.agent_factory = agent_factory
+        self.store = store
+        self.idle_timeout = idle_timeout
+        self.max_live = max_live
+        self.metrics = metrics
+        # Least recently used first
+        self._sessions: "OrderedDict[str, Session]" = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._sessions)
+
+    def __contains__(self, session_id: str) -> bool:
+        return session_id in self._sessions
+
+    def _count(self, event: str) -> None:
+        if self.metrics is not None:
+            self.metrics.counter("agent_sessions_total", "Session lifecycle events", {"event": event}).inc()
+
+    def create(self) -> Session:
+        """Start a session under a new random ID"""
+        return self.get(uuid.uuid4().hex)
+
+    def get(self, session_id: str, create: bool = True) -> Optional[Session]:
+        """
+        Return the live session, restoring it from disk if it was evicted.
+
+        Args:
+            session_id: The session's ID
+            create: Start a fresh session if the ID is unknown
+
+        Returns:
+            The session, or None if it is unknown and create is False
+        """
+        session = self._sessions.get(session_id)
+        if session is not None:
+            self._sessions.move_to_end(session_id)
+            return session
+
+        state = self.store.load(session_id)
+        if state is None and not create:
+            return None
+
+        agent = self.agent_factory()
+        if state is not None:
+            agent.load_state(state)
+            self._count("restored")
+        else:
+            self._count("created")
+
+        session = Session(session_id, agent)
+        self._sessions[session_id] = session
+        self._enforce_limit()
+        return session
+
+    def _evict(self, session: Session) -> None:
+        del self._sessions[session.session_id]
+        self.store.save(session.session_id, session.agent.get_state())
+        session.agent.close()
+        self._count("evicted")
+
+    def _enforce_limit(self) -> None:
+        # Oldest first; sessions mid-turn are skipped rather than waited for
+        for session in list(self._sessions.values()):
+            if len(self._sessions) <= self.max_live:
+                break
+            if not session.busy:
+                self._evict(session)
+
+    def evict_idle(self, now: Optional[float] = None) -> int:
+        """
+        Persist and drop every session idle for longer than idle_timeout.
+
+        Returns:
+            Number of sessions evicted
+        """
+        now = time.monotonic() if now is None else now
+        evicted = 0
+        for session in list(self._sessions.values()):
+            if now - session.last_used < self.idle_timeout:
+                # Sessions are in LRU order, so the rest are fresher still
+                break
+            if not session.busy:
+                self._evict(session)
+                evicted += 1
+        return evicted
+
+    def delete(self, session_id: str) -> bool:
+        """Forget a session in memory and on disk; returns whether it existed"""
+        session = self._sessions.pop(session_id, None)
+        existed = session is not None or self.store.exists(session_id)
+        if session is not None:
+            session.agent.close()
+        self.store.delete(session_id)
+        return existed
+
+    def close(self) -> None:
+        """Persist every live session, e.g. on shutdown"""
+        for session in list(self._sessions.values()):
+            self._evict(session)
+
+
+async def _wait_for_thread(future: asyncio.Future) -> None:
+    """Wait until an executor future is done, even if the waiting task is cancelled meanwhile"""
+    cancelled = False
+    while not future.done():
+        try:
+            await asyncio.shield(future)
+        except asyncio.CancelledError:
+            cancelled = True
+        except Exception:
+            break
+    if not future.cancelled():
+        # Mark the outcome retrieved; the caller re-raises it if the turn ended normally
+        future.exception()
+    if cancelled:
+        raise asyncio.CancelledError()
+
+
+class AgentServer:
+    """aiohttp application exposing sessions over HTTP and WebSocket"""
+
+    def __init__(self, manager: SessionManager, turn_workers: int = 64,
+                 eviction_interval: float = 60.0, metrics: Optional[MetricsRegistry] = REGISTRY):
+        """
+        Args:
+            manager: The session table
+            turn_workers: Threads running agent turns; bounds concurrent LLM calls
+            eviction_interval: Seconds between idle-session sweeps
+            metrics: Registry served at /metrics
+        """
+        self.manager = manager
+        self.eviction_interval = eviction_interval
+        self.metrics = metrics
+        # Agents are synchronous, so each turn occupies a worker thread while the loop keeps serving
+        self._turn_executor = ThreadPoolExecutor(max_workers=turn_workers, thread_name_prefix="turn")
+        self._eviction_task: Optional[asyncio.Task] = None
+
+    async def run_turn(self, session: Session, message: str) -> str:
+        """Run one turn of a session and return the full response"""
+        loop = asyncio.get_running_loop()
+        session.active += 1
+        try:
+            async with session.lock:
+                return await loop.run_in_executor(self._turn_executor, session.agent.process, message)
+        finally:
+            session.active -= 1
+            session.touch()
+
+    async def stream_turn(self, session: Session, message: str) -> AsyncIterator[str]:
+        """
+        Run one turn of a session, yielding text deltas as the agent produces them.
+
+        If the consumer stops early (client gone, task cancelled), the turn still
+        runs to completion in its thread without forwarding deltas, and the
+        session stays locked and busy until it has finished.
+        """
+        loop = asyncio.get_running_loop()
+        queue: asyncio.Queue = asyncio.Queue()
+        done = object()
+        abandoned = threading.Event()
+
+        def produce():
+            try:
+                for delta in session.agent.process_stream(message):
+                    # Keep consuming so the agent finishes the turn and its history stays consistent
+                    if not abandoned.is_set():
+                        loop.call_soon_threadsafe(queue.put_nowait, delta)
+            finally:
+                if not abandoned.is_set():
+                    loop.call_soon_threadsafe(queue.put_nowait, done)
+
+        session.active += 1
+        try:
+            async with session.lock:
+                future = loop.run_in_executor(self._turn_executor, produce)
+                try:
+                    while True:
+                        delta = await queue.get()
+                        if delta is done:
+                            break
+                        yield delta
+                finally:
+                    abandoned.set()
+                    await _wait_for_thread(future)
+                future.result()
+        finally:
+            session.active -= 1
+            session.touch()
+
+    def _session_id(self, request: web.Request) -> str:
+        session_id = request.match_info["session_id"]
+        if not SESSION_ID_PATTERN.match(session_id):
+            raise web.HTTPBadRequest(text="Invalid session ID")
+        return session_id
+
+    @staticmethod
+    async def _message(request: web.Request) -> str:
+        try:
+            body = await request.json()
+        except ValueError:
+            raise web.HTTPBadRequest(text="Body must be JSON")
+        message = body.get("message") if isinstance(body, dict) else None
+        if not isinstance(message, str) or not message:
+            raise web.HTTPBadRequest(text="Body must contain a non-empty 'message'")
+        return message
+
+    async def handle_create(self, request: web.Request) -> web.Response:
+        session = self.manager.create()
+        return web.json_response({"session_id": session.session_id}, status=201)
+
+    async def handle_get(self, request: web.Request) -> web.Response:
+        session = self.manager.get(self._session_id(request), create=False)
+        if session is None:
+            raise web.HTTPNotFound(text="Unknown session")
+        return web.json_response({
+            "session_id": session.session_id,
+            "history": session.agent.conversation_history
+        })
+
+    async def handle_delete(self, request: web.Request) -> web.Response:
+        if not self.manager.delete(self._session_id(request)):
+            raise web.HTTPNotFound(text="Unknown session")
+        return web.Response(status=204)
+
+    async def handle_message(self, request: web.Request) -> web.Response:
+        session_id = self._session_id(request)
+        message = await self._message(request)
+        session = self.manager.get(session_id)
+        response = await self.run_turn(session, message)
+        return web.json_response({"session_id": session_id, "response": response})
+
+    async def handle_websocket(self, request: web.Request) -> web.WebSocketResponse:
+        """
+        Stream turns over a WebSocket.
+
+        Clients send {"message": "..."} (or plain text) and receive
+        {"type": "delta", "text": ...} frames followed by {"type": "done", "response": ...}.
+        """
+        session_id = self._session_id(request)
+        ws = web.WebSocketResponse(heartbeat=30.0)
+        await ws.prepare(request)
+
+        async for frame in ws:
+            if frame.type != WSMsgType.TEXT:
+                continue
+            try:
+                payload = json.loads(frame.data)
+            except ValueError:
+                payload = frame.data
+            if isinstance(payload, dict):
+                if "message" not in payload:
+                    await ws.send_json({"type": "error", "error": "JSON frames must contain a 'message'"})
+                    continue
+                message = payload["message"]
+            else:
+                message = frame.data
+            if not isinstance(message, str) or not message:
+                await ws.send_json({"type": "error", "error": "Empty message"})
+                continue
+
+            # Look the session up per turn: it may have been evicted between messages
+            session = self.manager.get(session_id)
+            chunks = []
+            turn = self.stream_turn(session, message)
+            try:
+                async for delta in turn:
+                    chunks.append(delta)
+                    await ws.send_json({"type": "delta", "text": delta})
+            finally:
+                # Release the session only once its turn has really finished, even if sending failed
+                await turn.aclose()
+            await ws.send_json({"type": "done", "response": "".join(chunks)})
+
+        return ws
+
+    async def handle_metrics(self, request: web.Request) -> web.Response:
+        text = self.metrics.to_prometheus() if self.metrics is not None else ""
+        return web.Response(text=text, content_type="text/plain")
+
+    async def handle_health(self, request: web.Request) -> web.Response:
+        return web.json_response({"status": "ok", "live_sessions": len(self.manager)})
+
+    async def _eviction_loop(self) -> None:
+        while True:
+            await asyncio.sleep(self.eviction_interval)
+            self.manager.evict_idle()
+
+    async def _on_startup(self, app: web.Application) -> None:
+        self._eviction_task = asyncio.create_task(self._eviction_loop())
+
+    async def _on_cleanup(self, app: web.Application) -> None:
+        if self._eviction_task is not None:
+            self._eviction_task.cancel()
+        self._turn_executor.shutdown(wait=True)
+        self.manager.close()
+
+    def app(self) -> web.Application:
+        """Build the aiohttp application with every route registered"""
+        app = web.Application()
+        app.add_routes([
+            web.post("/sessions", self.handle_create),
+            web.get("/sessions/{session_id}", self.handle_get),
+            web.delete("/sessions/{session_id}", self.handle_delete),
+            web.post("/sessions/{session_id}/messages", self.handle_message),
+            web.get("/sessions/{session_id}/ws", self.handle_websocket),
+            web.get("/metrics", self.handle_metrics),
+            web.get("/health", self.handle_health),
+        ])
+        app.on_startup.append(self._on_startup)
+        app.on_cleanup.append(self._on_cleanup)
+        return app
+
+
+def serve(agent_factory: Callable[[], Any], state_dir: str = "sessions", host: str = "127.0.0.1",
+          port: int = 8765, idle_timeout: float = 900.0, max_live: int = 5000, turn_workers: int = 64) -> None:
+    """
+    Run the server until interrupted, persisting live sessions on shutdown.
+
+    Args:
+        agent_factory: Returns a fresh Agent; share the chat client and tool pool across agents
+        state_dir: Directory for evicted sessions
+        host: Interface to bind
+        port: Port to bind
+        idle_timeout: Seconds without a turn before a session is evicted to disk
+        max_live: Sessions kept in memory at most
+        turn_workers: Agent turns running at once
+    """
+    manager = SessionManager(agent_factory, SessionStore(state_dir), idle_timeout=idle_timeout, max_live=max_live)
+    server = AgentServer(manager, turn_workers=turn_workers, eviction_interval=min(60.0, idle_timeout / 2))
+    web.run_app(server.app(), host=host, port=port)
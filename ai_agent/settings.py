@@ -0,0 +1,25 @@
+# settings.py - On-demand, cached access to config.toml
+from functools import lru_cache
+from typing import Any, Dict
+
+CONFIG_PATH = 'config.toml'
+
+
+@lru_cache(maxsize=None)
+def load_config(path: str = CONFIG_PATH) -> Dict[str, Any]:
+    """
+    Parse a TOML config file once; later calls return the cached result.
+
+    Args:
+        path: Path to the config file (relative to the working directory)
+
+    Returns:
+        The parsed configuration
+    """
+    import toml
+    return toml.load(path)
+
+
+def deepseek_api_key(path: str = CONFIG_PATH) -> str:
+    """The DeepSeek API key from the config file"""
+    return load_config(path)['secrets']['DEEPSEEK_API']
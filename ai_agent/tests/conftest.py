@@ -2,6 +2,10 @@
 import pytest
 import os
 import sys
+import json
+import re
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
 
 # Add project directory to path
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
@@ -22,4 +26,74 @@ def setup_test_environment():
     # Cleanup after tests
     if os.path.exists("test_output"):
         import shutil
-        shutil.rmtree("test_output")
\ No newline at end of file
+        shutil.rmtree("test_output")
+
+
+class _ChatHandler(BaseHTTPRequestHandler):
+    """Minimal chat-completions endpoint used as a stand-in for DeepSeek"""
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+
+    def setup(self):
+        super().setup()
+        self.server.connections += 1
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length", 0))
+        payload = json.loads(self.rfile.read(length) or b"{}")
+        self.server.requests.append(payload)
+
+        # Responders return (status, body) or (status, body, extra_headers)
+        status, body, *extra = self.server.responder(payload)
+        if payload.get("stream") and status == 200:
+            self._send_stream(body["choices"][0]["message"]["content"])
+            return
+
+        data = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        for name, value in (extra[0] if extra else {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _send_stream(self, content):
+        """Send the content word by word as a chunked server-sent-event stream"""
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+
+        pieces = re.findall(r"\S+\s*|\s+", content)
+        events = [{"choices": [{"delta": {"content": piece}}]} for piece in pieces]
+        for event in [json.dumps(e) for e in events] + ["[DONE]"]:
+            data = f"data: {event}\n\n".encode()
+            self.wfile.write(b"%x\r\n%s\r\n" % (len(data), data))
+            self.wfile.flush()
+        self.wfile.write(b"0\r\n\r\n")
+
+    def log_message(self, format, *args):
+        pass
+
+
+def completion(content):
+    """Build a chat-completions response body with the given assistant content"""
+    return {"choices": [{"message": {"role": "assistant", "content": content}}]}
+
+
+@pytest.fixture
+def chat_server():
+    """Run a local chat-completions server; set `.responder` to change replies"""
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _ChatHandler)
+    server.daemon_threads = True
+    server.connections = 0
+    server.requests = []
+    server.responder = lambda payload: (200, completion("Hello from the stub server"))
+    server.url = f"http://127.0.0.1:{server.server_address[1]}/v1/chat/completions"
+
+    thread = threading.Thread(target=server.serve_forever, args=(0.05,), daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
@@ -1,6 +1,7 @@
 # tests/test_agent.py
 import pytest
 import json
+import time
 from unittest.mock import patch, MagicMock
 import sys
 import os
@@ -26,10 +27,10 @@ class TestAgent:
         """Create an agent instance with mock tools"""
         return Agent(tools=mock_tools)
     
-    @patch("openai.ChatCompletion.create")
+    @patch("deepseek.ChatModel.chat")
     def test_process_basic_response(self, mock_openai, agent):
         """Test processing a basic response without tool calls"""
-        # Configure mock OpenAI response
+        # Configure mock DeepSeek response
         mock_response = {
             "choices": [
                 {
@@ -50,10 +51,10 @@ class TestAgent:
         assert agent.conversation_history[0]["role"] == "user"
         assert agent.conversation_history[1]["role"] == "assistant"
     
-    @patch("openai.ChatCompletion.create")
+    @patch("deepseek.ChatModel.chat")
     def test_process_with_tool_call(self, mock_openai, agent):
         """Test processing a response with a tool call"""
-        # Configure mock OpenAI response with tool call
+        # Configure mock DeepSeek response with tool call
         mock_response = {
             "choices": [
                 {
@@ -87,7 +88,7 @@ class TestAgent:
         assert "mock_tool" in system_message["content"]
         assert "calculator" in system_message["content"]
     
-    @patch("openai.ChatCompletion.create", side_effect=Exception("Test error"))
+    @patch("deepseek.ChatModel.chat", side_effect=Exception("Test error"))
     def test_process_error_handling(self, mock_openai, agent):
         """Test error handling in the process method"""
         # Process a message that will cause an error
@@ -97,11 +98,54 @@ class TestAgent:
         assert "Error processing request" in result
         assert "Test error" in result
 
-
-
-
-
-
-
-
-
+    def test_process_stream_yields_deltas(self, agent):
+        """Test that streamed deltas are yielded and the reply lands in history"""
+        agent.deepseek_model = MagicMock()
+        agent.deepseek_model.chat_stream.return_value = iter(["Hello", ", ", "world"])
+        
+        deltas = list(agent.process_stream("Hi"))
+        
+        assert deltas == ["Hello", ", ", "world"]
+        assert agent.conversation_history[-1] == {"role": "assistant", "content": "Hello, world"}
+    
+    def test_process_stream_with_tool_call(self, agent):
+        """Test that a streamed tool call is executed and its result yielded"""
+        agent.deepseek_model = MagicMock()
+        agent.deepseek_model.chat_stream.return_value = iter([
+            "Let me calculate.\n```tool calculator\n", "{\"expression\": \"2+2\"}\n```"
+        ])
+        
+        deltas = list(agent.process_stream("What is 2+2?"))
+        
+        agent.tools["calculator"].assert_called_once_with(expression="2+2")
+        assert deltas[-1] == "\nI used calculator and got: 42"
+        assert "```tool" not in agent.conversation_history[-1]["content"]
+    
+    def test_all_tool_calls_run_concurrently(self, agent):
+        """Test that every tool block runs in parallel and results keep their order"""
+        def slow_tool(value):
+            time.sleep(0.2)
+            return f"slow {value}"
+        agent.tools["slow"] = slow_tool
+        
+        response = "".join(
+            f"Call {i}:\n```tool slow\n{{\"value\": {i}}}\n```\n" for i in range(3)
+        ) + "```tool calculator\n{\"expression\": \"2+2\"}\n```"
+        
+        start = time.monotonic()
+        clean_response, notes = agent._finish_turn(response)
+        elapsed = time.monotonic() - start
+        
+        assert elapsed < 0.5
+        assert notes == [f"I used slow and got: slow {i}" for i in range(3)] + ["I used calculator and got: 42"]
+        assert clean_response.index("slow 0") < clean_response.index("slow 1") < clean_response.index("slow 2")
+        assert "```tool" not in clean_response
+    
+    def test_tool_call_timeout(self, agent):
+        """Test that a call exceeding its timeout is reported without blocking the turn"""
+        agent.tools["hang"] = lambda: time.sleep(1)
+        agent.tool_timeouts["hang"] = 0.1
+        
+        _, notes = agent._finish_turn("```tool hang\n{}\n```")
+        
+        assert notes == ["I used hang and got: Error: Tool 'hang' timed out after 0.1s"]
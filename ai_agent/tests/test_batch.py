@@ -0,0 +1,75 @@
+# tests/test_batch.py
+import json
+import sys
+import os
+
+# Add the parent directory to the path so we can import the batch module
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import batch
+from agent import Agent
+from deepseek import ChatModel
+from resilience import RetryPolicy
+from tests.conftest import completion
+
+
+class TestRunBatch:
+    """Test suite for the batch runner"""
+
+    def test_sessions_are_isolated(self, chat_server, tmp_path):
+        """Test prompts and multi-turn scripts against the stub server"""
+        chat_server.responder = lambda payload: (
+            200, completion(f"{len(payload['messages'])} messages, last: {payload['messages'][-1]['content']}")
+        )
+        input_path = tmp_path / "input.jsonl"
+        output_path = tmp_path / "output.jsonl"
+        lines = [{"id": f"s{i}", "prompt": f"hello {i}"} for i in range(10)]
+        lines.append({"id": "multi", "turns": ["one", "two"]})
+        input_path.write_text("\n".join(json.dumps(line) for line in lines) + "\n")
+
+        chat_model = ChatModel(api_key="test", url=chat_server.url)
+        report = batch.run_batch(
+            str(input_path), str(output_path),
+            lambda: Agent(tools={}, chat_model=chat_model),
+            concurrency=4
+        )
+
+        results = {r["id"]: r for r in map(json.loads, output_path.read_text().splitlines())}
+        assert report["sessions"] == 11
+        assert report["turns"] == 12
+        assert report["failed_turns"] == 0
+        # Each single-prompt session only ever sees its own system + user message
+        assert results["s3"]["turns"][0]["response"] == "2 messages, last: hello 3"
+        assert results["multi"]["turns"][1]["response"] == "4 messages, last: two"
+
+    def test_failed_turns_are_counted(self, chat_server, tmp_path):
+        """Test that API failures are reported rather than aborting the batch"""
+        chat_server.responder = lambda payload: (500, {"error": "boom"})
+        input_path = tmp_path / "input.jsonl"
+        input_path.write_text(json.dumps({"prompt": "hi"}) + "\n")
+
+        report = batch.run_batch(
+            str(input_path), str(tmp_path / "output.jsonl"),
+            lambda: Agent(tools={}, chat_model=ChatModel(
+                api_key="test", url=chat_server.url, retry_policy=RetryPolicy(max_retries=0)
+            ))
+        )
+
+        assert report["failed_turns"] == 1
+
+    def test_agents_are_closed(self, chat_server, tmp_path):
+        """Test that every session's agent is closed, releasing its tool pool"""
+        chat_server.responder = lambda payload: (200, completion("ok"))
+        input_path = tmp_path / "input.jsonl"
+        input_path.write_text("".join(json.dumps({"prompt": f"hi {i}"}) + "\n" for i in range(3)))
+        chat_model = ChatModel(api_key="test", url=chat_server.url)
+        agents = []
+
+        def agent_factory():
+            agents.append(Agent(tools={}, chat_model=chat_model))
+            return agents[-1]
+
+        batch.run_batch(str(input_path), str(tmp_path / "output.jsonl"), agent_factory, concurrency=2)
+
+        assert len(agents) == 3
+        assert all(agent._tool_executor._shutdown for agent in agents)
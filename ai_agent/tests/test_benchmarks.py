@@ -0,0 +1,63 @@
+# tests/test_benchmarks.py
+import json
+import sys
+import os
+
+# Add the parent directory to the path so we can import the benchmark package
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks import agent_bench
+from benchmarks.agent_bench import compare, run_benchmark
+from benchmarks.mock_server import MockConfig
+
+
+class TestAgentBenchmark:
+    """Smoke test for the benchmark harness and mock server"""
+
+    def test_small_run(self):
+        """Test a tiny run end to end, including tool calls and the memory pass"""
+        config = MockConfig(latency_ms=5, completion_tokens=8, tool_call_ratio=0.5, seed=1)
+        report = run_benchmark(config, levels=[1, 4], sessions_per_level=4, turns=2, memory_sessions=3)
+
+        assert [level["concurrency"] for level in report["levels"]] == [1, 4]
+        for level in report["levels"]:
+            assert level["turns"] == 8
+            assert level["errors"] == 0
+            assert level["turns_per_s"] > 0
+            assert level["latency_ms"]["p50"] >= 5
+        assert report["memory"]["bytes_per_session"] > 0
+        assert report["meta"]["server"]["tool_call_ratio"] == 0.5
+        json.dumps(report)
+
+    def test_sessions_share_one_tool_pool(self, monkeypatch):
+        """Test that no session's agent starts a tool pool of its own"""
+        agents = []
+
+        class RecordingAgent(agent_bench.Agent):
+            def __init__(self, *args, **kwargs):
+                super().__init__(*args, **kwargs)
+                agents.append(self)
+        monkeypatch.setattr(agent_bench, "Agent", RecordingAgent)
+
+        config = MockConfig(latency_ms=1, completion_tokens=4, tool_call_ratio=1.0, seed=2)
+        run_benchmark(config, levels=[4], sessions_per_level=8, turns=1, memory_sessions=4)
+
+        assert len(agents) == 12
+        assert not any(agent._owns_tool_executor for agent in agents)
+
+    def test_compare_flags_regressions(self):
+        """Test that slower throughput, latency and memory are reported"""
+        baseline = {
+            "levels": [{"concurrency": 1, "turns_per_s": 100.0, "latency_ms": {"p50": 10, "p95": 20, "p99": 30}}],
+            "memory": {"bytes_per_session": 1000}
+        }
+        current = {
+            "levels": [{"concurrency": 1, "turns_per_s": 80.0, "latency_ms": {"p50": 10, "p95": 25, "p99": 30}}],
+            "memory": {"bytes_per_session": 1050}
+        }
+
+        regressions = compare(current, baseline, tolerance=0.1)
+
+        assert len(regressions) == 2
+        assert regressions[0].startswith("c=1: turns/s")
+        assert "p95" in regressions[1]
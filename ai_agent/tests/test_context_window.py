@@ -0,0 +1,69 @@
+# tests/test_context_window.py
+import sys
+import os
+
+# Add the parent directory to the path so we can import the window module
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from context_window import ConversationWindow, estimate_tokens, message_tokens
+
+SYSTEM = {"role": "system", "content": "You are SmolaGent."}
+
+
+def make_history(turns):
+    history = []
+    for i in range(turns):
+        history.append({"role": "user", "content": f"Question number {i}. " + "filler words " * 20})
+        history.append({"role": "assistant", "content": f"Answer number {i}. " + "more filler " * 20})
+    return history
+
+
+class TestEstimateTokens:
+    """Test suite for the local token estimator"""
+
+    def test_estimate_tokens(self):
+        """Test that words, punctuation and long words are counted"""
+        assert estimate_tokens("") == 0
+        assert estimate_tokens("Hi, you!") == 4
+        assert estimate_tokens("internationalization") == 5
+
+
+class TestConversationWindow:
+    """Test suite for the token-budgeted conversation window"""
+
+    def test_short_history_is_sent_verbatim(self):
+        """Test that nothing is folded while the history fits the budget"""
+        window = ConversationWindow(max_tokens=2000)
+        history = make_history(2)
+
+        assert window.build(SYSTEM, history) == [SYSTEM] + history
+        assert window.folded == 0
+
+    def test_payload_stays_bounded(self):
+        """Test that the payload stays within budget as the session grows"""
+        window = ConversationWindow(max_tokens=600, summary_max_tokens=150)
+        history = []
+        for turn in make_history(100):
+            history.append(turn)
+            messages = window.build(SYSTEM, history)
+            assert sum(message_tokens(m) for m in messages) <= 600
+
+        # Recent turns are verbatim, the oldest ones only survive in the summary
+        assert messages[-1] == history[-1]
+        assert messages[1]["content"].startswith("Summary of the earlier conversation")
+        assert len(history) == 200
+
+    def test_latest_message_always_kept(self):
+        """Test that an oversized latest message is still sent"""
+        window = ConversationWindow(max_tokens=50, summary_max_tokens=10)
+        history = [{"role": "user", "content": "word " * 500}]
+
+        assert window.build(SYSTEM, history)[-1] == history[0]
+
+    def test_cleared_history_resets_summary(self):
+        """Test that clearing the history also drops the rolling summary"""
+        window = ConversationWindow(max_tokens=300, summary_max_tokens=50)
+        window.build(SYSTEM, make_history(20))
+        history = [{"role": "user", "content": "fresh start"}]
+
+        assert window.build(SYSTEM, history) == [SYSTEM] + history
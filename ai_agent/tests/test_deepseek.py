@@ -0,0 +1,109 @@
+# tests/test_deepseek.py
+import pytest
+import asyncio
+import sys
+import os
+
+# Add the parent directory to the path so we can import the client module
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from deepseek import ChatModel, AsyncChatModel, SSEDecoder
+from resilience import RetryPolicy
+from tests.conftest import completion
+
+
+class TestChatModel:
+    """Test suite for the pooled synchronous client"""
+
+    def test_chat_returns_full_response(self, chat_server):
+        """Test that chat returns the decoded completion and sends the payload"""
+        model = ChatModel(api_key="test", url=chat_server.url)
+        result = model.chat([{"role": "user", "content": "Hi"}], temperature=0.2, max_tokens=16)
+
+        assert result["choices"][0]["message"]["content"] == "Hello from the stub server"
+        assert chat_server.requests[0]["model"] == "deepseek-chat"
+        assert chat_server.requests[0]["temperature"] == 0.2
+        assert chat_server.requests[0]["max_tokens"] == 16
+
+    def test_connection_is_reused(self, chat_server):
+        """Test that consecutive turns share one keep-alive connection"""
+        with ChatModel(api_key="test", url=chat_server.url) as model:
+            for _ in range(5):
+                model.chat([{"role": "user", "content": "Hi"}])
+
+        assert len(chat_server.requests) == 5
+        assert chat_server.connections == 1
+
+    def test_http_error_is_raised(self, chat_server):
+        """Test that HTTP errors still propagate to the caller"""
+        chat_server.responder = lambda payload: (500, {"error": "boom"})
+        model = ChatModel(api_key="test", url=chat_server.url, retry_policy=RetryPolicy(max_retries=0))
+
+        with pytest.raises(Exception):
+            model.chat([{"role": "user", "content": "Hi"}])
+
+
+class TestAsyncChatModel:
+    """Test suite for the asyncio client"""
+
+    def test_concurrent_chats(self, chat_server):
+        """Test that concurrent coroutines complete over a bounded pool"""
+        chat_server.responder = lambda payload: (200, completion(payload["messages"][0]["content"]))
+
+        async def run():
+            async with AsyncChatModel(api_key="test", url=chat_server.url, pool_maxsize=4) as model:
+                return await asyncio.gather(*[
+                    model.chat([{"role": "user", "content": f"msg {i}"}]) for i in range(10)
+                ])
+
+        results = asyncio.run(run())
+
+        contents = [r["choices"][0]["message"]["content"] for r in results]
+        assert contents == [f"msg {i}" for i in range(10)]
+        assert chat_server.connections <= 4
+
+    def test_no_sync_client_surface(self):
+        """Test that the async client does not inherit the sync context manager or fetch paths"""
+        model = AsyncChatModel(api_key="test")
+        assert not isinstance(model, ChatModel)
+        for name in ("__enter__", "__exit__", "_fetch", "_fetch_hedged"):
+            assert not hasattr(model, name)
+
+    def test_session_closed_on_exit(self, chat_server):
+        """Test that leaving the async context closes the aiohttp session"""
+        async def run():
+            async with AsyncChatModel(api_key="test", url=chat_server.url) as model:
+                await model.chat([{"role": "user", "content": "Hi"}])
+                session = model.session
+            return session
+
+        assert asyncio.run(run()).closed
+
+
+class TestStreaming:
+    """Test suite for server-sent-event streaming"""
+
+    def test_sse_decoder(self):
+        """Test event framing, multi-line data and comment lines"""
+        decoder = SSEDecoder()
+        lines = [": keep-alive", "data: {\"a\":", "data: 1}", "", "data: [DONE]", ""]
+        payloads = [p for p in (decoder.feed(line) for line in lines) if p is not None]
+
+        assert payloads == ["{\"a\":\n1}", "[DONE]"]
+
+    def test_chat_stream_yields_deltas(self, chat_server):
+        """Test that the sync client yields the completion piece by piece"""
+        model = ChatModel(api_key="test", url=chat_server.url)
+        deltas = list(model.chat_stream([{"role": "user", "content": "Hi"}]))
+
+        assert len(deltas) > 1
+        assert "".join(deltas) == "Hello from the stub server"
+        assert chat_server.requests[0]["stream"] is True
+
+    def test_async_chat_stream_yields_deltas(self, chat_server):
+        """Test that the async client yields the completion piece by piece"""
+        async def run():
+            async with AsyncChatModel(api_key="test", url=chat_server.url) as model:
+                return [d async for d in model.chat_stream([{"role": "user", "content": "Hi"}])]
+
+        assert "".join(asyncio.run(run())) == "Hello from the stub server"
@@ -0,0 +1,165 @@
+# tests/test_directory_tree.py
+import pytest
+import json
+import sys
+import os
+
+# directory_tree.py lives at the repository root, next to the ai_agent package
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+import directory_tree
+from directory_tree import TreeSnapshot, TreeWalker, get_directory_structure, iter_directory_structure
+
+
+@pytest.fixture
+def tree(tmp_path):
+    """Create a small tree with nested, hidden and excluded entries"""
+    root = tmp_path / "project"
+    (root / "src" / "pkg").mkdir(parents=True)
+    (root / "build").mkdir()
+    (root / ".git").mkdir()
+    for name in ("a.py", "b.py", "c.py", "d.py"):
+        (root / "src" / name).write_text("")
+    (root / "src" / "pkg" / "deep.py").write_text("")
+    (root / "build" / "out.o").write_text("")
+    (root / "README.md").write_text("")
+    return root
+
+
+class TestDirectoryTree:
+    """Test suite for the streaming directory tree walker"""
+
+    def test_full_tree(self, tree):
+        """Test the rendered tree, directories first and hidden entries skipped"""
+        assert get_directory_structure(str(tree)) == (
+            "project/\n"
+            "├── build/\n"
+            "│   └── out.o\n"
+            "├── src/\n"
+            "│   ├── pkg/\n"
+            "│   │   └── deep.py\n"
+            "│   ├── a.py\n"
+            "│   ├── b.py\n"
+            "│   ├── c.py\n"
+            "│   └── d.py\n"
+            "└── README.md\n"
+        )
+
+    def test_max_depth(self, tree):
+        """Test that directories below max_depth are listed but not entered"""
+        lines = list(iter_directory_structure(str(tree), max_depth=1))
+        assert lines == ["project/", "├── build/", "├── src/", "└── README.md"]
+
+    def test_exclude_globs(self, tree):
+        """Test exclusion by entry name and by root-relative path"""
+        lines = list(iter_directory_structure(str(tree), exclude=["build", "src/pkg", "*.md"]))
+        assert lines == ["project/", "└── src/", "    ├── a.py", "    ├── b.py", "    ├── c.py", "    └── d.py"]
+
+    def test_max_entries_truncation(self, tree):
+        """Test that only the first entries of a directory are shown, with a count of the rest"""
+        lines = list(iter_directory_structure(str(tree / "src"), max_entries=2))
+        assert lines == ["src/", "├── pkg/", "│   └── deep.py", "├── a.py", "└── ... (3 more entries)"]
+
+    def test_workers_produce_identical_output(self, tree):
+        """Test that parallel prefetching does not change the output"""
+        for i in range(20):
+            (tree / "src" / f"dir{i}").mkdir()
+            (tree / "src" / f"dir{i}" / "file.txt").write_text("")
+        assert get_directory_structure(str(tree), workers=4) == get_directory_structure(str(tree), workers=1)
+
+    def test_positional_arguments_keep_their_meaning(self, tree):
+        """Test that the original (path, prefix, is_last, ignore_hidden) positional order still binds"""
+        assert get_directory_structure(str(tree / "build"), "│   ", True, True) == (
+            "│   └── build/\n"
+            "│       └── out.o\n"
+        )
+        assert ".git/" in get_directory_structure(str(tree), "", False, False)
+
+    def test_missing_path(self, tmp_path):
+        """Test the error line for a path that does not exist"""
+        assert "does not exist" in get_directory_structure(str(tmp_path / "nope"))
+
+
+def run_main(monkeypatch, capsys, *args):
+    """Run the directory_tree command line and return its stdout"""
+    monkeypatch.setattr(sys, "argv", ["directory_tree.py", *args])
+    directory_tree.main()
+    return capsys.readouterr().out
+
+
+class TestTreeSnapshot:
+    """Test suite for snapshots, change reports and machine-readable output"""
+
+    def test_snapshot_reused_until_directory_changes(self, tree, tmp_path):
+        """Test that unchanged directories come from the snapshot and only changed ones are re-read"""
+        snapshot_path = str(tmp_path / "tree.json")
+        first = TreeSnapshot.load(snapshot_path, str(tree))
+        expected = list(TreeWalker(snapshot=first).walk(str(tree)))
+        assert (first.reused, first.rescanned) == (0, 4)
+        first.save(snapshot_path)
+
+        second = TreeSnapshot.load(snapshot_path, str(tree))
+        assert list(TreeWalker(snapshot=second).walk(str(tree))) == expected
+        assert (second.reused, second.rescanned) == (4, 0)
+        second.save(snapshot_path)
+
+        (tree / "src" / "e.py").write_text("")
+        third = TreeSnapshot.load(snapshot_path, str(tree))
+        lines = list(TreeWalker(snapshot=third).walk(str(tree)))
+        assert (third.reused, third.rescanned) == (3, 1)
+        assert "│   └── e.py" in lines
+
+    def test_snapshot_for_another_root_is_ignored(self, tree, tmp_path):
+        """Test that a snapshot written for a different root starts empty"""
+        snapshot_path = str(tmp_path / "tree.json")
+        snapshot = TreeSnapshot.load(snapshot_path, str(tree))
+        list(TreeWalker(snapshot=snapshot).walk(str(tree)))
+        snapshot.save(snapshot_path)
+        assert TreeSnapshot.load(snapshot_path, str(tree / "src")).directories == {}
+
+    def test_changes_report_added_removed_and_modified(self, tree, tmp_path, monkeypatch, capsys):
+        """Test that --changes lists added, removed and edited entries since the snapshot"""
+        snapshot_path = str(tmp_path / "tree.json")
+        run_main(monkeypatch, capsys, str(tree), "--snapshot", snapshot_path, "--changes")
+
+        (tree / "src" / "e.py").write_text("")
+        (tree / "src" / "a.py").unlink()
+        (tree / "build" / "out.o").unlink()
+        (tree / "build").rmdir()
+        (tree / "README.md").write_text("# project\n")
+
+        output = run_main(monkeypatch, capsys, str(tree), "--snapshot", snapshot_path, "--changes")
+        assert output.splitlines() == [
+            "~ README.md",
+            "- build/",
+            "- build/out.o",
+            "- src/a.py",
+            "+ src/e.py",
+        ]
+        assert run_main(monkeypatch, capsys, str(tree), "--snapshot", snapshot_path, "--changes") == ""
+
+    def test_changes_as_json(self, tree, tmp_path, monkeypatch, capsys):
+        """Test the record shape of --changes with --format json"""
+        snapshot_path = str(tmp_path / "tree.json")
+        run_main(monkeypatch, capsys, str(tree), "--snapshot", snapshot_path, "--changes")
+        (tree / "src" / "pkg" / "more.py").write_text("")
+
+        output = run_main(monkeypatch, capsys, str(tree), "--snapshot", snapshot_path, "--changes",
+                          "--format", "json")
+        assert json.loads(output) == [{"path": "src/pkg/more.py", "type": "file", "change": "added"}]
+
+    def test_json_format(self, tree, monkeypatch, capsys):
+        """Test that --format json prints one array of {path, type, depth} records"""
+        records = json.loads(run_main(monkeypatch, capsys, str(tree / "src"), "--format", "json"))
+        assert records[0]["path"] == "" and records[0]["type"] == "dir" and records[0]["depth"] == 0
+        assert {"path": "pkg/deep.py", "type": "file", "depth": 2} in records
+        assert {"path": "a.py", "type": "file", "depth": 1} in records
+        assert all(set(record) == {"path", "type", "depth"} for record in records)
+
+    def test_ndjson_format(self, tree, monkeypatch, capsys):
+        """Test that --format ndjson prints one JSON record per line, matching the json output"""
+        lines = run_main(monkeypatch, capsys, str(tree), "--format", "ndjson", "--max-entries", "1").splitlines()
+        records = [json.loads(line) for line in lines]
+        assert records == json.loads(run_main(monkeypatch, capsys, str(tree), "--format", "json",
+                                              "--max-entries", "1"))
+        assert {"path": "", "type": "omitted", "depth": 1, "count": 2} in records
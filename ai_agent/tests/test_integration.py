@@ -25,10 +25,10 @@ class TestIntegration:
         )
     
     @patch("task_management.ai_ml_logic.task_decomposition.decompose_task")
-    @patch("openai.ChatCompletion.create")
+    @patch("deepseek.ChatModel.chat")
     def test_agent_with_task_manager(self, mock_openai, mock_decompose, agent):
         """Test the integration between agent and task manager"""
-        # Configure the mock response from OpenAI
+        # Configure the mock response from DeepSeek
         mock_openai.return_value = {
             "choices": [
                 {
@@ -0,0 +1,104 @@
+# tests/test_llm_cache.py
+import pytest
+from unittest.mock import MagicMock
+import sys
+import os
+
+# Add the parent directory to the path so we can import the cache module
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from llm_cache import ResponseCache, CachedChatModel, cache_key
+from tests.conftest import completion
+
+MESSAGES = [{"role": "system", "content": "sys"}, {"role": "user", "content": "decompose the task X"}]
+
+
+class TestCacheKey:
+    """Test suite for canonical request hashing"""
+
+    def test_key_is_canonical(self):
+        """Test that key order and int/float temperature do not change the hash"""
+        reordered = [{"content": "sys", "role": "system"}, {"content": "decompose the task X", "role": "user"}]
+        assert cache_key("m", MESSAGES, 0, 512) == cache_key("m", reordered, 0.0, 512)
+
+    def test_key_depends_on_parameters(self):
+        """Test that every request field is part of the key"""
+        base = cache_key("m", MESSAGES, 0, 512)
+        assert base != cache_key("other", MESSAGES, 0, 512)
+        assert base != cache_key("m", MESSAGES[:1], 0, 512)
+        assert base != cache_key("m", MESSAGES, 0.5, 512)
+        assert base != cache_key("m", MESSAGES, 0, 256)
+
+
+class TestResponseCache:
+    """Test suite for the LRU/TTL response cache"""
+
+    def test_lru_eviction_and_stats(self):
+        """Test that the least recently used entry is evicted first"""
+        cache = ResponseCache(max_entries=2)
+        cache.put("a", completion("A"))
+        cache.put("b", completion("B"))
+        cache.get("a")
+        cache.put("c", completion("C"))
+
+        assert cache.get("b") is None
+        assert cache.get("a") == completion("A")
+        assert cache.stats()["hits"] == 2
+        assert cache.stats()["misses"] == 1
+        assert cache.stats()["size"] == 2
+
+    def test_ttl_expiry(self, monkeypatch):
+        """Test that entries older than the TTL are treated as misses"""
+        now = [1000.0]
+        monkeypatch.setattr("llm_cache.time.time", lambda: now[0])
+        cache = ResponseCache(ttl=10)
+        cache.put("a", completion("A"))
+
+        now[0] += 11
+        assert cache.get("a") is None
+
+    def test_disk_tier_survives_restart(self, tmp_path):
+        """Test that a fresh cache instance reads entries back from disk"""
+        ResponseCache(disk_dir=str(tmp_path)).put("a", completion("A"))
+
+        restarted = ResponseCache(disk_dir=str(tmp_path))
+        assert restarted.get("a") == completion("A")
+        assert restarted.stats()["disk_hits"] == 1
+
+
+class TestCachedChatModel:
+    """Test suite for the caching ChatModel wrapper"""
+
+    @pytest.fixture
+    def model(self):
+        model = MagicMock()
+        model.model = "deepseek-chat"
+        model.chat.return_value = completion("subtasks")
+        return model
+
+    def test_deterministic_requests_skip_network(self, model):
+        """Test that a repeated temperature-0 request is served from the cache"""
+        cached = CachedChatModel(model)
+        first = cached.chat(MESSAGES, temperature=0, max_tokens=512)
+        second = cached.chat(MESSAGES, temperature=0, max_tokens=512)
+
+        assert first == second
+        model.chat.assert_called_once()
+        assert cached.cache.stats()["hits"] == 1
+
+    def test_sampled_requests_bypass_cache(self, model):
+        """Test that requests above max_temperature always reach the model"""
+        cached = CachedChatModel(model)
+        cached.chat(MESSAGES, temperature=0.7)
+        cached.chat(MESSAGES, temperature=0.7)
+
+        assert model.chat.call_count == 2
+
+    def test_stream_populates_cache(self, model):
+        """Test that a streamed completion is cached for later calls"""
+        model.chat_stream.return_value = iter(["sub", "tasks"])
+        cached = CachedChatModel(model)
+
+        assert "".join(cached.chat_stream(MESSAGES, temperature=0)) == "subtasks"
+        assert cached.chat(MESSAGES, temperature=0) == completion("subtasks")
+        model.chat.assert_not_called()
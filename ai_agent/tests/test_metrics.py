@@ -0,0 +1,143 @@
+# tests/test_metrics.py
+import pytest
+import json
+import sys
+import os
+
+# Add the parent directory to the path so we can import the metrics module
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from agent import Agent
+from deepseek import ChatModel
+from metrics import MetricsRegistry, TurnTrace, latency_summary, percentile
+from tests.conftest import completion
+
+
+class TestPercentiles:
+    """Test suite for latency statistics"""
+
+    def test_percentile(self):
+        """Test nearest-rank percentiles"""
+        values = list(range(1, 101))
+        assert percentile(values, 50) == 50
+        assert percentile(values, 99) == 99
+        assert percentile([], 50) == 0.0
+
+    def test_latency_summary(self):
+        """Test the summary fields"""
+        summary = latency_summary([3.0, 1.0, 2.0])
+        assert summary["p50"] == 2.0
+        assert summary["max"] == 3.0
+        assert summary["mean"] == 2.0
+
+
+class TestMetricsRegistry:
+    """Test suite for histograms, counters and their export formats"""
+
+    def test_prometheus_export(self):
+        """Test cumulative buckets, sum/count and label rendering"""
+        registry = MetricsRegistry()
+        histogram = registry.histogram("phase_seconds", "Phase time", {"phase": "llm"}, buckets=(0.1, 1.0))
+        for value in (0.05, 0.5, 5.0):
+            histogram.observe(value)
+        registry.counter("turns_total", labels={"outcome": "ok"}).inc()
+
+        text = registry.to_prometheus()
+        assert "# TYPE phase_seconds histogram" in text
+        assert 'phase_seconds_bucket{phase="llm",le="0.1"} 1' in text
+        assert 'phase_seconds_bucket{phase="llm",le="1.0"} 2' in text
+        assert 'phase_seconds_bucket{phase="llm",le="+Inf"} 3' in text
+        assert 'phase_seconds_count{phase="llm"} 3' in text
+        assert 'turns_total{outcome="ok"} 1.0' in text
+
+    def test_json_lines_export(self):
+        """Test one JSON record per series"""
+        registry = MetricsRegistry()
+        registry.histogram("a", labels={"phase": "x"}).observe(0.2)
+        registry.counter("b").inc(3)
+
+        records = [json.loads(line) for line in registry.to_json_lines().splitlines()]
+        assert records[0]["name"] == "a" and records[0]["count"] == 1
+        assert records[1] == {"name": "b", "type": "counter", "labels": {}, "value": 3.0}
+
+    def test_label_values_are_escaped(self):
+        """Test that backslashes, quotes and newlines in label values cannot break the text format"""
+        registry = MetricsRegistry()
+        registry.counter("turns_total", labels={"outcome": 'a\\b"c\nd'}).inc()
+
+        assert 'turns_total{outcome="a\\\\b\\"c\\nd"} 1.0' in registry.to_prometheus()
+
+    def test_kind_conflict(self):
+        """Test that a name cannot be both a counter and a histogram"""
+        registry = MetricsRegistry()
+        registry.counter("x")
+        with pytest.raises(ValueError):
+            registry.histogram("x")
+
+
+class TestAgentInstrumentation:
+    """Test suite for per-turn spans recorded by the agent"""
+
+    def test_turn_breakdown(self, chat_server):
+        """Test spans, payload sizes and token usage for a turn with a tool call"""
+        body = completion("Sure.\n```tool echo\n{\"text\": \"hi\"}\n```")
+        body["usage"] = {"prompt_tokens": 120, "completion_tokens": 12, "total_tokens": 132}
+        chat_server.responder = lambda payload: (200, body)
+
+        registry = MetricsRegistry()
+        agent = Agent(
+            tools={"echo": lambda text: text},
+            chat_model=ChatModel(api_key="test", url=chat_server.url),
+            metrics=registry
+        )
+        traces = []
+        agent.add_turn_hook(traces.append)
+
+        agent.process("Say hi")
+
+        trace = traces[0]
+        names = [name for name, _ in trace.spans]
+        for phase in ("prompt", "llm", "llm.network", "llm.decode", "tool_parse", "tool:echo", "turn"):
+            assert phase in names
+        assert trace.duration("llm.network") <= trace.duration("llm") <= trace.duration("turn")
+        assert trace.attributes["prompt_tokens"] == 120
+        assert trace.attributes["request_bytes"] > 0
+        assert trace.attributes["tool_calls"] == 1
+
+        text = registry.to_prometheus()
+        assert 'agent_tokens_total{kind="completion"} 12.0' in text
+        assert 'agent_turns_total{outcome="ok"} 1.0' in text
+        assert 'agent_phase_seconds_count{phase="llm.network"} 1' in text
+
+    def test_unregistered_tool_names_share_one_label(self):
+        """Test that tool names the model invents are recorded under tool:unknown"""
+        registry = MetricsRegistry()
+        agent = Agent(tools={"echo": lambda text: text}, chat_model=object(), metrics=registry)
+        trace = TurnTrace("Hi")
+
+        agent._finish_turn('```tool bad"name\n{}\n```\n```tool echo\n{"text": "hi"}\n```', trace)
+
+        names = [name for name, _ in trace.spans]
+        assert "tool:unknown" in names and "tool:echo" in names
+        assert not any("bad" in name for name in names)
+
+    def test_error_turns_are_counted(self):
+        """Test that failed turns carry the error and are counted as such"""
+        registry = MetricsRegistry()
+        agent = Agent(tools={}, metrics=registry)
+        agent.deepseek_model = None
+
+        agent.process("Hi")
+
+        assert 'agent_turns_total{outcome="error"} 1.0' in registry.to_prometheus()
+
+    def test_trace_to_dict(self):
+        """Test that traces serialise for JSON-lines logging"""
+        trace = TurnTrace("hi")
+        with trace.span("llm"):
+            pass
+        trace.set("cache_hit", True)
+
+        record = json.loads(json.dumps(trace.to_dict()))
+        assert record["spans"][0]["name"] == "llm"
+        assert record["attributes"] == {"cache_hit": True}
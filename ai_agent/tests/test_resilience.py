@@ -0,0 +1,194 @@
+# tests/test_resilience.py
+import pytest
+import asyncio
+import threading
+import time
+import sys
+import os
+
+# Add the parent directory to the path so we can import the resilience module
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from deepseek import ChatModel, AsyncChatModel
+from resilience import RetryPolicy, TokenBucket, parse_retry_after
+from tests.conftest import completion
+
+MESSAGES = [{"role": "user", "content": "Hi"}]
+FAST_RETRIES = RetryPolicy(max_retries=3, base_delay=0.01)
+
+
+def failing_then_ok(failures, status=503, headers=None):
+    """Responder that fails `failures` times before answering"""
+    calls = {"n": 0}
+
+    def responder(payload):
+        calls["n"] += 1
+        if calls["n"] <= failures:
+            return status, {"error": "injected"}, headers or {}
+        return 200, completion("recovered")
+    return responder
+
+
+class TestPolicies:
+    """Test suite for the policy building blocks"""
+
+    def test_parse_retry_after(self):
+        """Test seconds, HTTP dates and garbage"""
+        assert parse_retry_after("3") == 3.0
+        assert parse_retry_after("Wed, 21 Oct 2015 07:28:00 GMT") == 0.0
+        assert parse_retry_after("soon") is None
+        assert parse_retry_after(None) is None
+
+    def test_backoff_is_bounded(self):
+        """Test that jittered delays stay within the exponential ceiling"""
+        policy = RetryPolicy(base_delay=1.0, max_delay=5.0)
+        assert all(0 <= policy.delay(0) <= 1.0 for _ in range(50))
+        assert all(0 <= policy.delay(10) <= 5.0 for _ in range(50))
+        assert policy.should_retry(0, 503) and not policy.should_retry(0, 400)
+        assert not policy.should_retry(3, 503)
+
+    def test_token_bucket_limits_and_adapts(self):
+        """Test that the bucket paces bursts and halves its rate on throttling"""
+        bucket = TokenBucket(rate=100, capacity=1)
+        assert bucket.reserve() == 0.0
+        assert 0 < bucket.reserve() <= 0.011
+
+        bucket.on_throttle(retry_after=0.5)
+        assert bucket.rate == 50
+        assert bucket.reserve() >= 0.4
+        bucket.on_success()
+        assert bucket.rate == pytest.approx(50.1)
+
+
+class TestChatModelFaults:
+    """Test suite for retries, throttling and hedging against a faulty server"""
+
+    def test_retries_transient_errors(self, chat_server):
+        """Test that 5xx responses are retried until the server recovers"""
+        chat_server.responder = failing_then_ok(2)
+        model = ChatModel(api_key="test", url=chat_server.url, retry_policy=FAST_RETRIES)
+
+        assert model.chat(MESSAGES)["choices"][0]["message"]["content"] == "recovered"
+        assert len(chat_server.requests) == 3
+
+    def test_gives_up_after_max_retries(self, chat_server):
+        """Test that retries are bounded"""
+        chat_server.responder = failing_then_ok(10)
+        model = ChatModel(api_key="test", url=chat_server.url, retry_policy=FAST_RETRIES)
+
+        with pytest.raises(Exception):
+            model.chat(MESSAGES)
+        assert len(chat_server.requests) == 4
+
+    def test_429_honours_retry_after(self, chat_server):
+        """Test that a 429 waits for Retry-After and slows the limiter down"""
+        chat_server.responder = failing_then_ok(1, status=429, headers={"Retry-After": "0.3"})
+        limiter = TokenBucket(rate=20)
+        model = ChatModel(api_key="test", url=chat_server.url, retry_policy=FAST_RETRIES, rate_limiter=limiter)
+
+        started = time.monotonic()
+        model.chat(MESSAGES)
+
+        assert time.monotonic() - started >= 0.3
+        assert limiter.rate < 20
+
+    def test_hedged_request_wins_over_slow_primary(self, chat_server):
+        """Test that a duplicate request is sent when the primary is slow"""
+        first = threading.Event()
+
+        def responder(payload):
+            if not first.is_set():
+                first.set()
+                time.sleep(1.0)
+                return 200, completion("slow")
+            return 200, completion("fast")
+        chat_server.responder = responder
+        model = ChatModel(api_key="test", url=chat_server.url, hedge_after=0.05)
+
+        started = time.monotonic()
+        result = model.chat(MESSAGES)
+
+        assert result["choices"][0]["message"]["content"] == "fast"
+        assert time.monotonic() - started < 0.9
+        assert model.hedges_sent == 1
+
+    def test_hedged_loser_is_abandoned(self, chat_server):
+        """Test that the losing request closes its response unread once the other one wins"""
+        first = threading.Event()
+
+        def responder(payload):
+            if not first.is_set():
+                first.set()
+                time.sleep(0.3)
+                return 200, completion("slow")
+            return 200, completion("fast")
+        chat_server.responder = responder
+        model = ChatModel(api_key="test", url=chat_server.url, hedge_after=0.05)
+
+        assert model.chat(MESSAGES)["choices"][0]["message"]["content"] == "fast"
+        deadline = time.monotonic() + 2.0
+        while model.hedges_abandoned == 0 and time.monotonic() < deadline:
+            time.sleep(0.01)
+        assert model.hedges_abandoned == 1
+        model.close()
+
+    def test_cancelled_loser_stops_retrying(self, chat_server):
+        """Test that a losing request does not send another attempt after the hedge has won"""
+        calls = {"n": 0}
+
+        def responder(payload):
+            calls["n"] += 1
+            if calls["n"] == 1:
+                time.sleep(0.2)
+                return 503, {"error": "injected"}
+            return 200, completion("fast")
+        chat_server.responder = responder
+        model = ChatModel(api_key="test", url=chat_server.url, hedge_after=0.05,
+                          retry_policy=RetryPolicy(max_retries=3, base_delay=0.3))
+
+        assert model.chat(MESSAGES)["choices"][0]["message"]["content"] == "fast"
+        deadline = time.monotonic() + 2.0
+        while model.hedges_abandoned == 0 and time.monotonic() < deadline:
+            time.sleep(0.01)
+        time.sleep(0.5)
+        assert model.hedges_abandoned == 1
+        assert len(chat_server.requests) == 2
+        model.close()
+
+    def test_streamed_error_response_is_closed(self, chat_server):
+        """Test that a non-retryable status closes a streamed response before raising"""
+        chat_server.responder = lambda payload: (400, {"error": "bad request"})
+        model = ChatModel(api_key="test", url=chat_server.url, retry_policy=FAST_RETRIES)
+        responses = []
+        post = model.session.post
+
+        def recording_post(*args, **kwargs):
+            responses.append(post(*args, **kwargs))
+            return responses[-1]
+        model.session.post = recording_post
+
+        with pytest.raises(Exception):
+            list(model.chat_stream(MESSAGES))
+        assert len(responses) == 1
+        assert responses[0].raw.closed
+        model.close()
+
+    def test_adaptive_hedging_waits_for_samples(self, chat_server):
+        """Test that percentile hedging stays off until latencies were observed"""
+        model = ChatModel(api_key="test", url=chat_server.url, hedge_after="p95")
+        assert model._hedge_delay() is None
+
+        for _ in range(20):
+            model.chat(MESSAGES)
+        assert model._hedge_delay() is not None
+        assert model.hedges_sent == 0
+
+    def test_async_retries(self, chat_server):
+        """Test that the async client retries transient errors too"""
+        chat_server.responder = failing_then_ok(2, status=502)
+
+        async def run():
+            async with AsyncChatModel(api_key="test", url=chat_server.url, retry_policy=FAST_RETRIES) as model:
+                return await model.chat(MESSAGES)
+
+        assert asyncio.run(run())["choices"][0]["message"]["content"] == "recovered"
@@ -0,0 +1,100 @@
+# tests/test_router.py
+import pytest
+from unittest.mock import MagicMock
+import sys
+import os
+
+# Add the parent directory to the path so we can import the router module
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from agent import Agent
+from router import IntentRouter, Route, default_router, match_arithmetic, match_prioritize
+from tools import calculator
+
+
+class TestMatchers:
+    """Test suite for the built-in route matchers"""
+
+    def test_match_arithmetic(self):
+        """Test that plain and wrapped arithmetic is recognised"""
+        assert match_arithmetic("(2+3)*4") == (1.0, {"expression": "(2+3)*4"})
+        assert match_arithmetic("what is (2+3)*4?") == (0.95, {"expression": "(2+3)*4"})
+        assert match_arithmetic("what is the capital of France?") is None
+        assert match_arithmetic("42") is None
+        assert match_arithmetic("10-3") == (1.0, {"expression": "10-3"})
+
+    @pytest.mark.parametrize("text", [
+        "12/25/2024", "2024-12-25", "555-1234", "555-123-4567", "(555) 123-4567", "1-800-555-1234",
+        "what is 12/25/2024?", "what's 555-1234"
+    ])
+    def test_dates_and_phone_numbers_are_not_arithmetic(self, text):
+        """Test that date and phone-number shapes are left to the LLM"""
+        assert match_arithmetic(text) is None
+        assert default_router().route(text) is None
+
+    def test_calculation_cue_overrides_date_shape(self):
+        """Test that an explicit calculate cue still routes a date-shaped expression"""
+        assert match_arithmetic("calculate 12/25/2024") == (0.95, {"expression": "12/25/2024"})
+
+    def test_match_prioritize(self):
+        """Test JSON and plain-list task inputs and their confidence"""
+        confidence, params = match_prioritize('prioritize these tasks: [{"id": 1, "description": "A"}]')
+        assert confidence == 0.95
+        assert params == {"tasks": [{"id": 1, "description": "A"}]}
+
+        confidence, params = match_prioritize("Prioritize my tasks: write report; buy milk")
+        assert confidence == 0.85
+        assert [t["description"] for t in params["tasks"]] == ["write report", "buy milk"]
+
+        assert match_prioritize("prioritize these tasks") is None
+
+
+class TestIntentRouter:
+    """Test suite for route selection"""
+
+    def test_threshold_and_available_tools(self):
+        """Test that low-confidence matches and unregistered tools are skipped"""
+        router = IntentRouter([Route("prioritize_tasks", match_prioritize, threshold=0.9)])
+
+        assert router.route("prioritize tasks: a, b") is None
+        assert router.route('prioritize tasks: [{"id": 1}]', available_tools=["calculator"]) is None
+        route, params = router.route('prioritize tasks: [{"id": 1}]')
+        assert route.tool_name == "prioritize_tasks"
+
+    def test_default_router_plain_task_lists(self):
+        """Test that plain task lists only route when the default router is asked to"""
+        assert default_router().route("prioritize tasks: a, b") is None
+        route, params = default_router(plain_task_lists=True).route("prioritize tasks: a, b")
+        assert route.tool_name == "prioritize_tasks"
+        assert [task["description"] for task in params["tasks"]] == ["a", "b"]
+
+
+class TestAgentRouting:
+    """Test suite for the agent's fast path"""
+
+    @pytest.fixture
+    def agent(self):
+        agent = Agent(tools={"calculator": calculator.calculate}, router=default_router())
+        agent.deepseek_model = MagicMock()
+        agent.deepseek_model.chat.return_value = {"choices": [{"message": {"content": "From the LLM"}}]}
+        return agent
+
+    def test_routed_input_skips_llm(self, agent):
+        """Test that arithmetic is answered locally and recorded in history"""
+        result = agent.process("what is (2+3)*4")
+
+        assert result == "I used calculator and got: 20"
+        agent.deepseek_model.chat.assert_not_called()
+        assert agent.conversation_history == [
+            {"role": "user", "content": "what is (2+3)*4"},
+            {"role": "assistant", "content": "I used calculator and got: 20"}
+        ]
+
+    def test_unmatched_input_uses_llm(self, agent):
+        """Test that other inputs still go to the model"""
+        assert agent.process("Tell me a joke") == "From the LLM"
+
+    def test_tool_error_falls_back_to_llm(self, agent):
+        """Test that a failing routed tool hands the input to the model"""
+        assert agent.process("1/0") == "From the LLM"
+        assert len(agent.conversation_history) == 2
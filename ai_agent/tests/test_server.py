@@ -0,0 +1,205 @@
+# tests/test_server.py
+import pytest
+import asyncio
+import sys
+import threading
+import time
+import os
+
+# Add the parent directory to the path so we can import the server module
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from aiohttp.test_utils import TestClient, TestServer
+
+from agent import Agent
+from deepseek import ChatModel
+from metrics import MetricsRegistry
+from server import AgentServer, Session, SessionManager, SessionStore
+from tests.conftest import completion
+
+
+def echo_responder(payload):
+    """Reply with the number of messages sent and the latest user message"""
+    messages = payload["messages"]
+    return 200, completion(f"{len(messages)} messages, last: {messages[-1]['content']}")
+
+
+@pytest.fixture
+def make_manager(chat_server, tmp_path):
+    chat_server.responder = echo_responder
+    chat_model = ChatModel(api_key="test", url=chat_server.url)
+
+    def factory(**kwargs):
+        return SessionManager(
+            lambda: Agent(tools={}, chat_model=chat_model, metrics=None),
+            SessionStore(str(tmp_path / "sessions")),
+            metrics=MetricsRegistry(),
+            **kwargs
+        )
+    return factory
+
+
+def run_with_client(manager, scenario):
+    """Run scenario(client) against the app for manager"""
+    async def main():
+        server = AgentServer(manager, turn_workers=8, metrics=MetricsRegistry())
+        async with TestClient(TestServer(server.app())) as client:
+            return await scenario(client)
+    return asyncio.run(main())
+
+
+class TestSessionManager:
+    """Test suite for the in-memory/on-disk session table"""
+
+    def test_evicted_session_is_restored(self, make_manager):
+        """Test that an idle session is persisted and comes back with its history"""
+        manager = make_manager(idle_timeout=10)
+        session = manager.get("abc")
+        session.agent.process("hello")
+
+        assert manager.evict_idle(now=session.last_used + 11) == 1
+        assert "abc" not in manager
+
+        restored = manager.get("abc", create=False)
+        assert [m["content"] for m in restored.agent.conversation_history] == ["hello", "2 messages, last: hello"]
+        assert restored.agent.process("again") == "4 messages, last: again"
+
+    def test_max_live_evicts_least_recently_used(self, make_manager):
+        """Test that the live table is bounded"""
+        manager = make_manager(max_live=2)
+        manager.get("a")
+        manager.get("b")
+        manager.get("a")
+        manager.get("c")
+
+        assert "b" not in manager
+        assert "a" in manager and "c" in manager
+        assert manager.store.exists("b")
+
+    def test_busy_sessions_are_not_evicted(self, make_manager):
+        """Test that a session with a turn in flight stays in memory"""
+        manager = make_manager(idle_timeout=0)
+        manager.get("a").active = 1
+
+        assert manager.evict_idle() == 0
+        assert "a" in manager
+
+    def test_unknown_session(self, make_manager):
+        """Test lookups and deletes of sessions that never existed"""
+        manager = make_manager()
+        assert manager.get("missing", create=False) is None
+        assert manager.delete("missing") is False
+
+
+class SlowStreamingAgent:
+    """Streams a few deltas slowly and records when the turn has finished"""
+
+    def __init__(self):
+        self.finished = threading.Event()
+
+    def process_stream(self, message):
+        for i in range(5):
+            time.sleep(0.02)
+            yield f"part {i} "
+        self.finished.set()
+
+
+class TestAgentServer:
+    """Test suite for the HTTP and WebSocket endpoints"""
+
+    def test_sessions_are_isolated(self, make_manager):
+        """Test concurrent turns across sessions over HTTP"""
+        manager = make_manager()
+
+        async def scenario(client):
+            ids = []
+            for _ in range(20):
+                response = await client.post("/sessions")
+                assert response.status == 201
+                ids.append((await response.json())["session_id"])
+
+            async def turn(session_id, text):
+                response = await client.post(f"/sessions/{session_id}/messages", json={"message": text})
+                return (await response.json())["response"]
+
+            first = await asyncio.gather(*(turn(i, f"hi {n}") for n, i in enumerate(ids)))
+            second = await turn(ids[3], "again")
+            history = await (await client.get(f"/sessions/{ids[3]}")).json()
+            return first, second, history
+
+        first, second, history = run_with_client(manager, scenario)
+        assert first[5] == "2 messages, last: hi 5"
+        assert second == "4 messages, last: again"
+        assert len(history["history"]) == 4
+
+    def test_websocket_streaming(self, make_manager):
+        """Test that deltas are streamed and followed by the full response"""
+        manager = make_manager()
+
+        async def scenario(client):
+            async with client.ws_connect("/sessions/ws-user/ws") as ws:
+                await ws.send_json({"message": "stream me"})
+                frames = []
+                while True:
+                    frame = await ws.receive_json()
+                    frames.append(frame)
+                    if frame["type"] == "done":
+                        return frames
+
+        frames = run_with_client(manager, scenario)
+        deltas = [f["text"] for f in frames if f["type"] == "delta"]
+        assert len(deltas) > 1
+        assert "".join(deltas) == frames[-1]["response"] == "2 messages, last: stream me"
+
+    def test_shutdown_persists_sessions(self, make_manager):
+        """Test that live sessions are written to disk when the app stops"""
+        manager = make_manager()
+
+        async def scenario(client):
+            await client.post("/sessions/keep/messages", json={"message": "remember me"})
+
+        run_with_client(manager, scenario)
+        assert len(manager) == 0
+        state = manager.store.load("keep")
+        assert state["conversation_history"][0]["content"] == "remember me"
+
+    def test_bad_requests(self, make_manager):
+        """Test validation of session IDs and bodies"""
+        manager = make_manager()
+
+        async def scenario(client):
+            bad_id = await client.post("/sessions/..%2Fetc/messages", json={"message": "x"})
+            no_message = await client.post("/sessions/ok/messages", json={"text": "x"})
+            missing = await client.get("/sessions/nobody")
+            return bad_id.status, no_message.status, missing.status
+
+        assert run_with_client(manager, scenario) == (400, 400, 404)
+
+    def test_abandoned_stream_keeps_session_locked_until_turn_finishes(self):
+        """Test that a consumer leaving mid-turn does not release the session while the agent still runs"""
+        agent = SlowStreamingAgent()
+
+        async def scenario():
+            server = AgentServer(SessionManager(lambda: agent, store=None), turn_workers=2, metrics=None)
+            session = Session("slow", agent)
+            turn = server.stream_turn(session, "go")
+            assert await turn.__anext__() == "part 0 "
+            assert session.busy and session.lock.locked()
+            await turn.aclose()
+            return agent.finished.is_set(), session.busy, session.lock.locked()
+
+        assert asyncio.run(scenario()) == (True, False, False)
+
+    def test_websocket_rejects_json_without_message(self, make_manager):
+        """Test that a JSON object without "message" is an error, not a turn with the raw frame"""
+        manager = make_manager()
+
+        async def scenario(client):
+            async with client.ws_connect("/sessions/ws-user/ws") as ws:
+                await ws.send_json({"text": "hi"})
+                return await ws.receive_json()
+
+        frame = run_with_client(manager, scenario)
+        assert frame["type"] == "error" and "message" in frame["error"]
+        assert not manager.store.exists("ws-user")
+
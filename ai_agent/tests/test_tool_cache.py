@@ -0,0 +1,104 @@
+# tests/test_tool_cache.py
+import time
+import sys
+import os
+
+# Add the parent directory to the path so we can import the tool_cache module
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from agent import Agent
+from tool_cache import CachePolicy, ToolCache, collapse_whitespace, remove_whitespace
+from tools.calculator import calculate
+from tools.text_processor import extract_entities, summarize
+
+
+class CountingTool:
+    """Wraps a function and counts how often it really runs"""
+
+    def __init__(self, func):
+        self.func = func
+        self.calls = 0
+
+    def __call__(self, **kwargs):
+        self.calls += 1
+        return self.func(**kwargs)
+
+
+def make_agent(tools, policies):
+    return Agent(tools=tools, chat_model=object(), metrics=None, tool_cache=ToolCache(policies))
+
+
+class TestCachePolicy:
+    """Test suite for cache key canonicalization"""
+
+    def test_defaults_and_normalizers(self):
+        """Test that equivalent calls share a key"""
+        policy = CachePolicy(defaults={"max_length": 200}, normalize={"text": collapse_whitespace})
+        assert policy.key({"text": "a  b "}) == policy.key({"text": "a b", "max_length": 200})
+        assert policy.key({"text": "a b"}) != policy.key({"text": "a b", "max_length": 50})
+
+    def test_remove_whitespace(self):
+        """Test the arithmetic canonicalizer"""
+        assert remove_whitespace(" 2 +\t3 ") == "2+3"
+        assert remove_whitespace(5) == 5
+
+
+class TestToolCache:
+    """Test suite for memoized tool calls through the agent"""
+
+    def test_repeated_calls_hit_the_cache(self):
+        """Test that the tool runs once for equivalent calls and stats are kept"""
+        calculator = CountingTool(calculate)
+        agent = make_agent({"calculator": calculator},
+                           {"calculator": CachePolicy(normalize={"expression": remove_whitespace})})
+
+        assert agent._execute_tool("calculator", '{"expression": "2 + 3"}') == "5"
+        assert agent._execute_tool("calculator", '{"expression": "2+3"}') == "5"
+        assert calculator.calls == 1
+
+        stats = agent.tool_cache.stats()["calculator"]
+        assert stats["hits"] == 1 and stats["misses"] == 1
+        assert stats["hit_rate"] == 0.5
+
+    def test_cache_is_shared_across_agents(self):
+        """Test that one session's result serves another"""
+        summarizer = CountingTool(summarize)
+        cache = ToolCache({"summarize": CachePolicy(defaults={"max_length": 200})})
+        agents = [Agent(tools={"summarize": summarizer}, chat_model=object(), tool_cache=cache) for _ in range(2)]
+
+        agents[0]._call_tool("summarize", {"text": "Short text."})
+        agents[1]._call_tool("summarize", {"text": "Short text.", "max_length": 200})
+        assert summarizer.calls == 1
+
+    def test_errors_are_not_cached(self):
+        """Test that failing calls are retried rather than memoized"""
+        calculator = CountingTool(calculate)
+        agent = make_agent({"calculator": calculator}, {"calculator": CachePolicy()})
+
+        for _ in range(2):
+            assert agent._call_tool("calculator", {"expression": "1/0"}).startswith("Error")
+        assert calculator.calls == 2
+
+    def test_results_are_copied(self):
+        """Test that mutating a returned value cannot corrupt the cache"""
+        agent = make_agent({"entities": extract_entities}, {"entities": CachePolicy()})
+        first = agent._call_tool("entities", {"text": "mail a@b.com"})
+        first["emails"].append("junk")
+
+        assert agent._call_tool("entities", {"text": "mail a@b.com"}) == {"emails": ["a@b.com"]}
+
+    def test_ttl_and_uncached_tools(self, monkeypatch):
+        """Test expiry, and that tools without a policy always run"""
+        counted = CountingTool(lambda value: value)
+        uncached = CountingTool(lambda value: value)
+        agent = make_agent({"counted": counted, "uncached": uncached}, {"counted": CachePolicy(ttl=10)})
+
+        agent._call_tool("counted", {"value": 1})
+        agent._call_tool("uncached", {"value": 1})
+        agent._call_tool("uncached", {"value": 1})
+        now = time.time()
+        monkeypatch.setattr(time, "time", lambda: now + 11)
+        agent._call_tool("counted", {"value": 1})
+
+        assert counted.calls == 2
+        assert uncached.calls == 2
@@ -0,0 +1,93 @@
+# tests/test_tool_manifest.py
+import pytest
+from typing import Any, Dict, List, Optional
+from unittest.mock import MagicMock
+import sys
+import os
+
+# Add the parent directory to the path so we can import the manifest modules
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from agent import Agent
+from tool_manifest import build_manifest, describe_tool, manifest_report, tool_signature
+from tool_registry import ToolRegistry
+
+
+def prioritize(tasks: List[Dict[str, Any]], criteria: Optional[Dict[str, float]] = None, mode: str = "fast") -> List[Dict[str, Any]]:
+    """
+    Prioritize a list of tasks.
+
+    Args:
+        tasks: List of task dictionaries
+        criteria: Dictionary of criteria weights (optional)
+        mode: Ranking mode
+
+    Returns:
+        Prioritized list of tasks
+    """
+    return tasks
+
+
+class TestToolManifest:
+    """Test suite for manifest generation"""
+
+    def test_signature_from_type_hints(self):
+        """Test that parameters, hints and JSON defaults are rendered"""
+        assert tool_signature(prioritize) == (
+            'tasks: List[Dict[str, Any]], criteria: Optional[Dict[str, float]] = null, mode: str = "fast"'
+        )
+
+    def test_compact_and_full_styles(self):
+        """Test that compact keeps only the summary line while full keeps the docstring"""
+        compact = describe_tool("prioritize_tasks", prioritize)
+        full = describe_tool("prioritize_tasks", prioritize, style="full")
+
+        assert compact.startswith("- prioritize_tasks(tasks: ")
+        assert compact.endswith("): Prioritize a list of tasks.")
+        assert "Args:" in full and "Args:" not in compact
+
+    def test_unknown_style(self):
+        """Test that an unknown style is rejected"""
+        with pytest.raises(ValueError):
+            build_manifest({"p": prioritize}, style="verbose")
+
+    def test_report_shows_savings(self):
+        """Test that the report compares both formats"""
+        report = manifest_report({"prioritize_tasks": prioritize})
+
+        assert report["compact"]["tokens"] < report["full"]["tokens"]
+        assert report["tokens_saved"] > 0
+
+
+class TestManifestMemoization:
+    """Test suite for the memoized system prompt"""
+
+    @pytest.fixture
+    def agent(self):
+        return Agent(tools={"prioritize_tasks": prioritize})
+
+    def test_system_message_is_reused(self, agent):
+        """Test that the prompt is built once while the tools are unchanged"""
+        first = agent._create_system_message()
+        assert agent._create_system_message() is first
+
+    def test_registration_invalidates(self, agent):
+        """Test that registering or removing a tool rebuilds the prompt"""
+        first = agent._create_system_message()
+        agent.tools["calculator"] = MagicMock(__doc__="Evaluate an expression.")
+        second = agent._create_system_message()
+        del agent.tools["prioritize_tasks"]
+        third = agent._create_system_message()
+
+        assert "calculator" in second["content"] and "calculator" not in first["content"]
+        assert "prioritize_tasks" not in third["content"]
+
+    def test_registry_version(self):
+        """Test that every mutation bumps the registry version"""
+        registry = ToolRegistry({"a": prioritize})
+        version = registry.version
+        registry.update(b=prioritize)
+        registry.pop("a")
+
+        assert registry.version == version + 2
+        assert list(registry) == ["b"]
@@ -0,0 +1,85 @@
+# tests/test_tool_registry.py
+import pytest
+import sys
+import os
+
+# Add the parent directory to the path so we can import the tool_registry module
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import settings
+from tool_registry import LazyTool, ToolRegistry
+from tool_manifest import describe_tool, tool_signature
+
+
+@pytest.fixture
+def lazy_module(tmp_path, monkeypatch):
+    """A throwaway module on sys.path that records when it is imported"""
+    (tmp_path / "lazy_sample.py").write_text(
+        "from typing import List\n"
+        "IMPORTED = True\n"
+        "def scale(values: List[int], factor: float = 2.0, *, label: str = 'x') -> str:\n"
+        "    \"\"\"Scale values by a factor.\n\n    Args:\n        values: Numbers\n    \"\"\"\n"
+        "    return label + str([v * factor for v in values])\n"
+    )
+    monkeypatch.syspath_prepend(str(tmp_path))
+    yield "lazy_sample"
+    sys.modules.pop("lazy_sample", None)
+
+
+class TestLazyTool:
+    """Test suite for tools that are imported on first call"""
+
+    def test_describing_does_not_import(self, lazy_module):
+        """Test that the manifest is built from source without importing the module"""
+        tool = LazyTool(lazy_module, "scale")
+
+        assert tool_signature(tool) == 'values: List[int], factor: float = 2.0, label: str = "x"'
+        assert describe_tool("scale", tool) == (
+            '- scale(values: List[int], factor: float = 2.0, label: str = "x"): Scale values by a factor.'
+        )
+        assert "Args:" in describe_tool("scale", tool, style="full")
+        assert lazy_module not in sys.modules
+        assert not tool.resolved
+
+    def test_first_call_imports(self, lazy_module):
+        """Test that calling the tool resolves and caches the real function"""
+        tool = LazyTool(lazy_module, "scale")
+
+        assert tool([1, 2], factor=3) == "x[3, 6]"
+        assert tool.resolved
+        assert lazy_module in sys.modules
+
+    def test_signature_matches_eager_function(self):
+        """Test that the source-derived signature matches the imported function's"""
+        from tools import web_search, task_manager
+
+        for module, func in ((web_search, web_search.search), (task_manager, task_manager.prioritize_tasks)):
+            lazy = LazyTool(module.__name__, func.__name__)
+            assert tool_signature(lazy) == tool_signature(func)
+
+    def test_missing_function(self, lazy_module):
+        """Test that a wrong attribute name fails loudly"""
+        with pytest.raises(AttributeError):
+            tool_signature(LazyTool(lazy_module, "nope"))
+
+    def test_registry_holds_lazy_tools(self, lazy_module):
+        """Test that lazy tools register like any other callable"""
+        registry = ToolRegistry({"scale": LazyTool(lazy_module, "scale")})
+        assert registry["scale"]([1]) == "x[2.0]"
+
+
+class TestSettings:
+    """Test suite for on-demand configuration loading"""
+
+    def test_config_is_loaded_once(self, tmp_path):
+        """Test that the parsed config is cached per path"""
+        path = tmp_path / "config.toml"
+        path.write_text('[secrets]\nDEEPSEEK_API = "key-1"\n')
+        settings.load_config.cache_clear()
+
+        first = settings.load_config(str(path))
+        path.write_text('[secrets]\nDEEPSEEK_API = "key-2"\n')
+
+        assert settings.load_config(str(path)) is first
+        assert settings.deepseek_api_key(str(path)) == "key-1"
+        settings.load_config.cache_clear()
@@ -0,0 +1,115 @@
+# tests/test_tool_results.py
+import sys
+import os
+
+# Add the parent directory to the path so we can import the tool_results module
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from agent import Agent
+from context_window import estimate_tokens
+from tool_results import ResultPolicy, ResultShaper, ResultStore
+
+
+def log_text(lines):
+    return "\n".join(f"2024-01-01 12:00:{i % 60:02d} INFO request {i} served" for i in range(lines))
+
+
+class TestResultShaper:
+    """Test suite for capping tool results"""
+
+    def test_small_results_are_untouched(self):
+        """Test that results within the cap are inlined as before"""
+        shaper = ResultShaper()
+        assert shaper.shape("calculator", 4) == "4"
+        assert len(shaper.store) == 0
+
+    def test_large_text_is_truncated(self):
+        """Test head/tail excerpt, summary and handle for an oversized result"""
+        text = log_text(5000)
+        shaper = ResultShaper(default=ResultPolicy(max_tokens=300))
+
+        shaped = shaper.shape("read_file", text)
+
+        assert estimate_tokens(shaped) <= 300
+        assert shaped.startswith("2024-01-01 12:00:00 INFO request 0 served")
+        assert "request 4999 served" in shaped
+        assert "5,000 lines" in shaped
+        assert "result-1" in shaped
+        assert shaper.store.get("result-1") == text
+
+    def test_byte_cap_and_per_tool_policy(self):
+        """Test that a tool's own byte cap overrides the default"""
+        shaper = ResultShaper(policies={"prioritize_tasks": ResultPolicy(max_tokens=None, max_bytes=500)})
+        tasks = [{"id": i, "priority": i % 3} for i in range(10000)]
+
+        shaped = shaper.shape("prioritize_tasks", tasks)
+
+        assert len(shaped.encode("utf-8")) <= 500
+        assert "list of 10,000 items" in shaped
+        assert shaper.store.get("result-1") is tasks
+
+    def test_read_pages(self):
+        """Test paging through a stored result"""
+        shaper = ResultShaper()
+        handle = shaper.store.put("abcdefghij")
+
+        assert shaper.read(handle, offset=2, length=3) == "[result-1 characters 2-5 of 10]\ncde"
+        assert shaper.read("result-99").startswith("Error")
+
+    def test_store_is_bounded(self):
+        """Test that the oldest results are dropped"""
+        store = ResultStore(max_entries=2)
+        first = store.put("a")
+        store.put("b")
+        store.put("c")
+        assert first not in store
+        assert len(store) == 2
+
+
+class TestAgentResultShaping:
+    """Test suite for result shaping inside the agent"""
+
+    def test_history_stays_small_and_handle_resolves(self):
+        """Test that a huge tool result is capped in history but usable by the next tool"""
+        text = log_text(20000)
+        agent = Agent(
+            tools={"read_file": lambda file_path: text, "count_lines": lambda text: text.count("\n") + 1},
+            chat_model=object(),
+            metrics=None,
+            result_shaper=ResultShaper(default=ResultPolicy(max_tokens=200))
+        )
+
+        clean, notes = agent._finish_turn('```tool read_file\n{"file_path": "big.log"}\n```')
+        assert estimate_tokens(agent.conversation_history[-1]["content"]) < 250
+        assert "result-1" in notes[0]
+
+        _, notes = agent._finish_turn('```tool count_lines\n{"text": "result-1"}\n```')
+        assert notes[0] == "I used count_lines and got: 20000"
+
+        _, notes = agent._finish_turn('```tool read_result\n{"handle": "result-1", "offset": 0, "length": 10}\n```')
+        assert notes[0].endswith("2024-01-01")
+
+    def test_non_object_params_fail_only_their_call(self):
+        """Test that a block whose JSON is not an object yields an error note and the other calls still run"""
+        agent = Agent(tools={"echo": lambda text: text}, chat_model=object(), metrics=None)
+
+        _, notes = agent._finish_turn('```tool echo\n[1, 2]\n```\n```tool echo\n{"text": "hi"}\n```')
+
+        assert notes == [
+            "I used echo and got: Error executing tool 'echo': parameters must be a JSON object",
+            "I used echo and got: hi"
+        ]
+
+    def test_raising_call_fails_only_its_call(self):
+        """Test that an exception escaping a tool call becomes that call's error result"""
+        agent = Agent(tools={"echo": lambda text: text}, chat_model=object(), metrics=None)
+
+        def broken(tool_name, params_str):
+            if params_str == "{}":
+                raise RuntimeError("boom")
+            return "ok"
+        agent._execute_tool = broken
+
+        assert agent._execute_tools([("echo", "{}"), ("echo", '{"text": "hi"}')]) == [
+            ("echo", "Error executing tool 'echo': boom"), ("echo", "ok")
+        ]
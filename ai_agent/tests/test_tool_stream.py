@@ -0,0 +1,121 @@
+# tests/test_tool_stream.py
+import pytest
+import time
+import sys
+import os
+from unittest.mock import MagicMock
+
+# Add the parent directory to the path so we can import the tool_stream module
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from agent import Agent
+from tool_stream import TOOL_CALL_PATTERN, ToolBlockParser
+
+COMPLETION = (
+    "First I'll check.\n```tool calculator\n{\"expression\": \"2+2\"}\n```\n"
+    "Some `inline` code and ``` fences ```.\n"
+    "```tool schedule_tasks\n{\"tasks\": [], \"time_frame\": \"week\"}\n```\nDone."
+)
+
+
+class TestToolBlockParser:
+    """Test suite for incremental tool block detection"""
+
+    @pytest.mark.parametrize("piece", [1, 3, 7, len(COMPLETION)])
+    def test_matches_final_parse(self, piece):
+        """Test that any chunking yields the blocks the final regex finds, at the same offsets"""
+        parser = ToolBlockParser()
+        found = []
+        for i in range(0, len(COMPLETION), piece):
+            found.extend(parser.feed(COMPLETION[i:i + piece]))
+
+        expected = list(TOOL_CALL_PATTERN.finditer(COMPLETION))
+        assert [(m.start(), m.group(1), m.group(2)) for m in found] == \
+               [(m.start(), m.group(1), m.group(2)) for m in expected]
+        assert parser.text == COMPLETION
+
+    def test_block_reported_when_it_closes(self):
+        """Test that a block is reported by the delta carrying its closing fence"""
+        parser = ToolBlockParser()
+        assert parser.feed("```tool calculator\n{\"expression\": \"1\"}\n``") == []
+        assert [m.group(1) for m in parser.feed("`\nmore text")] == ["calculator"]
+        assert parser.feed(" and more") == []
+
+
+class TestSpeculativeExecution:
+    """Test suite for starting tools while the completion streams"""
+
+    def make_agent(self, tools, **kwargs):
+        return Agent(tools=tools, chat_model=MagicMock(), metrics=None, **kwargs)
+
+    def slow_stream(self):
+        yield "Scheduling now.\n```tool slow\n{\"value\": 1}\n```\n"
+        # The model keeps writing while the tool runs
+        time.sleep(0.3)
+        yield "That should take a moment."
+
+    def test_tool_overlaps_generation(self):
+        """Test that a tool started mid-stream finishes alongside the stream"""
+        started = []
+
+        def slow(value):
+            started.append(time.monotonic())
+            time.sleep(0.3)
+            return f"done {value}"
+
+        agent = self.make_agent({"slow": slow}, speculative_tools={"slow"})
+        agent.deepseek_model.chat_stream.return_value = self.slow_stream()
+
+        begin = time.monotonic()
+        deltas = list(agent.process_stream("Plan my week"))
+        elapsed = time.monotonic() - begin
+
+        assert started[0] - begin < 0.2
+        assert elapsed < 0.5
+        assert deltas[-1] == "\nI used slow and got: done 1"
+        assert len(started) == 1
+
+    def test_speculation_can_be_disabled(self):
+        """Test that tools wait for the full completion when speculation is off"""
+        calls = []
+        agent = self.make_agent({"slow": lambda value: calls.append(time.monotonic()) or "ok"},
+                                speculate=False, speculative_tools={"slow"})
+        agent.deepseek_model.chat_stream.return_value = self.slow_stream()
+
+        begin = time.monotonic()
+        list(agent.process_stream("Plan my week"))
+
+        assert calls[0] - begin >= 0.3
+
+    def test_tools_outside_allow_list_wait_for_completion(self):
+        """Test that a tool with side effects only runs once the completion has finished"""
+        calls = []
+        agent = self.make_agent({"slow": lambda value: calls.append(time.monotonic()) or "ok"})
+        agent.deepseek_model.chat_stream.return_value = self.slow_stream()
+
+        begin = time.monotonic()
+        deltas = list(agent.process_stream("Plan my week"))
+
+        assert "slow" not in agent.speculative_tools
+        assert calls[0] - begin >= 0.3
+        assert deltas[-1] == "\nI used slow and got: ok"
+
+    def test_default_allow_list_excludes_side_effects(self):
+        """Test that writing and script tools are never started mid-stream by default"""
+        agent = self.make_agent({"write_file": MagicMock(), "run_task_script": MagicMock(),
+                                 "read_file": MagicMock()})
+        assert "read_file" in agent.speculative_tools
+        assert "write_file" not in agent.speculative_tools
+        assert "run_task_script" not in agent.speculative_tools
+
+    def test_invalid_blocks_are_not_started_early(self):
+        """Test that unknown tools and bad JSON fall through to the normal error path"""
+        agent = self.make_agent({"echo": lambda text: text})
+        agent.deepseek_model.chat_stream.return_value = iter([
+            "```tool echo\n{not json}\n```", "```tool missing\n{}\n```"
+        ])
+
+        deltas = list(agent.process_stream("Hi"))
+
+        assert "Error: Invalid JSON parameters for tool 'echo'" in deltas[-1]
+        assert "Error: Tool 'missing' not found" in deltas[-1]
@@ -1,6 +1,7 @@
 # tests/test_tools.py
 import pytest
 import json
+import time
 from unittest.mock import patch, MagicMock
 import sys
 import os
@@ -9,7 +10,7 @@ import os
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 # Import the tools modules
-from tools import calculator, file_operations
+from tools import calculator, file_operations, file_search, text_processor
 
 class TestCalculator:
     """Test suite for the calculator tool"""
@@ -37,6 +38,76 @@ class TestCalculator:
         result = calculator.calculate("__import__('os').system('echo hacked')")
         assert "Error" in result
         assert "Invalid characters" in result
+    
+    def test_calculate_rejects_non_arithmetic(self):
+        """Test that attribute access and unknown functions are refused"""
+        assert "Unsupported syntax" in calculator.calculate("abs.__class__")
+        assert "Unknown function" in calculator.calculate("exit(1)")
+    
+    def test_calculate_with_variables(self):
+        """Test named variables alongside math constants"""
+        assert calculator.calculate("effort * weight", {"effort": 3, "weight": 1.5}) == "4.5"
+        assert calculator.calculate("2 * pi * r", {"r": 1}) == str(2 * 3.141592653589793)
+        assert "Undefined variable" in calculator.calculate("effort * 2")
+        assert "must be a number" in calculator.calculate("x", {"x": "1"})
+    
+    def test_calculate_guards_huge_numbers(self):
+        """Test that runaway integer growth is refused instead of computed"""
+        assert "Exponent too large" in calculator.calculate("9 ** 9 ** 9")
+        assert "Exponent too large" in calculator.calculate("pow(10, 100000)")
+        assert "exceeds" in calculator.calculate("factorial(100000)")
+        assert calculator.calculate("2 ** 64") == "18446744073709551616"
+    
+    def test_compiled_expressions_are_cached(self):
+        """Test that repeated expression text reuses the compiled form"""
+        calculator.compile_expression.cache_clear()
+        for rate in (1, 2, 3):
+            calculator.calculate("hours * rate", {"hours": 2, "rate": rate})
+        info = calculator.compile_expression.cache_info()
+        assert info.misses == 1 and info.hits == 2
+    
+    def test_calculate_many_with_lists(self):
+        """Test vectorized evaluation with list and scalar bindings"""
+        summary = calculator.calculate_many("effort * weight + bonus",
+                                            {"effort": [1, 2, 3, 4], "weight": [2, 2, 2, 2], "bonus": 1})
+        assert summary["count"] == 4
+        assert summary["sum"] == 24.0
+        assert summary["min"] == 3.0 and summary["max"] == 9.0
+        assert summary["head"] == [3.0, 5.0, 7.0, 9.0]
+    
+    def test_calculate_many_with_csv(self, tmp_path, monkeypatch):
+        """Test binding CSV columns and writing the results to a file"""
+        monkeypatch.chdir(tmp_path)
+        (tmp_path / "tasks.csv").write_text("task,effort,weight\na,3,0.5\nb,5,\nc,2,2\n")
+        
+        summary = calculator.calculate_many("effort * w", {"w": "weight"}, csv_path="tasks.csv",
+                                            output_path="scores.csv")
+        
+        assert summary["nan_count"] == 1
+        assert summary["head"] == [1.5, None, 4.0]
+        assert summary["output_path"] == "scores.csv"
+        lines = (tmp_path / "scores.csv").read_text().splitlines()
+        assert lines[0] == "effort,w,result"
+        assert lines[3] == "2.0,2.0,4.0"
+    
+    def test_calculate_many_errors(self):
+        """Test mismatched lengths, unknown columns and unsupported functions"""
+        assert "different lengths" in calculator.calculate_many("x + y", {"x": [1, 2], "y": [1, 2, 3]})
+        assert "Column 'nope' not found" in calculator.calculate_many("x", {"x": "nope"})
+        assert "Not supported" in calculator.calculate_many("factorial(x)", {"x": [1, 2]})
+        assert "outside the working directory" in calculator.calculate_many("x", csv_path="/etc/passwd")
+    
+    def test_calculate_many_variadic_and_optional_arguments(self):
+        """Test that max/min take any number of arguments and log/pow accept their optional argument like the scalar engine"""
+        variables = {"a": [1, 5], "b": [2, 1], "c": [9, 0]}
+        assert calculator.calculate_many("max(a, b, c)", variables)["head"] == [9.0, 5.0]
+        assert calculator.calculate_many("min(a, b, c)", variables)["head"] == [1.0, 0.0]
+        assert variables["c"] == [9, 0]
+        
+        assert calculator.calculate_many("log(x, 10)", {"x": [100]})["head"] == [float(calculator.calculate("log(100, 10)"))]
+        assert calculator.calculate_many("pow(a, 2, 5)", {"a": [3, 4]})["head"] == [4.0, 1.0]
+        assert "integers" in calculator.calculate_many("pow(a, 2, 5)", {"a": [3.5]})
+        assert "takes exactly 1 argument" in calculator.calculate_many("sqrt(a, b)", variables)
 
 
 class TestFileOperations:
@@ -73,4 +144,272 @@ class TestFileOperations:
         # Try to access a file outside the working directory
         result = file_operations.read_file("../../../etc/passwd")
         assert "Error" in result
-        assert "Access to files outside" in result
\ No newline at end of file
+        assert "Access to files outside" in result
+    
+    @pytest.fixture
+    def log_file(self, tmp_path, monkeypatch):
+        """Create a multi-line log inside the working directory"""
+        monkeypatch.chdir(tmp_path)
+        lines = [f"line {i} {'ERROR disk full' if i % 250 == 0 else 'ok'}" for i in range(1, 1001)]
+        (tmp_path / "app.log").write_text("\n".join(lines) + "\n")
+        return "app.log"
+    
+    def test_read_file_line_range(self, log_file):
+        """Test reading a line range with totals for paging"""
+        result = file_operations.read_file(log_file, start_line=10, end_line=12)
+        assert result["content"] == "line 10 ok\nline 11 ok\nline 12 ok\n"
+        assert result["total_lines"] == 1000
+        assert result["end_line"] == 12
+        assert result["total_bytes"] == os.path.getsize(log_file)
+    
+    def test_read_file_tail_and_bytes(self, log_file):
+        """Test tail and byte-range modes"""
+        tail = file_operations.read_file(log_file, tail=2)
+        assert tail["content"] == "line 999 ok\nline 1000 ERROR disk full\n"
+        assert tail["total_lines"] == 1000
+        
+        chunk = file_operations.read_file(log_file, offset=5, length=4)
+        assert chunk["content"] == "1 ok"
+        assert chunk["total_lines"] == 1000
+    
+    def test_read_file_pattern(self, log_file):
+        """Test regex filtering with line numbers"""
+        result = file_operations.read_file(log_file, pattern=r"ERROR \w+ full", max_matches=3)
+        assert [m["line"] for m in result["matches"]] == [250, 500, 750]
+        assert result["matches"][0]["text"] == "line 250 ERROR disk full"
+        assert result["truncated"] is True
+        
+        literal = file_operations.read_file(log_file, pattern="line 1000")
+        assert [m["line"] for m in literal["matches"]] == [1000]
+    
+    def test_read_file_index_follows_appends(self, log_file):
+        """Test that the cached line index picks up appended lines"""
+        file_operations.read_file(log_file, start_line=1, end_line=1)
+        with open(log_file, "a") as f:
+            f.write("line 1001 ok\nline 1002 ok")
+        
+        result = file_operations.read_file(log_file, start_line=1001)
+        assert result["content"] == "line 1001 ok\nline 1002 ok"
+        assert result["total_lines"] == 1002
+    
+    def test_read_file_index_rebuilt_after_rewrite(self, log_file):
+        """Test that a file rewritten in place to a larger size is re-indexed, not treated as appended"""
+        with open(log_file, "w") as f:
+            f.write("a\nb\n")
+        assert file_operations.read_file(log_file, start_line=1)["total_lines"] == 2
+        
+        with open(log_file, "w") as f:
+            f.write("abcdefgh\n")
+        result = file_operations.read_file(log_file, start_line=1)
+        assert result["total_lines"] == 1
+        assert result["content"] == "abcdefgh\n"
+    
+    def test_read_file_tail_is_capped(self, log_file, monkeypatch):
+        """Test that tail reads stop at MAX_RANGE_BYTES and say so"""
+        monkeypatch.setattr(file_operations, "MAX_RANGE_BYTES", 100)
+        result = file_operations.read_file(log_file, tail=500)
+        assert len(result["content"].encode("utf-8")) <= 100
+        assert result["content"].startswith("line ")
+        assert result["content"].endswith("line 1000 ERROR disk full\n")
+        assert result["truncated"] is True
+        assert "truncated" not in file_operations.read_file(log_file, tail=2)
+    
+    def test_read_file_byte_range_does_not_scan(self, log_file, monkeypatch):
+        """Test that byte-range and pattern reads of a large file only report an already-built line count"""
+        monkeypatch.setattr(file_operations, "MAX_RANGE_BYTES", 100)
+        monkeypatch.setattr(file_operations, "_line_indexes", file_operations.OrderedDict())
+        assert file_operations.read_file(log_file, offset=0, length=4)["total_lines"] is None
+        assert file_operations.read_file(log_file, pattern="line 1000")["total_lines"] is None
+        assert not file_operations._line_indexes
+        
+        file_operations.read_file(log_file, start_line=1, end_line=1)
+        assert file_operations.read_file(log_file, offset=0, length=4)["total_lines"] == 1000
+    
+    def test_line_indexes_are_bounded(self, tmp_path, monkeypatch):
+        """Test that only the most recently read files keep a line index"""
+        monkeypatch.chdir(tmp_path)
+        monkeypatch.setattr(file_operations, "MAX_LINE_INDEXES", 2)
+        monkeypatch.setattr(file_operations, "_line_indexes", file_operations.OrderedDict())
+        for name in ("a.txt", "b.txt", "c.txt"):
+            (tmp_path / name).write_text("x\ny\n")
+        for name in ("a.txt", "b.txt", "a.txt", "c.txt"):
+            file_operations.read_file(name, start_line=1)
+        
+        assert [os.path.basename(path) for path in file_operations._line_indexes] == ["a.txt", "c.txt"]
+    
+    def test_read_file_rejects_mixed_modes(self, log_file):
+        """Test that only one read mode can be used at a time"""
+        assert "Choose only one read mode" in file_operations.read_file(log_file, tail=5, pattern="x")
+
+
+class TestFileSearch:
+    """Test suite for the indexed search_files tool"""
+    
+    @pytest.fixture
+    def project(self, tmp_path, monkeypatch):
+        """Create a small source tree as the working directory"""
+        monkeypatch.chdir(tmp_path)
+        monkeypatch.setattr(file_search, "REFRESH_INTERVAL", 0)
+        (tmp_path / "src").mkdir()
+        (tmp_path / "src" / "cache.py").write_text("def evict_entry(cache):\n    cache.evict_entry()\n")
+        (tmp_path / "src" / "server.py").write_text("import cache\n\ndef serve():\n    evict_entry(cache)\n")
+        (tmp_path / "README.md").write_text("The cache evicts stale entries.\n")
+        (tmp_path / "blob.bin").write_bytes(b"cache\0\0\0")
+        return tmp_path
+    
+    def test_token_search_ranks_lines(self, project):
+        """Test that lines matching every token rank first with file:line locations"""
+        result = file_search.search_files("evict_entry cache")
+        locations = [hit["location"] for hit in result["hits"]]
+        assert set(locations[:3]) == {"src/cache.py:1", "src/cache.py:2", "src/server.py:4"}
+        assert "blob.bin:1" not in locations
+        assert result["hits"][0]["snippet"] in ("def evict_entry(cache):", "cache.evict_entry()", "evict_entry(cache)")
+    
+    def test_regex_search_and_path_filter(self, project):
+        """Test regex queries restricted to a subdirectory"""
+        result = file_search.search_files(r"def \w+\(", regex=True, path="src")
+        assert sorted(hit["location"] for hit in result["hits"]) == ["src/cache.py:1", "src/server.py:3"]
+        assert "Invalid pattern" in file_search.search_files("(", regex=True)
+        assert "Access to files outside" in file_search.search_files("x", path="../..")
+    
+    def test_incremental_refresh(self, project):
+        """Test that only changed files are re-indexed and deleted files drop out"""
+        index = file_search.get_index()
+        index.refresh(force=True)
+        (project / "README.md").write_text("Nothing here anymore, plus a longer line\n")
+        os.remove(project / "src" / "server.py")
+        stats = index.refresh(force=True)
+        assert stats == {"updated": 1, "removed": 1, "unchanged": 2}
+        assert file_search.search_files("stale")["hits"] == []
+        assert file_search.search_files("serve")["hits"] == []
+    
+    def test_required_tokens(self):
+        """Test which pattern literals are usable as whole tokens or token prefixes"""
+        assert file_search.required_tokens(r"def evict_entry\(") == [("evict_entry", False)]
+        assert file_search.required_tokens(r"\bcache\.evi") == [("cache", False), ("evi", True)]
+        assert file_search.required_tokens(r"^import cache$") == [("import", False), ("cache", False)]
+        assert file_search.required_tokens(r"def \w+\(") == []
+        assert file_search.required_tokens(r"serve|evict") == []
+    
+    def test_regex_search_reads_only_candidate_files(self, project, monkeypatch):
+        """Test that the postings rule out files before any is opened"""
+        file_search.get_index().refresh(force=True)
+        opened = []
+        read_text = file_search._read_text
+        monkeypatch.setattr(file_search, "_read_text", lambda path: opened.append(path) or read_text(path))
+        
+        result = file_search.search_files(r"\bimport cache", regex=True)
+        
+        assert [hit["location"] for hit in result["hits"]] == ["src/server.py:1"]
+        assert opened == [os.path.join(str(project), "src", "server.py")]
+    
+    def test_first_build_runs_in_background(self, project, monkeypatch):
+        """Test that a slow first build returns an indexing result instead of blocking the call"""
+        monkeypatch.setattr(file_search, "INITIAL_INDEX_WAIT", 0.05)
+        walk = file_search._walk
+        
+        def slow_walk(root):
+            time.sleep(0.3)
+            yield from walk(root)
+        monkeypatch.setattr(file_search, "_walk", slow_walk)
+        
+        result = file_search.search_files("evict_entry")
+        assert result["indexing"] is True and result["hits"] == []
+        
+        file_search.get_index().build_in_background().join()
+        assert file_search.search_files("evict_entry")["hits"]
+
+
+class TestTextProcessor:
+    """Test suite for the text processing tools"""
+    
+    NOTE = "Mail ops@example.com by 12/05/2025, see https://example.com/t?id=7 (budget 3.50)"
+    
+    def test_extract_entities_single_pass(self):
+        """Test that every entity type is found, without overlapping matches"""
+        assert text_processor.extract_entities(self.NOTE) == {
+            "emails": ["ops@example.com"],
+            "dates": ["12/05/2025"],
+            "urls": ["https://example.com/t?id=7"],
+            "numbers": ["3.50"]
+        }
+        assert text_processor.extract_entities("nothing here") == {}
+    
+    def test_extract_entities_offsets(self):
+        """Test that offsets point back at the matched text"""
+        result = text_processor.extract_entities(self.NOTE, with_offsets=True)
+        for entities in result.values():
+            for entity in entities:
+                assert self.NOTE[entity["start"]:entity["end"]] == entity["text"]
+    
+    def test_extract_entities_batch(self, tmp_path):
+        """Test batch extraction in order, in-process, from a pool and from a file"""
+        documents = [self.NOTE, "call 555", "", "on 1/2/24"] * 5
+        expected = [text_processor.extract_entities(document) for document in documents]
+        assert list(text_processor.extract_entities_batch(documents, workers=1, chunk_size=3)) == expected
+        assert list(text_processor.extract_entities_batch(iter(documents), workers=2, chunk_size=3)) == expected
+        
+        notes = tmp_path / "notes.jsonl"
+        notes.write_text('{"text": "call 555"}\n\n"on 1/2/24"\n')
+        assert list(text_processor.extract_entities_batch(path=str(notes))) == [
+            {"numbers": ["555"]}, {"dates": ["1/2/24"]}
+        ]
+    
+    def test_extract_entities_batch_rejects_bare_string(self, tmp_path):
+        """Test that a str is not mistaken for a path or a list of documents"""
+        with pytest.raises(TypeError):
+            list(text_processor.extract_entities_batch("call 555"))
+        with pytest.raises(TypeError):
+            list(text_processor.extract_entities_batch())
+        with pytest.raises(TypeError):
+            list(text_processor.extract_entities_batch(["call 555"], path=str(tmp_path / "notes.txt")))
+    
+    def test_sentiment_whole_words_and_negation(self):
+        """Test token matching (no "bad" inside "badge") and negation scope"""
+        assert text_processor.sentiment_analysis("I love this badge")["negative_count"] == 0
+        assert text_processor.sentiment_analysis("This is not bad at all")["label"] == "positive"
+        
+        result = text_processor.sentiment_analysis("Not good. Great though!")
+        assert (result["positive_count"], result["negative_count"]) == (1, 1)
+    
+    def test_sentiment_lexicon_file_and_batch(self, tmp_path, monkeypatch):
+        """Test weighted phrase lexicons loaded from a file and batch scoring"""
+        monkeypatch.chdir(tmp_path)
+        (tmp_path / "lexicon.tsv").write_text("# term\tweight\nthumbs up\t2\nmeh\t-0.5\n")
+        
+        result = text_processor.sentiment_analysis("thumbs up, meh", lexicon="lexicon.tsv")
+        assert result["score"] == pytest.approx((2 - 0.5) / 2.5)
+        assert text_processor.sentiment_analysis("x", lexicon="nope").startswith("Error loading lexicon")
+        assert text_processor.sentiment_analysis("x", lexicon="../x").startswith("Error: Access to files outside")
+        
+        texts = ["great", "awful", "fine"]
+        labels = [r["label"] for r in text_processor.sentiment_analysis_batch(texts, chunk_size=2)]
+        assert labels == ["positive", "negative", "neutral"]
+        
+        custom = text_processor.SentimentLexicon({"fine": 1})
+        for lexicon in ("lexicon.tsv", custom):
+            scores = list(text_processor.sentiment_analysis_batch(["meh", "fine"] * 3, lexicon, workers=2, chunk_size=2))
+            assert scores == [text_processor.get_lexicon(lexicon).score(text) for text in ["meh", "fine"] * 3]
+    
+    def test_translate_single_pass(self):
+        """Test whole-word, longest-match-first replacement without rescanning replacements"""
+        assert text_processor.translate("Hello World, thank   you!").startswith("hola mundo, gracias!")
+        assert "Unsupported target language" in text_processor.translate("hi", "xx")
+        
+        glossary = text_processor.Glossary({"new york city": "NYC", "new": "nuevo", "nuevo": "again", "e-mail": "correo"})
+        assert glossary.translate("New E-mail from new york, New  York City") == "nuevo correo from nuevo york, NYC"
+    
+    def test_translate_glossary_file_and_batch(self, tmp_path, monkeypatch):
+        """Test glossaries loaded from a file, cached until it changes, and batch translation"""
+        monkeypatch.chdir(tmp_path)
+        (tmp_path / "glossary.tsv").write_text("# source\ttranslation\nbug report\tinforme de error\nbug\terror\n")
+        
+        result = text_processor.translate("File a bug report for the bug", glossary="glossary.tsv")
+        assert result.startswith("file a informe de error for the error")
+        assert text_processor.get_glossary(glossary=str(tmp_path / "glossary.tsv")) is \
+            text_processor.get_glossary(glossary=str(tmp_path / "glossary.tsv"))
+        assert "outside the working directory" in text_processor.translate("x", glossary="../g.tsv")
+        
+        texts = ["hello", "goodbye world"]
+        assert list(text_processor.translate_batch(texts, "de", chunk_size=1)) == ["hallo", "auf wiedersehen welt"]
+
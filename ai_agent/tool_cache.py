@@ -0,0 +1,120 @@
+# tool_cache.py - Memoization of deterministic tool calls under per-tool policies
+import copy
+import hashlib
+import json
+import re
+from typing import Any, Callable, Dict, Optional
+
+from llm_cache import ResponseCache
+
+# Canonicalizers map a call's parameters to the form used for the cache key
+
+
+def collapse_whitespace(value: Any) -> Any:
+    """Strip a string and collapse internal runs of whitespace to one space"""
+    if isinstance(value, str):
+        return re.sub(r'\s+', ' ', value).strip()
+    return value
+
+
+def remove_whitespace(value: Any) -> Any:
+    """Drop all whitespace from a string (for arithmetic, "2 + 3" == "2+3")"""
+    if isinstance(value, str):
+        return re.sub(r'\s+', '', value)
+    return value
+
+
+class CachePolicy:
+    """How the results of one tool are cached"""
+
+    def __init__(self, max_entries: int = 256, ttl: Optional[float] = None,
+                 defaults: Optional[Dict[str, Any]] = None,
+                 normalize: Optional[Dict[str, Callable[[Any], Any]]] = None):
+        """
+        Args:
+            max_entries: LRU size for this tool
+            ttl: Seconds a result stays valid (None for no expiry)
+            defaults: Parameter defaults filled in before keying, so omitting an
+                      argument and passing its default share one entry
+            normalize: Per-parameter canonicalizers applied before keying
+        """
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.defaults = defaults or {}
+        self.normalize = normalize or {}
+
+    def key(self, params: Dict[str, Any]) -> str:
+        """Canonical hash of the call's parameters"""
+        canonical = dict(self.defaults)
+        canonical.update(params)
+        for name, normalize in self.normalize.items():
+            if name in canonical:
+                canonical[name] = normalize(canonical[name])
+        text = json.dumps(canonical, sort_keys=True, separators=(",", ":"), ensure_ascii=False, default=repr)
+        return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+class ToolCache:
+    """
+    Per-tool result caches, shared by every agent it is passed to.
+
+    Only tools with a policy are cached. Error strings returned by a tool are
+    never stored, so a transient failure is retried on the next call.
+    """
+
+    def __init__(self, policies: Optional[Dict[str, CachePolicy]] = None):
+        """
+        Args:
+            policies: Cache policy per registered tool name
+        """
+        self.policies: Dict[str, CachePolicy] = {}
+        self._caches: Dict[str, ResponseCache] = {}
+        for tool_name, policy in (policies or {}).items():
+            self.set_policy(tool_name, policy)
+
+    def set_policy(self, tool_name: str, policy: CachePolicy) -> None:
+        """Declare (or replace) the policy for a tool; its existing entries are dropped"""
+        self.policies[tool_name] = policy
+        self._caches[tool_name] = ResponseCache(max_entries=policy.max_entries, ttl=policy.ttl)
+
+    def cacheable(self, tool_name: str) -> bool:
+        return tool_name in self.policies
+
+    def call(self, tool_name: str, params: Dict[str, Any],
+             invoke: Callable[[str, Dict[str, Any]], Any]) -> Any:
+        """
+        Return the cached result for the call, or invoke the tool and cache it.
+
+        Args:
+            tool_name: Registered tool name
+            params: Keyword arguments for the tool
+            invoke: Runs the tool; called as invoke(tool_name, params) on a miss
+
+        Returns:
+            The tool's result (a copy, so callers cannot mutate the cached value)
+        """
+        cache = self._caches.get(tool_name)
+        if cache is None:
+            return invoke(tool_name, params)
+
+        try:
+            key = self.policies[tool_name].key(params)
+        except (TypeError, ValueError):
+            return invoke(tool_name, params)
+
+        cached = cache.get(key)
+        if cached is not None:
+            return copy.deepcopy(cached)
+
+        result = invoke(tool_name, params)
+        if result is not None and not (isinstance(result, str) and result.startswith("Error")):
+            cache.put(key, copy.deepcopy(result))
+        return result
+
+    def clear(self) -> None:
+        for cache in self._caches.values():
+            cache.clear()
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        """Hit/miss counters, hit rate and size per cached tool"""
+        return {tool_name: cache.stats() for tool_name, cache in self._caches.items()}
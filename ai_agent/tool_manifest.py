@@ -0,0 +1,134 @@
+# tool_manifest.py - Tool descriptions for the system prompt
+import inspect
+import json
+import typing
+from typing import Any, Callable, Dict, Mapping, Optional
+
+from context_window import estimate_tokens
+from tool_registry import LazyTool
+
+MANIFEST_STYLES = ("compact", "full")
+
+
+def _format_annotation(annotation: Any) -> str:
+    if annotation is inspect.Parameter.empty:
+        return ""
+    if isinstance(annotation, type):
+        return annotation.__name__
+    # typing constructs render as e.g. "typing.List[typing.Dict[str, typing.Any]]"
+    return str(annotation).replace("typing.", "")
+
+
+def _format_default(value: Any) -> str:
+    # Defaults are shown the way the model must write them in JSON parameters
+    try:
+        return json.dumps(value)
+    except (TypeError, ValueError):
+        return repr(value)
+
+
+def tool_signature(func: Callable) -> str:
+    """
+    Render a tool's parameters from its signature and type hints.
+
+    Args:
+        func: The tool callable
+
+    Returns:
+        Parameter list such as "query: str, num_results: int = 5"
+    """
+    if isinstance(func, LazyTool):
+        return func.signature_text()
+
+    try:
+        signature = inspect.signature(func)
+    except (TypeError, ValueError):
+        return "..."
+
+    try:
+        hints = typing.get_type_hints(func)
+    except Exception:
+        hints = {}
+
+    params = []
+    for name, param in signature.parameters.items():
+        if param.kind is param.VAR_POSITIONAL:
+            params.append(f"*{name}")
+            continue
+        if param.kind is param.VAR_KEYWORD:
+            params.append(f"**{name}")
+            continue
+
+        text = name
+        annotation = _format_annotation(hints.get(name, param.annotation))
+        if annotation:
+            text += f": {annotation}"
+        if param.default is not param.empty:
+            text += f" = {_format_default(param.default)}"
+        params.append(text)
+    return ", ".join(params)
+
+
+def _tool_doc(func: Callable) -> Optional[str]:
+    if isinstance(func, LazyTool):
+        return func.doc
+    return func.__doc__
+
+
+def _doc_summary(func: Callable) -> str:
+    """First paragraph of the docstring, joined onto one line"""
+    doc = inspect.cleandoc(_tool_doc(func) or "")
+    summary = doc.split("\n\n", 1)[0]
+    return " ".join(summary.split()) or "No description available"
+
+
+def describe_tool(name: str, func: Callable, style: str = "compact") -> str:
+    """
+    Describe one tool for the system prompt.
+
+    Args:
+        name: Name the model uses to call the tool
+        func: The tool callable
+        style: "compact" (signature plus one-line summary) or "full" (entire docstring)
+
+    Returns:
+        A single manifest entry
+    """
+    if style == "full":
+        return f"- {name}: {_tool_doc(func) or 'No description available'}"
+    if style == "compact":
+        return f"- {name}({tool_signature(func)}): {_doc_summary(func)}"
+    raise ValueError(f"Unknown manifest style '{style}'. Supported styles: {', '.join(MANIFEST_STYLES)}")
+
+
+def build_manifest(tools: Mapping[str, Callable], style: str = "compact") -> str:
+    """Describe every tool, one entry per line, in registration order"""
+    return "\n".join(describe_tool(name, func, style) for name, func in tools.items())
+
+
+def manifest_report(tools: Mapping[str, Callable]) -> Dict[str, Any]:
+    """
+    Compare the prompt cost of the full and compact manifest formats.
+
+    Args:
+        tools: Tools to describe
+
+    Returns:
+        Character and estimated token counts for each style, and the token saving
+    """
+    report: Dict[str, Any] = {}
+    for style in MANIFEST_STYLES:
+        manifest = build_manifest(tools, style)
+        report[style] = {"chars": len(manifest), "tokens": estimate_tokens(manifest)}
+
+    full_tokens = report["full"]["tokens"]
+    saved = full_tokens - report["compact"]["tokens"]
+    report["tokens_saved"] = saved
+    report["percent_saved"] = round(100.0 * saved / full_tokens, 1) if full_tokens else 0.0
+    return report
+
+
+if __name__ == "__main__":
+    from main import build_tools
+
+    print(json.dumps(manifest_report(build_tools()), indent=2))
@@ -0,0 +1,130 @@
+# tool_registry.py - Versioned mapping of tool names to callables
+import ast
+import importlib
+import importlib.util
+import json
+import threading
+from collections.abc import MutableMapping
+from typing import Any, Callable, Dict, Iterator, Optional
+
+
+def _render_default(node: ast.expr) -> str:
+    # Match tool_manifest: literal defaults are shown as JSON
+    try:
+        return json.dumps(ast.literal_eval(node))
+    except (ValueError, TypeError, SyntaxError):
+        return ast.unparse(node)
+
+
+class LazyTool:
+    """
+    A tool known by module path and function name that is imported on first call.
+
+    Its signature and docstring are read from the module's source with ast, so
+    describing the tool in the system prompt never imports the module (or the
+    heavy dependencies it pulls in).
+    """
+
+    def __init__(self, module: str, attribute: str):
+        """
+        Args:
+            module: Dotted module path, e.g. "tools.task_manager"
+            attribute: Name of the function inside the module
+        """
+        self.module = module
+        self.attribute = attribute
+        self._func: Optional[Callable] = None
+        self._definition: Optional[ast.FunctionDef] = None
+        self._lock = threading.Lock()
+
+    @property
+    def resolved(self) -> bool:
+        return self._func is not None
+
+    def resolve(self) -> Callable:
+        """Import the module and return the real function (cached after the first call)"""
+        if self._func is None:
+            with self._lock:
+                if self._func is None:
+                    self._func = getattr(importlib.import_module(self.module), self.attribute)
+        return self._func
+
+    def __call__(self, *args: Any, **kwargs: Any) -> Any:
+        return self.resolve()(*args, **kwargs)
+
+    def _function_definition(self) -> ast.FunctionDef:
+        if self._definition is None:
+            spec = importlib.util.find_spec(self.module)
+            if spec is None or not spec.origin:
+                raise ImportError(f"Cannot locate module '{self.module}'")
+            with open(spec.origin, "r", encoding="utf-8") as f:
+                tree = ast.parse(f.read(), filename=spec.origin)
+            for node in tree.body:
+                if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef)) and node.name == self.attribute:
+                    self._definition = node
+                    break
+            else:
+                raise AttributeError(f"Module '{self.module}' defines no function '{self.attribute}'")
+        return self._definition
+
+    @property
+    def doc(self) -> Optional[str]:
+        """The function's docstring, read from source"""
+        return ast.get_docstring(self._function_definition())
+
+    def signature_text(self) -> str:
+        """Parameter list rendered from the source annotations and defaults"""
+        args = self._function_definition().args
+        positional = args.posonlyargs + args.args
+        defaults = [None] * (len(positional) - len(args.defaults)) + list(args.defaults)
+
+        params = []
+        for arg, default in list(zip(positional, defaults)) + list(zip(args.kwonlyargs, args.kw_defaults)):
+            text = arg.arg
+            if arg.annotation is not None:
+                text += f": {ast.unparse(arg.annotation)}"
+            if default is not None:
+                text += f" = {_render_default(default)}"
+            params.append(text)
+        if args.vararg:
+            params.append(f"*{args.vararg.arg}")
+        if args.kwarg:
+            params.append(f"**{args.kwarg.arg}")
+        return ", ".join(params)
+
+    def __repr__(self) -> str:
+        return f"LazyTool({self.module!r}, {self.attribute!r})"
+
+
+class ToolRegistry(MutableMapping):
+    """
+    Dict-like registry of tools whose version changes whenever a tool is
+    registered or removed, so derived data (like the tool manifest) can be
+    cached until the set of tools actually changes.
+    """
+
+    def __init__(self, tools: Optional[Dict[str, Callable]] = None):
+        self._tools: Dict[str, Callable] = {}
+        self.version = 0
+        if tools:
+            self.update(tools)
+
+    def __getitem__(self, name: str) -> Callable:
+        return self._tools[name]
+
+    def __setitem__(self, name: str, func: Callable) -> None:
+        self._tools[name] = func
+        self.version += 1
+
+    def __delitem__(self, name: str) -> None:
+        del self._tools[name]
+        self.version += 1
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._tools)
+
+    def __len__(self) -> int:
+        return len(self._tools)
+
+    def __repr__(self) -> str:
+        return f"ToolRegistry({self._tools!r})"
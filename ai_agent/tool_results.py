@@ -0,0 +1,191 @@
+# tool_results.py - Size caps for tool results, with full results kept by handle
+import itertools
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+from context_window import estimate_tokens
+
+DEFAULT_PAGE_CHARS = 4000
+# Name the paging tool is registered under; its pages are never truncated again
+READ_RESULT_TOOL = "read_result"
+
+
+class ResultPolicy:
+    """How large a tool's result may be before it is truncated in the conversation"""
+
+    def __init__(self, max_tokens: Optional[int] = 1000, max_bytes: Optional[int] = None,
+                 head_fraction: float = 0.7):
+        """
+        Args:
+            max_tokens: Token cap for the inlined result (None for no token cap)
+            max_bytes: UTF-8 byte cap for the inlined result (None for no byte cap)
+            head_fraction: Share of the budget given to the head; the rest shows the tail
+        """
+        self.max_tokens = max_tokens
+        self.max_bytes = max_bytes
+        self.head_fraction = head_fraction
+
+    def fits(self, text: str) -> bool:
+        if self.max_bytes is not None and len(text.encode("utf-8")) > self.max_bytes:
+            return False
+        if self.max_tokens is not None and estimate_tokens(text) > self.max_tokens:
+            return False
+        return True
+
+    def char_budget(self) -> float:
+        # A first guess; callers shrink it until the excerpt really fits
+        budget = float("inf")
+        if self.max_tokens is not None:
+            budget = self.max_tokens * 4
+        if self.max_bytes is not None:
+            budget = min(budget, self.max_bytes)
+        return budget
+
+
+def describe_value(value: Any, text: str) -> str:
+    """One-line description of a result's shape and size"""
+    size = f"{len(text.encode('utf-8')):,} bytes, {text.count(chr(10)) + 1:,} lines"
+    if isinstance(value, (list, tuple)):
+        return f"{type(value).__name__} of {len(value):,} items; {size}"
+    if isinstance(value, dict):
+        keys = ", ".join(str(key) for key in itertools.islice(value, 10))
+        more = ", ..." if len(value) > 10 else ""
+        return f"dict with {len(value):,} keys ({keys}{more}); {size}"
+    return size
+
+
+def _cut_head(text: str, limit: int) -> str:
+    head = text[:limit]
+    # Prefer ending on a line boundary when one is reasonably close
+    newline = head.rfind("\n")
+    return head[:newline] if newline > limit // 2 else head
+
+
+def _cut_tail(text: str, limit: int) -> str:
+    if limit <= 0:
+        return ""
+    tail = text[-limit:]
+    newline = tail.find("\n")
+    return tail[newline + 1:] if 0 <= newline < limit // 2 else tail
+
+
+class ResultStore:
+    """Thread-safe LRU of full tool results, addressed by handle"""
+
+    def __init__(self, max_entries: int = 64):
+        self.max_entries = max_entries
+        self._results: "OrderedDict[str, Any]" = OrderedDict()
+        self._counter = itertools.count(1)
+        self._lock = threading.Lock()
+
+    def put(self, value: Any) -> str:
+        """Store a result and return its new handle"""
+        with self._lock:
+            handle = f"result-{next(self._counter)}"
+            self._results[handle] = value
+            while len(self._results) > self.max_entries:
+                self._results.popitem(last=False)
+            return handle
+
+    def get(self, handle: str) -> Any:
+        """Return the stored result; raises KeyError for unknown or expired handles"""
+        with self._lock:
+            value = self._results[handle]
+            self._results.move_to_end(handle)
+            return value
+
+    def __contains__(self, handle: Any) -> bool:
+        with self._lock:
+            return isinstance(handle, str) and handle in self._results
+
+    def __len__(self) -> int:
+        return len(self._results)
+
+
+class ResultShaper:
+    """
+    Caps tool results before they enter the conversation.
+
+    Oversized results are replaced by their head and tail plus a one-line
+    summary, and the full value is kept in a ResultStore. Later tool calls can
+    pass the handle as any parameter value to receive the full value, or page
+    through its text with the read_result tool.
+    """
+
+    def __init__(self, policies: Optional[Dict[str, ResultPolicy]] = None,
+                 default: Optional[ResultPolicy] = None, store: Optional[ResultStore] = None):
+        """
+        Args:
+            policies: Per-tool caps, keyed by registered tool name
+            default: Cap for tools without their own policy (1000 tokens by default)
+            store: Where full results are kept (a fresh 64-entry store by default)
+        """
+        self.policies = policies or {}
+        self.default = default if default is not None else ResultPolicy()
+        self.store = store if store is not None else ResultStore()
+
+    def shape(self, tool_name: str, result: Any) -> str:
+        """
+        Render a tool result for the conversation within the tool's cap.
+
+        Args:
+            tool_name: Registered tool name
+            result: The tool's return value
+
+        Returns:
+            The result text, or an excerpt with a summary and handle if it was too large
+        """
+        text = str(result)
+        policy = self.policies.get(tool_name, self.default)
+        if tool_name == READ_RESULT_TOOL or policy.fits(text):
+            return text
+
+        handle = self.store.put(result)
+        footer = (f"[Full result stored as '{handle}'. Pass \"{handle}\" as a tool parameter to use it, "
+                  f"or call read_result with {{\"handle\": \"{handle}\", \"offset\": 0}} to page through it.]")
+        marker = f"\n... [truncated: {describe_value(result, text)}] ...\n"
+
+        budget = policy.char_budget() - len(marker) - len(footer)
+        while True:
+            budget = int(max(0, budget))
+            head_chars = int(budget * policy.head_fraction)
+            excerpt = _cut_head(text, head_chars) + marker + _cut_tail(text, budget - head_chars) + "\n" + footer
+            if budget == 0 or policy.fits(excerpt):
+                return excerpt
+            budget *= 0.8
+
+    def resolve(self, tool_name: str, params: Dict[str, Any]) -> Dict[str, Any]:
+        """Replace parameter values that are stored handles with the full results"""
+        if tool_name == READ_RESULT_TOOL:
+            return params
+        resolved = {}
+        for name, value in params.items():
+            if isinstance(value, str) and value.startswith("result-"):
+                try:
+                    value = self.store.get(value)
+                except KeyError:
+                    pass
+            resolved[name] = value
+        return resolved
+
+    def read(self, handle: str, offset: int = 0, length: int = DEFAULT_PAGE_CHARS) -> str:
+        """
+        Read part of a stored tool result that was truncated in the conversation.
+
+        Args:
+            handle: Handle from a truncated result, e.g. "result-1"
+            offset: Character offset to start reading from
+            length: Number of characters to return
+
+        Returns:
+            The requested slice of the result's text, with the remaining size
+        """
+        try:
+            text = str(self.store.get(handle))
+        except KeyError:
+            return f"Error: Unknown or expired result handle '{handle}'"
+
+        offset = max(0, int(offset))
+        end = min(len(text), offset + max(1, min(int(length), DEFAULT_PAGE_CHARS)))
+        return f"[{handle} characters {offset}-{end} of {len(text)}]\n{text[offset:end]}"
@@ -0,0 +1,52 @@
+# tool_stream.py - Incremental detection of tool blocks in a streamed completion
+import re
+from typing import List
+
+TOOL_CALL_PATTERN = re.compile(r'```tool\s+(.*?)\s+(.*?)```', re.DOTALL)
+BLOCK_OPENER = "```tool"
+
+
+class ToolBlockParser:
+    """
+    Finds ```tool blocks in a completion while it is still being streamed.
+
+    A block is reported as soon as its closing fence arrives, using the same
+    pattern that is applied to the finished completion, so the blocks found
+    here are the blocks the final parse will find at the same offsets.
+    """
+
+    def __init__(self):
+        self._text = ""
+        # Nothing before this offset can start a block that is not yet reported
+        self._position = 0
+
+    @property
+    def text(self) -> str:
+        return self._text
+
+    def feed(self, delta: str) -> List[re.Match]:
+        """
+        Add a streamed delta and return the tool blocks it completed.
+
+        Args:
+            delta: Next piece of the completion
+
+        Returns:
+            Matches of TOOL_CALL_PATTERN (tool name in group 1, parameters in group 2)
+        """
+        self._text += delta
+        blocks = []
+        while True:
+            match = TOOL_CALL_PATTERN.search(self._text, self._position)
+            if match is None:
+                break
+            blocks.append(match)
+            self._position = match.end()
+
+        # Skip plain text so later deltas only rescan from an open block
+        start = self._text.find(BLOCK_OPENER, self._position)
+        if start == -1:
+            self._position = max(self._position, len(self._text) - len(BLOCK_OPENER) + 1)
+        else:
+            self._position = start
+        return blocks
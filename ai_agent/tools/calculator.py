@@ -1,41 +1,378 @@
 # tools/calculator.py - Mathematical calculations
+import ast
+import csv
 import math
 import re
+from functools import lru_cache
+from typing import Any, Callable, Dict, FrozenSet, Optional, Union
 
-def calculate(expression: str) -> str:
+from tools.file_operations import resolve_path
+
+# Integers may grow to this many bits; beyond it a calculation is refused rather than run
+MAX_INTEGER_BITS = 4096
+MAX_FACTORIAL = 1000
+
+# Only these characters can appear in an expression (no quotes, brackets or attributes)
+_ALLOWED_CHARACTERS = re.compile(r'^[\w\s\+\-\*\/\%\(\)\.,]*$')
+
+_BINARY_OPERATORS = (ast.Add, ast.Sub, ast.Mult, ast.Div, ast.FloorDiv, ast.Mod, ast.Pow)
+_UNARY_OPERATORS = (ast.UAdd, ast.USub)
+
+
+def _check_integer(value: Any) -> Any:
+    if isinstance(value, int) and value.bit_length() > MAX_INTEGER_BITS:
+        raise OverflowError(f"Integer result exceeds {MAX_INTEGER_BITS} bits")
+    return value
+
+
+def _safe_pow(base, exponent, modulus=None):
+    """pow() that refuses integer results too large to compute quickly"""
+    if modulus is not None:
+        return pow(base, exponent, modulus)
+    if isinstance(base, int) and isinstance(exponent, int) and exponent > 0 and abs(base) > 1:
+        if (abs(base).bit_length() - 1) * exponent > MAX_INTEGER_BITS:
+            raise OverflowError(f"Exponent too large: {base} ** {exponent}")
+    return pow(base, exponent)
+
+
+def _bounded(func: Callable, limit: int) -> Callable:
+    def guarded(*args):
+        if any(isinstance(arg, int) and arg > limit for arg in args):
+            raise OverflowError(f"{func.__name__}() argument exceeds {limit}")
+        return func(*args)
+    guarded.__name__ = func.__name__
+    return guarded
+
+
+def _build_namespace():
+    functions: Dict[str, Callable] = {
+        "abs": abs,
+        "float": float,
+        "int": int,
+        "max": max,
+        "min": min,
+        "round": round
+    }
+    constants: Dict[str, float] = {}
+    for name in dir(math):
+        if name.startswith('_'):
+            continue
+        value = getattr(math, name)
+        if callable(value):
+            functions[name] = value
+        else:
+            constants[name] = value
+
+    # Functions whose cost grows with their integer arguments
+    functions["pow"] = _safe_pow
+    functions["factorial"] = _bounded(math.factorial, MAX_FACTORIAL)
+    functions["comb"] = _bounded(math.comb, MAX_FACTORIAL)
+    functions["perm"] = _bounded(math.perm, MAX_FACTORIAL)
+    return functions, constants
+
+
+# Built once at import instead of on every call
+FUNCTIONS, CONSTANTS = _build_namespace()
+
+
+class _Compiler(ast.NodeTransformer):
+    """Rejects anything but arithmetic, and routes ** through _safe_pow"""
+
+    def __init__(self):
+        self.names = set()
+        self.functions = set()
+
+    def generic_visit(self, node):
+        if not isinstance(node, (ast.Expression, ast.BinOp, ast.UnaryOp, ast.Call, ast.Name, ast.Constant,
+                                 ast.Load, ast.keyword) + _BINARY_OPERATORS + _UNARY_OPERATORS):
+            raise ValueError(f"Unsupported syntax: {type(node).__name__}")
+        return super().generic_visit(node)
+
+    def visit_Constant(self, node):
+        if isinstance(node.value, bool) or not isinstance(node.value, (int, float)):
+            raise ValueError(f"Unsupported constant: {node.value!r}")
+        return node
+
+    def visit_Name(self, node):
+        if node.id.startswith('_'):
+            raise ValueError(f"Unknown name: {node.id}")
+        if node.id not in FUNCTIONS:
+            self.names.add(node.id)
+        return node
+
+    def visit_Call(self, node):
+        if not isinstance(node.func, ast.Name) or node.func.id not in FUNCTIONS:
+            raise ValueError(f"Unknown function: {ast.unparse(node.func)}")
+        self.functions.add(node.func.id)
+        return self.generic_visit(node)
+
+    def visit_BinOp(self, node):
+        node = self.generic_visit(node)
+        if isinstance(node.op, ast.Pow):
+            self.functions.add("pow")
+            call = ast.Call(func=ast.Name(id="pow", ctx=ast.Load()), args=[node.left, node.right], keywords=[])
+            return ast.copy_location(call, node)
+        return node
+
+
+class CompiledExpression:
+    """An arithmetic expression validated and compiled once, evaluable many times"""
+
+    def __init__(self, expression: str):
+        """
+        Args:
+            expression: The expression text
+
+        Raises:
+            SyntaxError: If the text is not a Python expression
+            ValueError: If it uses anything beyond arithmetic, whitelisted functions and names
+        """
+        self.expression = expression
+        tree = ast.parse(expression.strip(), mode="eval")
+        compiler = _Compiler()
+        tree = ast.fix_missing_locations(compiler.visit(tree))
+        # Free names are constants (pi, e, ...) or caller-supplied variables
+        self.names: FrozenSet[str] = frozenset(compiler.names)
+        self.variables: FrozenSet[str] = frozenset(self.names - CONSTANTS.keys())
+        self.functions: FrozenSet[str] = frozenset(compiler.functions)
+        self._code = compile(tree, "<expression>", "eval")
+
+    def evaluate(self, variables: Optional[Dict[str, Any]] = None,
+                 functions: Optional[Dict[str, Callable]] = None) -> Any:
+        """
+        Evaluate the expression.
+
+        Args:
+            variables: Values for the expression's variables
+            functions: Function table to use instead of the scalar FUNCTIONS
+
+        Returns:
+            The result of the expression
+        """
+        variables = variables or {}
+        missing = self.variables - variables.keys()
+        if missing:
+            raise NameError(f"Undefined variable(s): {', '.join(sorted(missing))}")
+
+        namespace = dict(CONSTANTS)
+        namespace.update(variables)
+        namespace.update(functions if functions is not None else FUNCTIONS)
+        return _check_integer(eval(self._code, {"__builtins__": {}}, namespace))
+
+
+@lru_cache(maxsize=1024)
+def compile_expression(expression: str) -> CompiledExpression:
+    """Compile an expression, reusing the result for repeated text"""
+    return CompiledExpression(expression)
+
+
+def calculate(expression: str, variables: Optional[Dict[str, float]] = None) -> str:
     """
     Evaluate a mathematical expression safely.
-    
+
     Args:
-        expression: A mathematical expression as a string
-        
+        expression: A mathematical expression as a string, e.g. "pow(2, 10) / rate"
+        variables: Optional values for names used in the expression
+
     Returns:
         The result of the calculation
     """
     # Sanitize input to prevent code injection
-    if not re.match(r'^[\d\+\-\*\/\(\)\.\s]*$', expression):
+    if not _ALLOWED_CHARACTERS.match(expression):
         return "Error: Invalid characters in expression"
-    
+
+    for name, value in (variables or {}).items():
+        if isinstance(value, bool) or not isinstance(value, (int, float)):
+            return f"Error: Variable '{name}' must be a number"
+        if name in FUNCTIONS or name.startswith('_'):
+            return f"Error: Invalid variable name '{name}'"
+
     try:
-        # Use a safer eval with limited scope
-        allowed_names = {
-            "abs": abs,
-            "float": float,
-            "int": int,
-            "max": max,
-            "min": min,
-            "pow": pow,
-            "round": round,
-            "sum": sum
-        }
-        
-        # Add common math functions
-        for name in dir(math):
-            if not name.startswith('_'):
-                allowed_names[name] = getattr(math, name)
-        
         # Calculate result
-        result = eval(expression, {"__builtins__": {}}, allowed_names)
+        result = compile_expression(expression).evaluate(variables)
         return str(result)
     except Exception as e:
-        return f"Error calculating result: {str(e)}"
\ No newline at end of file
+        return f"Error calculating result: {str(e)}"
+
+
+# Element-wise equivalents of FUNCTIONS for bulk evaluation, built on first use
+_ARRAY_FUNCTIONS: Optional[Dict[str, Callable]] = None
+# Element-wise functions taking exactly ufunc.nin arguments
+_ARRAY_FUNCTION_NAMES = {
+    "abs": "abs", "fabs": "fabs", "sqrt": "sqrt", "exp": "exp", "log10": "log10",
+    "log2": "log2", "log1p": "log1p", "sin": "sin", "cos": "cos", "tan": "tan", "asin": "arcsin",
+    "acos": "arccos", "atan": "arctan", "atan2": "arctan2", "sinh": "sinh", "cosh": "cosh",
+    "tanh": "tanh", "floor": "floor", "ceil": "ceil", "trunc": "trunc", "hypot": "hypot", "isnan": "isnan"
+}
+
+
+def _check_arity(name: str, args: tuple, minimum: int, maximum: Optional[int]) -> None:
+    # ufuncs would silently take an extra positional argument as their output array
+    if len(args) < minimum or (maximum is not None and len(args) > maximum):
+        if maximum is None:
+            expected = f"at least {minimum}"
+        elif minimum == maximum:
+            expected = f"exactly {minimum}"
+        else:
+            expected = f"{minimum} to {maximum}"
+        raise TypeError(f"{name}() takes {expected} argument{'' if maximum == 1 else 's'} ({len(args)} given)")
+
+
+def _array_functions(np) -> Dict[str, Callable]:
+    global _ARRAY_FUNCTIONS
+    if _ARRAY_FUNCTIONS is not None:
+        return _ARRAY_FUNCTIONS
+
+    def elementwise(name, ufunc):
+        def call(*args):
+            _check_arity(name, args, ufunc.nin, ufunc.nin)
+            return ufunc(*args)
+        return call
+
+    def extremum(name, ufunc):
+        def call(*args):
+            _check_arity(name, args, 2, None)
+            return ufunc.reduce(np.broadcast_arrays(*args))
+        return call
+
+    def log(*args):
+        _check_arity("log", args, 1, 2)
+        if len(args) == 1:
+            return np.log(args[0])
+        return np.log(args[0]) / np.log(args[1])
+
+    def power(*args):
+        _check_arity("pow", args, 2, 3)
+        if len(args) == 2:
+            return np.power(*args)
+        # Exact integer arithmetic, as the scalar pow(base, exponent, modulus) does
+        arrays = np.broadcast_arrays(*(np.asarray(arg, dtype=float) for arg in args))
+        if not all(np.all(np.isfinite(array) & (array == np.floor(array))) for array in arrays):
+            raise TypeError("pow() 3rd argument not allowed unless all arguments are integers")
+        modular = np.frompyfunc(lambda base, exponent, modulus: pow(int(base), int(exponent), int(modulus)), 3, 1)
+        return modular(*arrays).astype(float)
+
+    def round_(*args):
+        _check_arity("round", args, 1, 2)
+        return np.round(args[0], int(args[1]) if len(args) == 2 else 0)
+
+    functions = {name: elementwise(name, getattr(np, attribute)) for name, attribute in _ARRAY_FUNCTION_NAMES.items()}
+    functions.update(max=extremum("max", np.maximum), min=extremum("min", np.minimum),
+                     log=log, pow=power, round=round_)
+    functions["float"] = lambda value: np.asarray(value, dtype=float)
+    _ARRAY_FUNCTIONS = functions
+    return _ARRAY_FUNCTIONS
+
+
+def _read_csv_columns(csv_path: str) -> Dict[str, list]:
+    """Read every column of a CSV file with a header row as lists of strings"""
+    with open(csv_path, "r", newline="", encoding="utf-8") as f:
+        reader = csv.reader(f)
+        header = [name.strip() for name in next(reader, [])]
+        columns = {name: [] for name in header}
+        for row in reader:
+            for name, value in zip(header, row):
+                columns[name].append(value)
+    return columns
+
+
+def _to_float(value: str) -> float:
+    value = value.strip()
+    return float(value) if value else math.nan
+
+
+def calculate_many(expression: str, variables: Optional[Dict[str, Any]] = None,
+                   csv_path: Optional[str] = None, output_path: Optional[str] = None) -> Union[Dict[str, Any], str]:
+    """
+    Evaluate one formula over whole columns of numbers at once.
+
+    Args:
+        expression: A mathematical expression using variable names, e.g. "effort * weight"
+        variables: Name to number (applied to every row), list of numbers, or CSV column name
+        csv_path: CSV file with a header row; expression names that are columns are bound automatically
+        output_path: Optional CSV file receiving the bound columns and a "result" column
+
+    Returns:
+        Summary statistics of the results (and output_path if the results were written)
+    """
+    import numpy as np
+
+    if not _ALLOWED_CHARACTERS.match(expression):
+        return "Error: Invalid characters in expression"
+
+    try:
+        compiled = compile_expression(expression)
+    except Exception as e:
+        return f"Error calculating result: {str(e)}"
+
+    columns: Dict[str, list] = {}
+    if csv_path is not None:
+        abs_path = resolve_path(csv_path)
+        if abs_path is None:
+            return "Error: Access to files outside the working directory is not allowed"
+        try:
+            columns = _read_csv_columns(abs_path)
+        except OSError as e:
+            return f"Error reading CSV file: {str(e)}"
+
+    bound: Dict[str, Any] = {}
+    for name in sorted(compiled.variables | set(variables or {})):
+        if name in FUNCTIONS or name.startswith('_'):
+            return f"Error: Invalid variable name '{name}'"
+        value = (variables or {}).get(name, name if name in columns else None)
+        if isinstance(value, str):
+            if value not in columns:
+                return f"Error: Column '{value}' not found" + ("" if csv_path else " (no csv_path given)")
+            value = [_to_float(cell) for cell in columns[value]]
+        if value is None:
+            return f"Error: Undefined variable '{name}'"
+        try:
+            # Floats throughout: integer arrays would silently wrap around on overflow
+            bound[name] = np.asarray(value, dtype=float)
+        except (TypeError, ValueError):
+            return f"Error: Variable '{name}' must be a number or a list of numbers"
+
+    lengths = {array.size for array in bound.values() if array.ndim > 0}
+    if len(lengths) > 1:
+        return f"Error: Variables have different lengths: {sorted(lengths)}"
+    if any(array.ndim > 1 for array in bound.values()):
+        return "Error: Variables must be numbers or flat lists of numbers"
+
+    functions = _array_functions(np)
+    unsupported = compiled.functions - functions.keys()
+    if unsupported:
+        return f"Error: Not supported for bulk evaluation: {', '.join(sorted(unsupported))}"
+
+    try:
+        with np.errstate(all="ignore"):
+            result = compiled.evaluate(bound, functions=functions)
+            result = np.broadcast_to(np.asarray(result, dtype=float), (lengths.pop() if lengths else 1,))
+    except Exception as e:
+        return f"Error calculating result: {str(e)}"
+
+    valid = result[~np.isnan(result)]
+    summary: Dict[str, Any] = {
+        "count": int(result.size),
+        "nan_count": int(result.size - valid.size),
+        "sum": float(valid.sum()) if valid.size else None,
+        "mean": float(valid.mean()) if valid.size else None,
+        "std": float(valid.std()) if valid.size else None,
+        "min": float(valid.min()) if valid.size else None,
+        "median": float(np.median(valid)) if valid.size else None,
+        "max": float(valid.max()) if valid.size else None,
+        "head": [None if math.isnan(value) else float(value) for value in result[:5]]
+    }
+
+    if output_path is not None:
+        abs_output = resolve_path(output_path)
+        if abs_output is None:
+            return "Error: Access to files outside the working directory is not allowed"
+        header = [name for name in bound] + ["result"]
+        series = [np.broadcast_to(bound[name], result.shape) for name in bound] + [result]
+        with open(abs_output, "w", newline="", encoding="utf-8") as f:
+            writer = csv.writer(f)
+            writer.writerow(header)
+            writer.writerows(zip(*(column.tolist() for column in series)))
+        summary["output_path"] = output_path
+
+    return summary
@@ -1,30 +1,326 @@
 # tools/file_operations.py - File handling utilities
 import os
 import json
+import mmap
+import re
+import threading
+import zlib
+from bisect import bisect_right
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Union
 
-def read_file(file_path: str) -> str:
+def resolve_path(file_path: str) -> Optional[str]:
+    """
+    Resolve a path for the file tools.
+    
+    Args:
+        file_path: Path given by the caller
+        
+    Returns:
+        The absolute path, or None if it lies outside the working directory
+    """
+    abs_path = os.path.abspath(file_path)
+    base_dir = os.path.abspath(os.getcwd())
+    if not abs_path.startswith(base_dir):
+        return None
+    return abs_path
+
+# Whole-file reads larger than this return only the head, with totals to page from
+MAX_WHOLE_READ_BYTES = 1024 * 1024
+# Byte-range and line-range reads return at most this much
+MAX_RANGE_BYTES = 256 * 1024
+# A line start is remembered roughly every this many bytes, so line-range reads seek instead of scanning
+LINE_CHECKPOINT_BYTES = 64 * 1024
+_SCAN_CHUNK = 4 * 1024 * 1024
+# Bytes at each end of the indexed prefix that must be unchanged for a file to count as appended to
+_FINGERPRINT_BYTES = 4096
+# Patterns without regex syntax are searched with mmap.find instead of the regex engine
+_REGEX_SYNTAX = set(".^$*+?{}[]\\|()")
+
+def _fingerprint(file, size: int) -> int:
+    """Checksum of the first and last _FINGERPRINT_BYTES of the file's first size bytes"""
+    file.seek(0)
+    head = file.read(min(size, _FINGERPRINT_BYTES))
+    file.seek(max(0, size - _FINGERPRINT_BYTES))
+    return zlib.crc32(file.read(size - file.tell()), zlib.crc32(head))
+
+def _newlines(data: bytes) -> int:
+    # replace() scans with memchr, roughly twice as fast as bytes.count(b"\n") on large buffers
+    return len(data) - len(data.replace(b"\n", b""))
+
+class _LineIndex:
+    """Line count and sparse line-start offsets of one file, valid for a size and mtime"""
+    
+    def __init__(self):
+        self.size = 0
+        self.mtime_ns = None
+        # Newlines seen so far
+        self.lines = 0
+        # Parallel lists: line number -> byte offset where that line starts
+        self.checkpoint_lines = [1]
+        self.checkpoint_offsets = [0]
+        self.ends_with_newline = True
+        # _fingerprint of the indexed prefix, to tell an append from a rewrite
+        self.fingerprint = 0
+    
+    def extend(self, file, new_size: int) -> None:
+        """Scan bytes from self.size to new_size in fixed-size chunks, counting in C"""
+        file.seek(self.size)
+        position = self.size
+        while position < new_size:
+            chunk = file.read(min(_SCAN_CHUNK, new_size - position))
+            if not chunk:
+                break
+            for block in range(0, len(chunk), LINE_CHECKPOINT_BYTES):
+                block_end = min(len(chunk), block + LINE_CHECKPOINT_BYTES)
+                newline = chunk.find(b"\n", block, block_end)
+                if newline != -1 and position + newline + 1 - self.checkpoint_offsets[-1] >= LINE_CHECKPOINT_BYTES:
+                    # The line after the block's first newline
+                    self.checkpoint_lines.append(self.lines + 2)
+                    self.checkpoint_offsets.append(position + newline + 1)
+                self.lines += _newlines(chunk[block:block_end])
+            position += len(chunk)
+            self.ends_with_newline = chunk.endswith(b"\n")
+        self.size = position
+        self.fingerprint = _fingerprint(file, position)
+    
+    def seek_line(self, line_number: int):
+        """(line number, offset) of the closest remembered line start at or before line_number"""
+        i = bisect_right(self.checkpoint_lines, line_number) - 1
+        return self.checkpoint_lines[i], self.checkpoint_offsets[i]
+    
+    @property
+    def total_lines(self) -> int:
+        return self.lines + (0 if self.ends_with_newline or self.size == 0 else 1)
+
+# Line indexes of the most recently read files, least recently used first
+MAX_LINE_INDEXES = 64
+_line_indexes = OrderedDict()
+_line_index_lock = threading.Lock()
+
+def _line_index(abs_path: str, file, build: bool = True) -> Optional[_LineIndex]:
+    """
+    Return an up-to-date line index for the file.
+    
+    Files that only grew since the last call (appended logs) are scanned from
+    where the previous scan stopped; any other change rebuilds the index. With
+    build=False, None is returned instead of scanning more than MAX_RANGE_BYTES
+    of a large file.
+    """
+    stat = os.fstat(file.fileno())
+    with _line_index_lock:
+        index = _line_indexes.get(abs_path)
+        if index is not None:
+            _line_indexes.move_to_end(abs_path)
+        if index is not None and index.size == stat.st_size and index.mtime_ns == stat.st_mtime_ns:
+            return index
+        # A same-size write, a shrink or changed bytes in the indexed prefix mean the file was rewritten
+        appended = (index is not None and stat.st_size > index.size
+                    and _fingerprint(file, index.size) == index.fingerprint)
+        if not appended:
+            if not build and stat.st_size > MAX_RANGE_BYTES:
+                return None
+            index = _LineIndex()
+        elif not build and stat.st_size - index.size > MAX_RANGE_BYTES:
+            return None
+        index.extend(file, stat.st_size)
+        index.mtime_ns = stat.st_mtime_ns
+        _line_indexes[abs_path] = index
+        _line_indexes.move_to_end(abs_path)
+        if len(_line_indexes) > MAX_LINE_INDEXES:
+            _line_indexes.popitem(last=False)
+        return index
+
+def _count_newlines(buffer, start: int, end: int) -> int:
+    count = 0
+    while start < end:
+        stop = min(end, start + _SCAN_CHUNK)
+        count += _newlines(buffer[start:stop])
+        start = stop
+    return count
+
+def _decode(data: bytes) -> str:
+    return data.decode("utf-8", errors="replace")
+
+def _read_bytes(file, total_bytes: int, offset: int, length: int) -> Dict[str, Any]:
+    offset = max(0, min(offset, total_bytes))
+    length = max(0, min(length, MAX_RANGE_BYTES))
+    file.seek(offset)
+    data = file.read(length)
+    return {"offset": offset, "length": len(data), "content": _decode(data)}
+
+def _read_lines(file, index: _LineIndex, start_line: int, end_line: Optional[int]) -> Dict[str, Any]:
+    start_line = max(1, start_line)
+    end_line = index.total_lines if end_line is None else min(end_line, index.total_lines)
+    
+    # Seek to the nearest remembered line start, then skip forward line by line
+    line_number, offset = index.seek_line(start_line)
+    file.seek(offset)
+    while line_number < start_line and file.readline():
+        line_number += 1
+    
+    lines = []
+    size = 0
+    while line_number <= end_line:
+        line = file.readline()
+        if not line or size + len(line) > MAX_RANGE_BYTES:
+            break
+        lines.append(line)
+        size += len(line)
+        line_number += 1
+    
+    return {
+        "start_line": start_line,
+        "end_line": start_line + len(lines) - 1,
+        "content": _decode(b"".join(lines))
+    }
+
+def _read_tail(file, total_bytes: int, tail: int) -> Dict[str, Any]:
+    # Read backwards in blocks until enough line breaks were seen, at most MAX_RANGE_BYTES
+    position = total_bytes
+    blocks = []
+    newlines = 0
+    while position > 0 and newlines <= tail and total_bytes - position < MAX_RANGE_BYTES:
+        step = min(64 * 1024, position, MAX_RANGE_BYTES - (total_bytes - position))
+        position -= step
+        file.seek(position)
+        block = file.read(step)
+        blocks.append(block)
+        newlines += block.count(b"\n")
+    data = b"".join(reversed(blocks))
+    
+    all_lines = data.splitlines(keepends=True)
+    if position > 0 and all_lines and len(all_lines) <= tail:
+        # The cap was hit: the first line is partial unless the byte before it ends a line
+        file.seek(position - 1)
+        if file.read(1) != b"\n":
+            all_lines = all_lines[1:]
+    lines = all_lines[-tail:] if tail > 0 else []
+    content = b"".join(lines)
+    result = {"offset": total_bytes - len(content), "lines": len(lines), "content": _decode(content)}
+    if len(lines) < tail and total_bytes - len(content) > 0:
+        result["truncated"] = True
+    return result
+
+def _find_all(buffer, pattern: str):
+    """Yield the start offset of every match of pattern in the buffer"""
+    if _REGEX_SYNTAX.isdisjoint(pattern):
+        needle = pattern.encode("utf-8")
+        position = buffer.find(needle)
+        while position != -1 and needle:
+            yield position
+            position = buffer.find(needle, position + 1)
+        return
+    for match in re.compile(pattern.encode("utf-8"), re.MULTILINE).finditer(buffer):
+        yield match.start()
+
+def _search(abs_path: str, total_bytes: int, pattern: str, max_matches: int) -> Dict[str, Any]:
+    re.compile(pattern)
+    matches = []
+    truncated = False
+    if total_bytes == 0:
+        return {"pattern": pattern, "matches": matches, "truncated": truncated}
+    
+    with open(abs_path, "rb") as file, mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as buffer:
+        line_number = 1
+        counted_to = 0
+        last_line_start = -1
+        for match_start in _find_all(buffer, pattern):
+            line_start = buffer.rfind(b"\n", 0, match_start) + 1
+            if line_start == last_line_start:
+                # One hit per line
+                continue
+            if len(matches) >= max_matches:
+                truncated = True
+                break
+            line_number += _count_newlines(buffer, counted_to, line_start)
+            counted_to = line_start
+            line_end = buffer.find(b"\n", match_start)
+            if line_end == -1:
+                line_end = total_bytes
+            matches.append({
+                "line": line_number,
+                "offset": line_start,
+                "text": _decode(buffer[line_start:min(line_end, line_start + 1000)]).rstrip("\r")
+            })
+            last_line_start = line_start
+    
+    return {"pattern": pattern, "matches": matches, "truncated": truncated}
+
+def read_file(file_path: str, offset: Optional[int] = None, length: Optional[int] = None,
+              start_line: Optional[int] = None, end_line: Optional[int] = None,
+              tail: Optional[int] = None, pattern: Optional[str] = None,
+              max_matches: int = 100) -> Union[str, Dict[str, Any]]:
     """
     Read the contents of a file.
     
+    With no options the whole file is returned as a string. For large files use
+    one of the ranged modes, which return a dict with the content plus the
+    file's total_bytes and total_lines so the next page can be requested
+    (total_lines is None when only a scan of a large file could count them;
+    a line-range read builds that count):
+    offset/length for a byte range, start_line/end_line (1-based, inclusive) for
+    a line range, tail for the last N lines, or pattern for the lines matching a
+    regular expression.
+    
     Args:
         file_path: Path to the file to read
+        offset: First byte to read (byte-range mode)
+        length: Number of bytes to read (byte-range mode)
+        start_line: First line to read (line-range mode)
+        end_line: Last line to read (line-range mode, defaults to the end of the file)
+        tail: Number of lines to read from the end of the file
+        pattern: Regular expression; returns matching lines with their line numbers
+        max_matches: Maximum number of matching lines returned in pattern mode
         
     Returns:
-        Contents of the file as a string
+        Contents of the file as a string, or a dict for ranged modes
     """
     try:
         # Security check - prevent directory traversal
-        abs_path = os.path.abspath(file_path)
-        base_dir = os.path.abspath(os.getcwd())
-        
-        if not abs_path.startswith(base_dir):
+        abs_path = resolve_path(file_path)
+        if abs_path is None:
             return "Error: Access to files outside the working directory is not allowed"
         
         if not os.path.exists(abs_path):
             return f"Error: File '{file_path}' not found"
         
-        with open(abs_path, 'r') as file:
-            return file.read()
+        modes = [name for name, value in (("byte range", offset if offset is not None else length),
+                                          ("line range", start_line if start_line is not None else end_line),
+                                          ("tail", tail), ("pattern", pattern)) if value is not None]
+        if len(modes) > 1:
+            return f"Error: Choose only one read mode, got: {', '.join(modes)}"
+        
+        total_bytes = os.path.getsize(abs_path)
+        if not modes and total_bytes <= MAX_WHOLE_READ_BYTES:
+            with open(abs_path, 'r') as file:
+                return file.read()
+        
+        with open(abs_path, 'rb') as file:
+            if pattern is not None:
+                try:
+                    result = _search(abs_path, total_bytes, pattern, max_matches)
+                except re.error as e:
+                    return f"Error: Invalid pattern: {str(e)}"
+            elif tail is not None:
+                result = _read_tail(file, total_bytes, tail)
+            elif start_line is not None or end_line is not None:
+                index = _line_index(abs_path, file)
+                result = _read_lines(file, index, start_line or 1, end_line)
+            else:
+                result = _read_bytes(file, total_bytes, offset or 0,
+                                     length if length is not None else MAX_RANGE_BYTES)
+                if not modes:
+                    result["truncated"] = True
+            
+            if start_line is None and end_line is None:
+                # Only line-range reads need the index; the others stay cheap and report
+                # a line count only if it is already (or cheaply) known
+                index = _line_index(abs_path, file, build=False)
+        
+        result.update(file=file_path, total_bytes=total_bytes,
+                      total_lines=index.total_lines if index is not None else None)
+        return result
     except Exception as e:
         return f"Error reading file: {str(e)}"
 
@@ -41,10 +337,8 @@ def write_file(file_path: str, content: str) -> str:
     """
     try:
         # Security check - prevent directory traversal
-        abs_path = os.path.abspath(file_path)
-        base_dir = os.path.abspath(os.getcwd())
-        
-        if not abs_path.startswith(base_dir):
+        abs_path = resolve_path(file_path)
+        if abs_path is None:
             return "Error: Access to files outside the working directory is not allowed"
         
         # Create directories if they don't exist
@@ -0,0 +1,402 @@
+# tools/file_search.py - Inverted index over the working directory for fast text search
+import math
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import defaultdict
+from typing import Any, Dict, Iterator, List, Optional, Tuple, Union
+
+try:
+    from re import _parser as _regex_parser  # Python 3.11+
+except ImportError:
+    import sre_parse as _regex_parser
+
+from tools.file_operations import resolve_path
+
+INDEX_DIR = ".smolagent"
+INDEX_FILE = "search_index.sqlite3"
+# Files larger than this, and files that look binary, are not indexed
+MAX_INDEXED_BYTES = 2 * 1024 * 1024
+SKIPPED_DIRS = {".git", ".hg", ".svn", INDEX_DIR, "__pycache__", "node_modules", ".venv", "venv",
+                ".mypy_cache", ".pytest_cache", ".tox"}
+# Seconds a refresh stays valid; repeated searches do not re-stat the tree every time
+REFRESH_INTERVAL = 2.0
+# Seconds a search waits for the first index build before answering that indexing is under way
+INITIAL_INDEX_WAIT = 5.0
+MAX_SNIPPET_CHARS = 200
+
+_TOKEN_PATTERN = re.compile(r"\w{2,}")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS files (
+    id INTEGER PRIMARY KEY,
+    path TEXT UNIQUE NOT NULL,
+    size INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS postings (
+    token TEXT NOT NULL,
+    file_id INTEGER NOT NULL,
+    line INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS postings_token ON postings (token);
+CREATE INDEX IF NOT EXISTS postings_file ON postings (file_id);
+"""
+
+
+def tokenize(text: str) -> List[str]:
+    """Lower-cased word tokens of at least two characters"""
+    return _TOKEN_PATTERN.findall(text.lower())
+
+
+def _literal_runs(pattern: str) -> List[str]:
+    """
+    Literal text every match of the pattern contains, in runs.
+
+    Only top-level literals count (anything inside groups, alternations or
+    repeats may be skipped by a match); word boundaries and anchors become
+    spaces, since they also end a token.
+    """
+    runs, run = [], []
+    for op, value in _regex_parser.parse(pattern):
+        if op == _regex_parser.LITERAL:
+            run.append(chr(value))
+        elif op == _regex_parser.AT and value != _regex_parser.AT_NON_BOUNDARY:
+            run.append(" ")
+        else:
+            runs.append("".join(run))
+            run = []
+    runs.append("".join(run))
+    return [run for run in runs if run.strip()]
+
+
+def required_tokens(pattern: str) -> List[Tuple[str, bool]]:
+    """
+    Index tokens a line must contain to match the pattern, as (token, is_prefix) pairs.
+
+    A word is a whole token only when the pattern fixes the characters on both
+    sides of it; a word that only starts after a fixed character is a token prefix.
+    """
+    tokens = []
+    for run in _literal_runs(pattern):
+        for word in re.finditer(r"\w+", run.lower()):
+            if len(word.group()) < 2 or word.start() == 0:
+                continue
+            tokens.append((word.group(), word.end() == len(run)))
+    return tokens
+
+
+def _walk(root: str) -> Iterator[Tuple[str, os.stat_result]]:
+    """Yield (relative path, stat) for every regular file under root, skipping tool and VCS directories"""
+    pending = [root]
+    while pending:
+        directory = pending.pop()
+        try:
+            with os.scandir(directory) as entries:
+                for entry in entries:
+                    try:
+                        if entry.is_dir(follow_symlinks=False):
+                            if entry.name not in SKIPPED_DIRS:
+                                pending.append(entry.path)
+                        elif entry.is_file(follow_symlinks=False):
+                            yield os.path.relpath(entry.path, root), entry.stat(follow_symlinks=False)
+                    except OSError:
+                        continue
+        except OSError:
+            continue
+
+
+def _read_text(path: str) -> Optional[str]:
+    try:
+        with open(path, "rb") as f:
+            data = f.read(MAX_INDEXED_BYTES + 1)
+    except OSError:
+        return None
+    if len(data) > MAX_INDEXED_BYTES or b"\0" in data[:8192]:
+        return None
+    return data.decode("utf-8", errors="replace")
+
+
+class FileIndex:
+    """
+    Token -> (file, line) postings for every text file under a root, kept in SQLite.
+
+    refresh() re-reads only files whose size or mtime changed and drops files
+    that disappeared, so keeping the index current costs one stat per file.
+    """
+
+    def __init__(self, root: str, index_path: Optional[str] = None):
+        """
+        Args:
+            root: Directory to index
+            index_path: SQLite file (defaults to .smolagent/search_index.sqlite3 under root)
+        """
+        self.root = os.path.abspath(root)
+        self.index_path = index_path or os.path.join(self.root, INDEX_DIR, INDEX_FILE)
+        os.makedirs(os.path.dirname(self.index_path), exist_ok=True)
+        self._lock = threading.Lock()
+        self._refreshed_at = 0.0
+        self._builder: Optional[threading.Thread] = None
+        self._builder_lock = threading.Lock()
+        with self._connect() as db:
+            db.executescript(_SCHEMA)
+
+    def _connect(self) -> sqlite3.Connection:
+        db = sqlite3.connect(self.index_path, timeout=30)
+        db.execute("PRAGMA journal_mode=WAL")
+        db.execute("PRAGMA synchronous=NORMAL")
+        return db
+
+    def refresh(self, force: bool = False) -> Dict[str, int]:
+        """
+        Bring the index up to date with the files on disk.
+
+        Args:
+            force: Refresh even if the last refresh is recent
+
+        Returns:
+            Counts of files added/updated, removed and unchanged
+        """
+        with self._lock:
+            if not force and time.monotonic() - self._refreshed_at < REFRESH_INTERVAL:
+                return {"updated": 0, "removed": 0, "unchanged": 0}
+
+            stats = {"updated": 0, "removed": 0, "unchanged": 0}
+            db = self._connect()
+            try:
+                known = {path: (file_id, size, mtime_ns)
+                         for file_id, path, size, mtime_ns in db.execute("SELECT id, path, size, mtime_ns FROM files")}
+                seen = set()
+                with db:
+                    for path, stat in _walk(self.root):
+                        seen.add(path)
+                        current = known.get(path)
+                        if current is not None and current[1:] == (stat.st_size, stat.st_mtime_ns):
+                            stats["unchanged"] += 1
+                            continue
+                        if current is not None:
+                            db.execute("DELETE FROM postings WHERE file_id = ?", (current[0],))
+                        self._index_file(db, path, stat, current[0] if current else None)
+                        stats["updated"] += 1
+
+                    for path in known.keys() - seen:
+                        file_id = known[path][0]
+                        db.execute("DELETE FROM postings WHERE file_id = ?", (file_id,))
+                        db.execute("DELETE FROM files WHERE id = ?", (file_id,))
+                        stats["removed"] += 1
+            finally:
+                db.close()
+
+            self._refreshed_at = time.monotonic()
+            return stats
+
+    def is_empty(self) -> bool:
+        """Whether no file has been indexed yet (in this or an earlier process)"""
+        db = self._connect()
+        try:
+            return db.execute("SELECT 1 FROM files LIMIT 1").fetchone() is None
+        finally:
+            db.close()
+
+    def build_in_background(self) -> threading.Thread:
+        """Start a full refresh on a daemon thread, or return the one already running"""
+        with self._builder_lock:
+            if self._builder is None or not self._builder.is_alive():
+                self._builder = threading.Thread(target=self.refresh, kwargs={"force": True},
+                                                 name="file-index", daemon=True)
+                self._builder.start()
+            return self._builder
+
+    def _index_file(self, db: sqlite3.Connection, path: str, stat: os.stat_result, file_id: Optional[int]) -> None:
+        if file_id is None:
+            file_id = db.execute("INSERT INTO files (path, size, mtime_ns) VALUES (?, ?, ?)",
+                                 (path, stat.st_size, stat.st_mtime_ns)).lastrowid
+        else:
+            db.execute("UPDATE files SET size = ?, mtime_ns = ? WHERE id = ?",
+                       (stat.st_size, stat.st_mtime_ns, file_id))
+
+        # Unreadable and binary files stay in the table (so they are not re-read) without postings
+        text = _read_text(os.path.join(self.root, path))
+        if text is None:
+            return
+        rows = []
+        for line_number, line in enumerate(text.splitlines(), 1):
+            rows.extend((token, file_id, line_number) for token in set(tokenize(line)))
+        db.executemany("INSERT INTO postings (token, file_id, line) VALUES (?, ?, ?)", rows)
+
+    def search(self, query: str, max_results: int = 20, prefix: str = "") -> List[Dict[str, Any]]:
+        """
+        Rank lines by the query tokens they contain, weighting rare tokens higher.
+
+        Args:
+            query: Words to look for
+            max_results: Maximum number of hits
+            prefix: Only return files whose relative path starts with this
+
+        Returns:
+            Hits with file, line, score and snippet, best first
+        """
+        tokens = sorted(set(tokenize(query)))
+        if not tokens:
+            return []
+
+        db = self._connect()
+        try:
+            total_files = db.execute("SELECT COUNT(*) FROM files").fetchone()[0] or 1
+            scores = defaultdict(float)
+            matched = defaultdict(int)
+            for token in tokens:
+                postings = db.execute(
+                    "SELECT files.path, postings.line FROM postings JOIN files ON files.id = postings.file_id "
+                    "WHERE postings.token = ? AND files.path LIKE ? ESCAPE '\\'",
+                    (token, _like_prefix(prefix))
+                ).fetchall()
+                if not postings:
+                    continue
+                document_frequency = len({path for path, _ in postings})
+                weight = math.log(1 + total_files / document_frequency)
+                for path, line in postings:
+                    scores[(path, line)] += weight
+                    matched[(path, line)] += 1
+        finally:
+            db.close()
+
+        # Lines containing every query token come first, then the rarest matches
+        ranked = sorted(scores, key=lambda hit: (-matched[hit], -scores[hit], hit))[:max_results]
+        return self._with_snippets([
+            {"file": path, "line": line, "score": round(scores[(path, line)], 3)} for path, line in ranked
+        ])
+
+    def search_regex(self, pattern: str, max_results: int = 20, prefix: str = "") -> List[Dict[str, Any]]:
+        """
+        Scan indexed text files for a regular expression.
+
+        Files that lack any token the pattern requires (see required_tokens)
+        are ruled out from the postings without being read; only patterns with
+        no usable literal scan every indexed file. Files with more matching
+        lines are ranked first.
+        """
+        regex = re.compile(pattern)
+        db = self._connect()
+        try:
+            query = "SELECT path FROM files WHERE path LIKE ? ESCAPE '\\'"
+            params: List[Any] = [_like_prefix(prefix)]
+            for token, is_prefix in required_tokens(pattern):
+                if is_prefix:
+                    # Index range scan over the tokens starting with this word
+                    query += " AND id IN (SELECT file_id FROM postings WHERE token >= ? AND token < ?)"
+                    params.extend([token, token[:-1] + chr(ord(token[-1]) + 1)])
+                else:
+                    query += " AND id IN (SELECT file_id FROM postings WHERE token = ?)"
+                    params.append(token)
+            paths = [path for (path,) in db.execute(query + " ORDER BY path", params)]
+        finally:
+            db.close()
+
+        per_file = []
+        for path in paths:
+            text = _read_text(os.path.join(self.root, path))
+            if text is None:
+                continue
+            lines = [(number, line) for number, line in enumerate(text.splitlines(), 1) if regex.search(line)]
+            if lines:
+                per_file.append((path, lines))
+
+        per_file.sort(key=lambda item: -len(item[1]))
+        hits = []
+        for path, lines in per_file:
+            for number, line in lines:
+                if len(hits) >= max_results:
+                    return hits
+                hits.append({"file": path, "line": number, "score": len(lines),
+                             "snippet": line.strip()[:MAX_SNIPPET_CHARS]})
+        return hits
+
+    def _with_snippets(self, hits: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        wanted = defaultdict(set)
+        for hit in hits:
+            wanted[hit["file"]].add(hit["line"])
+
+        lines = {}
+        for path, numbers in wanted.items():
+            last = max(numbers)
+            try:
+                with open(os.path.join(self.root, path), "r", encoding="utf-8", errors="replace") as f:
+                    for number, line in enumerate(f, 1):
+                        if number in numbers:
+                            lines[(path, number)] = line.strip()[:MAX_SNIPPET_CHARS]
+                        if number >= last:
+                            break
+            except OSError:
+                continue
+
+        for hit in hits:
+            hit["snippet"] = lines.get((hit["file"], hit["line"]), "")
+        return hits
+
+
+def _like_prefix(prefix: str) -> str:
+    escaped = prefix.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+    return escaped + "%"
+
+
+_indexes: Dict[str, FileIndex] = {}
+_indexes_lock = threading.Lock()
+
+
+def get_index(root: Optional[str] = None) -> FileIndex:
+    """The shared index for root (the working directory by default)"""
+    root = os.path.abspath(root or os.getcwd())
+    with _indexes_lock:
+        index = _indexes.get(root)
+        if index is None:
+            index = _indexes[root] = FileIndex(root)
+        return index
+
+
+def search_files(query: str, regex: bool = False, path: str = ".", max_results: int = 20) -> Union[Dict[str, Any], str]:
+    """
+    Search the text files in the working directory.
+
+    Args:
+        query: Words to find (ranked by how many and how rare), or a regular expression if regex is true
+        regex: Treat query as a regular expression
+        path: Only search files under this directory
+        max_results: Maximum number of hits to return
+
+    Returns:
+        Ranked hits as {"file", "line", "location", "score", "snippet"}, no hits with
+        "indexing" set while the first index build is still running, or an error message
+    """
+    abs_path = resolve_path(path)
+    if abs_path is None:
+        return "Error: Access to files outside the working directory is not allowed"
+
+    try:
+        index = get_index()
+        if index.is_empty():
+            # The first build walks and reads the whole tree; it carries on in the
+            # background instead of running into the tool timeout
+            builder = index.build_in_background()
+            builder.join(INITIAL_INDEX_WAIT)
+            if builder.is_alive():
+                return {"query": query, "hits": [], "indexing": True,
+                        "message": "The file index is still being built; search again shortly"}
+        else:
+            index.refresh()
+        prefix = os.path.relpath(abs_path, index.root)
+        prefix = "" if prefix == "." else prefix.rstrip(os.sep) + os.sep
+        max_results = max(1, min(int(max_results), 200))
+        if regex:
+            try:
+                hits = index.search_regex(query, max_results, prefix)
+            except re.error as e:
+                return f"Error: Invalid pattern: {str(e)}"
+        else:
+            hits = index.search(query, max_results, prefix)
+    except (OSError, sqlite3.Error) as e:
+        return f"Error searching files: {str(e)}"
+
+    return {"query": query, "hits": [dict(hit, location=f"{hit['file']}:{hit['line']}") for hit in hits]}
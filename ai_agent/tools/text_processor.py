@@ -1,7 +1,15 @@
 # tools/text_processor.py - Example of a custom text processing module
 
+import itertools
+import json
+import os
 import re
-from typing import Dict, List, Union
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Pattern, Tuple, Union
+
+from tools.file_operations import resolve_path
 
 
 def summarize(text: str, max_length: int = 200) -> str:
@@ -31,132 +39,581 @@ def summarize(text: str, max_length: int = 200) -> str:
     return text[:max_length-3] + "..."
 
 
-def extract_entities(text: str) -> Dict[str, List[str]]:
+_EMAIL = r'(?P<emails>[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Za-z]{2,}\b)'
+_URL = r'(?P<urls>https?://[^\s]+)'
+_DATE_OR_NUMBER = r'(?=\d)(?:(?P<dates>\d{1,2}[/-]\d{1,2}[/-]\d{2,4}\b)|(?P<numbers>\d+(?:\.\d+)?\b))'
+
+
+@lru_cache(maxsize=None)
+def entity_pattern(emails: bool = True, urls: bool = True) -> Pattern:
+    """
+    The entity alternation, compiled once per combination of optional branches.
+    
+    Every type is a named group of one pattern, so a single scan finds them all.
+    At any position the earlier group wins, so entities do not overlap (the
+    digits of a date are not also reported as numbers). Branches that cannot
+    match a text are left out by the caller, since each one costs time at
+    every position of the scan.
+    """
+    word = f"{_EMAIL}|{_DATE_OR_NUMBER}" if emails else _DATE_OR_NUMBER
+    pattern = rf"\b(?:{word})"
+    if urls:
+        pattern += f"|{_URL}"
+    return re.compile(pattern)
+
+
+# Documents sent to a worker process at a time by extract_entities_batch
+BATCH_CHUNK_SIZE = 256
+
+
+def iter_entities(text: str) -> Iterator[Tuple[str, str, int, int]]:
+    """
+    Scan a text once for entities.
+    
+    Args:
+        text: The text to analyze
+        
+    Yields:
+        (entity type, matched text, start offset, end offset) in order of appearance
+    """
+    # Emails need an "@" and URLs a "://", so skip those branches when the text has neither
+    pattern = entity_pattern("@" in text, "://" in text)
+    for match in pattern.finditer(text):
+        entity_type = match.lastgroup
+        yield entity_type, match.group(entity_type), match.start(), match.end()
+
+
+def extract_entities(text: str, with_offsets: bool = False) -> Dict[str, List[Any]]:
     """
     Extract named entities from text.
     
     Args:
         text: The text to analyze
+        with_offsets: Return {"text", "start", "end"} for each entity instead of the plain string
         
     Returns:
         Dictionary with entity types and lists of entities
     """
     # In a real implementation, you would use an NLP library like spaCy
     # This is a simple pattern matching for demonstration
-    
-    # Very basic patterns
-    patterns = {
-        "emails": r'\b[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Z|a-z]{2,}\b',
-        "urls": r'https?://[^\s]+',
-        "dates": r'\b\d{1,2}[/-]\d{1,2}[/-]\d{2,4}\b',
-        "numbers": r'\b\d+(?:\.\d+)?\b'
-    }
-    
     results = {}
-    for entity_type, pattern in patterns.items():
-        matches = re.findall(pattern, text)
-        if matches:
-            results[entity_type] = matches
-    
+    for entity_type, value, start, end in iter_entities(text):
+        entity = {"text": value, "start": start, "end": end} if with_offsets else value
+        results.setdefault(entity_type, []).append(entity)
     return results
 
 
-def sentiment_analysis(text: str) -> Dict[str, Union[str, float]]:
+def _extract_chunk(documents: List[str], with_offsets: bool) -> List[Dict[str, List[Any]]]:
+    return [extract_entities(document, with_offsets) for document in documents]
+
+
+def _read_documents(path: str) -> Iterator[str]:
+    """One document per non-empty line; .jsonl lines hold a string or an object with a "text" field"""
+    is_jsonl = path.endswith(".jsonl")
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.rstrip("\n")
+            if not line.strip():
+                continue
+            if is_jsonl:
+                document = json.loads(line)
+                yield document.get("text", "") if isinstance(document, dict) else str(document)
+            else:
+                yield line
+
+
+def _chunks(documents: Iterable[str], size: int) -> Iterator[List[str]]:
+    iterator = iter(documents)
+    while True:
+        chunk = list(itertools.islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def _map_chunks(function: Callable[..., List[Any]], chunks: Iterator[List[Any]],
+                workers: Optional[int], *args: Any, initializer: Optional[Callable] = None,
+                initargs: tuple = ()) -> Iterator[Any]:
+    """
+    Apply function(chunk, *args) to each chunk, in worker processes unless workers is 1, yielding in order.
+
+    args are pickled with every chunk, so they should be small (a path, not a
+    table); initializer(*initargs) runs once in each worker process.
+    """
+    workers = workers or os.cpu_count() or 1
+    if workers <= 1:
+        for chunk in chunks:
+            yield from function(chunk, *args)
+        return
+
+    # Only a bounded number of chunks is in flight, so memory stays flat however long the input is
+    with ProcessPoolExecutor(max_workers=workers, initializer=initializer, initargs=initargs) as pool:
+        pending = deque()
+        for chunk in chunks:
+            pending.append(pool.submit(function, chunk, *args))
+            if len(pending) >= workers * 2:
+                yield from pending.popleft().result()
+        while pending:
+            yield from pending.popleft().result()
+
+
+def extract_entities_batch(documents: Optional[Iterable[str]] = None, workers: Optional[int] = 1,
+                           with_offsets: bool = False, chunk_size: int = BATCH_CHUNK_SIZE, *,
+                           path: Optional[str] = None) -> Iterator[Dict[str, List[Any]]]:
+    """
+    Extract entities from many documents, streaming results in input order.
+    
+    Args:
+        documents: Iterable of texts
+        workers: Worker processes (1 runs in this process; None for one per CPU)
+        with_offsets: Include start/end offsets for each entity
+        chunk_size: Documents handed to a worker at a time
+        path: Read the documents from this file instead, one per line
+              (.jsonl files: a JSON string or an object with a "text" field per line)
+        
+    Yields:
+        The extract_entities result for each document
+    """
+    # A lone string would otherwise be iterated character by character
+    if isinstance(documents, str):
+        raise TypeError("documents must be an iterable of texts, not a str; pass a file as path=")
+    if (documents is None) == (path is None):
+        raise TypeError("pass exactly one of documents and path")
+    if path is not None:
+        documents = _read_documents(path)
+    chunks = _chunks(documents, max(1, chunk_size))
+    yield from _map_chunks(_extract_chunk, chunks, workers, with_offsets)
+
+
+# Tokens that flip the polarity of the sentiment terms right after them
+NEGATIONS = frozenset(["not", "no", "never", "neither", "nor", "without", "hardly", "barely", "cannot"])
+# Sentiment terms this many tokens after a negation are flipped; punctuation ends the scope earlier
+NEGATION_WINDOW = 3
+_SENTIMENT_TOKEN_PATTERN = re.compile(r"[a-z0-9]+(?:'[a-z]+)*|[.,;:!?]")
+_CLAUSE_BREAKS = frozenset(".,;:!?")
+
+DEFAULT_POSITIVE_WORDS = ['good', 'great', 'excellent', 'amazing', 'wonderful', 'best', 'love', 'happy']
+DEFAULT_NEGATIVE_WORDS = ['bad', 'terrible', 'awful', 'horrible', 'worst', 'hate', 'sad', 'disappointed']
+
+
+class SentimentLexicon:
+    """
+    Weighted sentiment terms looked up per token in a dict.
+
+    Terms may be phrases of several words ("not bad", "thumbs up"). Scoring
+    tries the longest phrase at each token first, so the cost is linear in the
+    text and independent of the lexicon size.
+    """
+
+    def __init__(self, weights: Dict[str, float]):
+        """
+        Args:
+            weights: Term (lowercase, words separated by single spaces) -> weight, positive or negative
+        """
+        self.weights = {" ".join(term.lower().split()): float(weight) for term, weight in weights.items()}
+        self.max_words = max((term.count(" ") + 1 for term in self.weights), default=1)
+        # Only tokens that start a phrase pay for the multi-word lookups
+        self._phrase_starts = {term.split(" ", 1)[0] for term in self.weights if " " in term}
+
+    @classmethod
+    def default(cls) -> "SentimentLexicon":
+        """The built-in demonstration lexicon, every term weighted +1 or -1"""
+        weights = {word: 1.0 for word in DEFAULT_POSITIVE_WORDS}
+        weights.update({word: -1.0 for word in DEFAULT_NEGATIVE_WORDS})
+        return cls(weights)
+
+    @classmethod
+    def load(cls, path: str) -> "SentimentLexicon":
+        """
+        Load a lexicon file.
+        
+        Args:
+            path: A JSON object of term -> weight, or a text file with one
+                  "term<TAB>weight" (or "term,weight") per line; "#" starts a comment
+                  
+        Returns:
+            The lexicon
+        """
+        with open(path, "r", encoding="utf-8") as f:
+            if path.endswith(".json"):
+                return cls(json.load(f))
+            weights = {}
+            for line in f:
+                line = line.split("#", 1)[0].strip()
+                if not line:
+                    continue
+                term, _, weight = line.rpartition("\t" if "\t" in line else ",")
+                weights[term.strip()] = float(weight)
+            return cls(weights)
+
+    def score(self, text: str) -> Dict[str, Union[str, float]]:
+        """
+        Score one text.
+        
+        Args:
+            text: The text to analyze
+            
+        Returns:
+            Dictionary with sentiment label, score in [-1, 1] and the number of
+            positive and negative term occurrences (after negation)
+        """
+        tokens = _SENTIMENT_TOKEN_PATTERN.findall(text.lower())
+        positive = negative = 0.0
+        positive_count = negative_count = 0
+        # Index of the last token still inside a negation's scope
+        negated_until = -1
+        i = 0
+        while i < len(tokens):
+            token = tokens[i]
+            if token in _CLAUSE_BREAKS:
+                negated_until = -1
+                i += 1
+                continue
+
+            weight = None
+            if token in self._phrase_starts:
+                for size in range(min(self.max_words, len(tokens) - i), 1, -1):
+                    weight = self.weights.get(" ".join(tokens[i:i + size]))
+                    if weight is not None:
+                        break
+            if weight is None:
+                size = 1
+                weight = self.weights.get(token)
+
+            if weight is None:
+                if token in NEGATIONS or token.endswith("n't"):
+                    negated_until = i + NEGATION_WINDOW
+                i += 1
+                continue
+
+            if i <= negated_until:
+                weight = -weight
+            if weight > 0:
+                positive += weight
+                positive_count += 1
+            elif weight < 0:
+                negative -= weight
+                negative_count += 1
+            i += size
+
+        # Calculate sentiment score (-1 to 1)
+        total = positive + negative
+        score = 0.0 if total == 0 else (positive - negative) / total
+
+        # Determine sentiment label
+        if score > 0.3:
+            label = "positive"
+        elif score < -0.3:
+            label = "negative"
+        else:
+            label = "neutral"
+
+        return {
+            "label": label,
+            "score": score,
+            "positive_count": positive_count,
+            "negative_count": negative_count
+        }
+
+
+_DEFAULT_LEXICON = SentimentLexicon.default()
+
+
+@lru_cache(maxsize=16)
+def _load_lexicon(path: str, mtime_ns: int) -> SentimentLexicon:
+    return SentimentLexicon.load(path)
+
+
+def get_lexicon(lexicon: Union[SentimentLexicon, str, None] = None) -> SentimentLexicon:
+    """The default lexicon, the given one, or the one in a file (cached until the file changes)"""
+    if lexicon is None:
+        return _DEFAULT_LEXICON
+    if isinstance(lexicon, SentimentLexicon):
+        return lexicon
+    return _load_lexicon(lexicon, os.stat(lexicon).st_mtime_ns)
+
+
+def sentiment_analysis(text: str, lexicon: Optional[str] = None) -> Union[Dict[str, Union[str, float]], str]:
     """
     Analyze the sentiment of the text.
     
     Args:
         text: The text to analyze
+        lexicon: Path of a weighted lexicon file (default: the built-in word lists)
         
     Returns:
-        Dictionary with sentiment label and score
+        Dictionary with sentiment label and score, or an error message
     """
     # In a real implementation, you would use an NLP library or API
-    # This is a naive implementation for demonstration
-    
-    positive_words = ['good', 'great', 'excellent', 'amazing', 'wonderful', 'best', 'love', 'happy']
-    negative_words = ['bad', 'terrible', 'awful', 'horrible', 'worst', 'hate', 'sad', 'disappointed']
-    
-    # Convert to lowercase for matching
-    text_lower = text.lower()
-    
-    # Count positive and negative words
-    positive_count = sum(1 for word in positive_words if word in text_lower)
-    negative_count = sum(1 for word in negative_words if word in text_lower)
-    
-    # Calculate sentiment score (-1 to 1)
-    total = positive_count + negative_count
-    if total == 0:
-        score = 0.0
-    else:
-        score = (positive_count - negative_count) / total
+    # This is a naive lexicon-based implementation for demonstration
+    if lexicon is not None:
+        lexicon = resolve_path(lexicon)
+        if lexicon is None:
+            return "Error: Access to files outside the working directory is not allowed"
+    try:
+        engine = get_lexicon(lexicon)
+    except (OSError, ValueError) as e:
+        return f"Error loading lexicon: {str(e)}"
+    return engine.score(text)
+
+
+# An in-memory lexicon given to sentiment_analysis_batch, installed once per worker process
+_worker_lexicon: Optional[SentimentLexicon] = None
+
+
+def _install_lexicon(lexicon: SentimentLexicon) -> None:
+    global _worker_lexicon
+    _worker_lexicon = lexicon
+
+
+def _score_chunk(texts: List[str], lexicon_path: Optional[str]) -> List[Dict[str, Union[str, float]]]:
+    # Workers load a lexicon file at most once each, through the per-process cache
+    engine = _worker_lexicon if _worker_lexicon is not None else get_lexicon(lexicon_path)
+    return [engine.score(text) for text in texts]
+
+
+def sentiment_analysis_batch(texts: Iterable[str], lexicon: Union[SentimentLexicon, str, None] = None,
+                             workers: Optional[int] = 1,
+                             chunk_size: int = BATCH_CHUNK_SIZE) -> Iterator[Dict[str, Union[str, float]]]:
+    """
+    Score many texts with one lexicon, streaming results in input order.
     
-    # Determine sentiment label
-    if score > 0.3:
-        label = "positive"
-    elif score < -0.3:
-        label = "negative"
+    Args:
+        texts: Iterable of texts
+        lexicon: Lexicon or lexicon file path (default: the built-in word lists)
+        workers: Worker processes (1 runs in this process; None for one per CPU)
+        chunk_size: Texts handed to a worker at a time
+        
+    Yields:
+        The sentiment_analysis result for each text
+    """
+    # Load (and validate) in this process first, so forked workers inherit the cached table
+    engine = get_lexicon(lexicon)
+    if (workers or os.cpu_count() or 1) <= 1:
+        yield from (engine.score(text) for text in texts)
+        return
+
+    chunks = _chunks(texts, max(1, chunk_size))
+    if isinstance(lexicon, SentimentLexicon):
+        yield from _map_chunks(_score_chunk, chunks, workers, None,
+                               initializer=_install_lexicon, initargs=(lexicon,))
     else:
-        label = "neutral"
-    
-    return {
-        "label": label,
-        "score": score,
-        "positive_count": positive_count,
-        "negative_count": negative_count
+        yield from _map_chunks(_score_chunk, chunks, workers, lexicon)
+
+
+# Built-in demonstration dictionaries; real glossaries are loaded from files
+TRANSLATIONS = {
+    "es": {
+        "hello": "hola",
+        "world": "mundo",
+        "goodbye": "adiós",
+        "thank you": "gracias",
+        "yes": "sí",
+        "no": "no"
+    },
+    "fr": {
+        "hello": "bonjour",
+        "world": "monde",
+        "goodbye": "au revoir",
+        "thank you": "merci",
+        "yes": "oui",
+        "no": "non"
+    },
+    "de": {
+        "hello": "hallo",
+        "world": "welt",
+        "goodbye": "auf wiedersehen",
+        "thank you": "danke",
+        "yes": "ja",
+        "no": "nein"
     }
+}
+
+_WORD_PATTERN = re.compile(r"\w+")
+_WHITESPACE_PATTERN = re.compile(r"\s+")
+
+
+def _normalize_phrase(phrase: str) -> str:
+    return _WHITESPACE_PATTERN.sub(" ", phrase.lower()).strip()
+
+
+class Glossary:
+    """
+    Phrase table translated in a single left-to-right pass over the words of a text.
+
+    Phrases are kept in one dict, plus the set of their proper word prefixes
+    (a flattened trie). At each word the match is extended only while the
+    words so far are a prefix of some phrase, and the longest phrase found
+    wins, so the cost is linear in the text however large the glossary is.
+    """
 
+    def __init__(self, entries: Dict[str, str]):
+        """
+        Args:
+            entries: Source phrase -> translation (matched case-insensitively, whole words only)
+        """
+        self.entries: Dict[str, str] = {}
+        self.prefixes = set()
+        for source, target in entries.items():
+            phrase = _normalize_phrase(source)
+            if not _WORD_PATTERN.search(phrase):
+                continue
+            self.entries[phrase] = target
+            word_ends = [match.end() for match in _WORD_PATTERN.finditer(phrase)]
+            self.prefixes.update(phrase[:end] for end in word_ends[:-1])
 
-def translate(text: str, target_language: str = "es") -> str:
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    @classmethod
+    def load(cls, path: str) -> "Glossary":
+        """
+        Load a glossary file.
+        
+        Args:
+            path: A JSON object of source -> translation, or a text file with one
+                  "source<TAB>translation" per line; "#" lines are comments
+                  
+        Returns:
+            The glossary
+        """
+        with open(path, "r", encoding="utf-8") as f:
+            if path.endswith(".json"):
+                return cls(json.load(f))
+            entries = {}
+            for line in f:
+                line = line.rstrip("\n")
+                if not line.strip() or line.lstrip().startswith("#"):
+                    continue
+                source, separator, target = line.partition("\t")
+                if not separator:
+                    raise ValueError(f"Expected 'source<TAB>translation', got {line!r}")
+                entries[source] = target.strip()
+            return cls(entries)
+
+    def translate(self, text: str) -> str:
+        """
+        Replace every glossary phrase in the text, longest match first.
+        
+        Args:
+            text: The text to translate (matching is on its lowercased form)
+            
+        Returns:
+            The lowercased text with glossary phrases replaced; replacements are never rescanned
+        """
+        text = text.lower()
+        words = [(match.start(), match.end()) for match in _WORD_PATTERN.finditer(text)]
+        pieces = []
+        copied_to = 0
+        i = 0
+        while i < len(words):
+            start, end = words[i]
+            key = text[start:end]
+            best = None
+            j = i
+            while True:
+                if key in self.entries:
+                    best = (j, self.entries[key])
+                if key not in self.prefixes or j + 1 == len(words):
+                    break
+                # Words of a phrase may be separated by any whitespace in the text
+                gap = _WHITESPACE_PATTERN.sub(" ", text[words[j][1]:words[j + 1][0]])
+                j += 1
+                key = f"{key}{gap}{text[words[j][0]:words[j][1]]}"
+
+            if best is None:
+                i += 1
+                continue
+            last, target = best
+            pieces.append(text[copied_to:start])
+            pieces.append(target)
+            copied_to = words[last][1]
+            i = last + 1
+
+        pieces.append(text[copied_to:])
+        return "".join(pieces)
+
+
+# Loaded tables stay cached for the process; worker processes forked after a
+# table is loaded share the parent's copy instead of loading their own
+_BUILTIN_GLOSSARIES = {language: Glossary(entries) for language, entries in TRANSLATIONS.items()}
+
+
+@lru_cache(maxsize=8)
+def _load_glossary(path: str, mtime_ns: int) -> Glossary:
+    return Glossary.load(path)
+
+
+def get_glossary(target_language: str = "es", glossary: Optional[str] = None) -> Optional[Glossary]:
+    """
+    The glossary from a file (cached until the file changes), or the built-in one for a language.
+    
+    Args:
+        target_language: Language code of a built-in dictionary
+        glossary: Path of a glossary file, which takes precedence over the language
+        
+    Returns:
+        The glossary, or None if the language has no built-in dictionary
+    """
+    if glossary is not None:
+        return _load_glossary(glossary, os.stat(glossary).st_mtime_ns)
+    return _BUILTIN_GLOSSARIES.get(target_language)
+
+
+def translate(text: str, target_language: str = "es", glossary: Optional[str] = None) -> str:
     """
     Translate text to the target language.
     
     Args:
         text: The text to translate
         target_language: Language code to translate to (default: Spanish)
+        glossary: Path of a glossary file to translate with instead of the built-in dictionary
         
     Returns:
         Translated text
     """
     # In a real implementation, you would use a translation API
-    # This is a placeholder with some basic translations for demonstration
-    
-    translations = {
-        "es": {
-            "hello": "hola",
-            "world": "mundo",
-            "goodbye": "adiós",
-            "thank you": "gracias",
-            "yes": "sí",
-            "no": "no"
-        },
-        "fr": {
-            "hello": "bonjour",
-            "world": "monde",
-            "goodbye": "au revoir",
-            "thank you": "merci",
-            "yes": "oui",
-            "no": "non"
-        },
-        "de": {
-            "hello": "hallo",
-            "world": "welt",
-            "goodbye": "auf wiedersehen",
-            "thank you": "danke",
-            "yes": "ja",
-            "no": "nein"
-        }
-    }
-    
-    if target_language not in translations:
-        return f"Error: Unsupported target language '{target_language}'. Supported languages: {', '.join(translations.keys())}"
+    # This is a glossary lookup for demonstration
+    if glossary is not None:
+        glossary = resolve_path(glossary)
+        if glossary is None:
+            return "Error: Access to files outside the working directory is not allowed"
+    try:
+        table = get_glossary(target_language, glossary)
+    except (OSError, ValueError) as e:
+        return f"Error loading glossary: {str(e)}"
+    if table is None:
+        return f"Error: Unsupported target language '{target_language}'. Supported languages: {', '.join(TRANSLATIONS.keys())}"
     
-    # Very basic word-by-word replacement
-    result = text.lower()
-    for eng, translated in translations[target_language].items():
-        result = re.sub(r'\b' + re.escape(eng) + r'\b', translated, result)
+    return table.translate(text) + f" [Note: This is a simplified translation to {target_language}]"
+
+
+def _translate_chunk(texts: List[str], target_language: str, glossary: Optional[str]) -> List[str]:
+    # Workers receive the glossary's path, not the table, and load it at most once each
+    table = get_glossary(target_language, glossary)
+    return [table.translate(text) for text in texts]
+
+
+def translate_batch(texts: Iterable[str], target_language: str = "es", glossary: Optional[str] = None,
+                    workers: Optional[int] = 1, chunk_size: int = BATCH_CHUNK_SIZE) -> Iterator[str]:
+    """
+    Translate many texts with one glossary, streaming results in input order.
     
-    return result + f" [Note: This is a simplified translation to {target_language}]"
+    Args:
+        texts: Iterable of texts
+        target_language: Language code of a built-in dictionary
+        glossary: Path of a glossary file (takes precedence over the language)
+        workers: Worker processes (1 runs in this process; None for one per CPU)
+        chunk_size: Texts handed to a worker at a time
+        
+    Yields:
+        Each translated text, without the note translate() appends
+    """
+    # Load (and validate) in this process first, so forked workers inherit the table
+    if get_glossary(target_language, glossary) is None:
+        raise ValueError(f"Unsupported target language '{target_language}'")
+    yield from _map_chunks(_translate_chunk, _chunks(texts, max(1, chunk_size)), workers,
+                           target_language, glossary)
 
 
 # Example of how to integrate this module in main.py:
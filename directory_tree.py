@@ -1,81 +1,446 @@
 import os
 import sys
+import re
+import json
+import heapq
+import fnmatch
 import argparse
+from concurrent.futures import ThreadPoolExecutor
 
-def get_directory_structure(path, prefix="", is_last=False, ignore_hidden=True):
+SNAPSHOT_VERSION = 1
+
+
+def _file_stat(stat):
+    return stat.st_size, stat.st_mtime_ns
+
+
+def read_directory(path, with_stat=False):
+    """
+    Read every entry of one directory.
+
+    Args:
+        path (str): Directory to read
+        with_stat (bool): Also record (size, mtime_ns) of files, at the cost of one stat each
+
+    Returns:
+        list: (name, is_dir) tuples in directory order, extended with (size, mtime_ns)
+              for files when with_stat is set; symlinks are never treated as directories
+    """
+    entries = []
+    with os.scandir(path) as it:
+        for entry in it:
+            try:
+                # Symlinked directories are not followed, so links cannot create cycles
+                is_dir = entry.is_dir(follow_symlinks=False)
+            except OSError:
+                is_dir = False
+            if with_stat and not is_dir:
+                try:
+                    entries.append((entry.name, False) + _file_stat(entry.stat(follow_symlinks=False)))
+                    continue
+                except OSError:
+                    pass
+            entries.append((entry.name, is_dir))
+    return entries
+
+
+def _restat(path, entries):
+    """Refresh the file stats of a cached listing (its directory is unchanged, but files may have been edited)"""
+    refreshed = []
+    for entry in entries:
+        name, is_dir = entry[0], entry[1]
+        if not is_dir:
+            try:
+                refreshed.append((name, False) + _file_stat(os.stat(os.path.join(path, name), follow_symlinks=False)))
+                continue
+            except OSError:
+                pass
+        refreshed.append((name, is_dir))
+    return refreshed
+
+
+class TreeSnapshot:
+    """
+    Cached directory listings keyed by root-relative path, validated by directory mtime.
+
+    Adding, removing or renaming an entry updates its directory's mtime, so a
+    directory whose mtime is unchanged can reuse its cached listing and only
+    costs one stat instead of a full read.
+    """
+
+    def __init__(self, root, directories=None, track_files=False):
+        """
+        Args:
+            root (str): Absolute path of the tree the listings belong to
+            directories (dict): Relative path -> (mtime_ns, [(name, is_dir[, size, mtime_ns]), ...])
+                from an earlier walk
+            track_files (bool): Record file sizes and mtimes so edited files can be reported;
+                costs one stat per file even in unchanged directories
+        """
+        self.root = root
+        self.directories = directories or {}
+        self.track_files = track_files
+        self.current = {}
+        self.reused = 0
+        self.rescanned = 0
+
+    @classmethod
+    def load(cls, snapshot_path, root, track_files=False):
+        """
+        Load a snapshot file, starting empty if it is missing, unreadable or for another root.
+
+        Args:
+            snapshot_path (str): Snapshot file written by save()
+            root (str): Tree about to be walked
+            track_files (bool): Record file sizes and mtimes (see __init__)
+
+        Returns:
+            TreeSnapshot: Snapshot for root
+        """
+        root = os.path.abspath(root)
+        try:
+            with open(snapshot_path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return cls(root, track_files=track_files)
+        if data.get("version") != SNAPSHOT_VERSION or data.get("root") != root:
+            return cls(root, track_files=track_files)
+        directories = {key: (mtime_ns, [tuple(entry) for entry in entries])
+                       for key, (mtime_ns, entries) in data.get("directories", {}).items()}
+        return cls(root, directories, track_files)
+
+    def save(self, snapshot_path):
+        """Write the listings seen in the last walk, atomically"""
+        data = {
+            "version": SNAPSHOT_VERSION,
+            "root": self.root,
+            "directories": {key: [mtime_ns, entries] for key, (mtime_ns, entries) in self.directories.items()}
+        }
+        temp_path = f"{snapshot_path}.tmp"
+        with open(temp_path, "w", encoding="utf-8") as f:
+            json.dump(data, f, separators=(",", ":"))
+        os.replace(temp_path, snapshot_path)
+
+    def entries(self, path):
+        """
+        Listing of a directory, read from disk only if its mtime changed since the snapshot.
+
+        Args:
+            path (str): Absolute directory path under the root
+
+        Returns:
+            list: Entries as returned by read_directory
+        """
+        key = _relative(path, self.root)
+        # Stat before reading, so a change made during the read shows up on the next walk
+        mtime_ns = os.stat(path).st_mtime_ns
+        cached = self.directories.get(key)
+        if cached is not None and cached[0] == mtime_ns:
+            self.reused += 1
+            entries = _restat(path, cached[1]) if self.track_files else cached[1]
+        else:
+            self.rescanned += 1
+            entries = read_directory(path, with_stat=self.track_files)
+        self.current[key] = (mtime_ns, entries)
+        return entries
+
+    def commit(self, complete=True):
+        """
+        Make the listings seen in this walk the snapshot.
+
+        Args:
+            complete (bool): Whether the walk finished; an interrupted walk only adds to the old listings
+        """
+        if complete:
+            self.directories = self.current
+        else:
+            self.directories.update(self.current)
+        self.current = {}
+
+
+def _relative(path, root):
+    relative = os.path.relpath(path, root)
+    return "" if relative == "." else relative.replace(os.sep, "/")
+
+
+def _join(key, name):
+    return f"{key}/{name}" if key else name
+
+
+class TreeWalker:
+    """
+    Iterative, streaming directory tree walker built on os.scandir.
+
+    Lines are produced while the walk is in progress, and memory holds only the
+    listings of the directories on the current path (plus a bounded number of
+    prefetched sibling listings when workers > 1), so it stays flat on huge trees.
+    With a TreeSnapshot, unchanged directories are served from the snapshot.
+    """
+
+    def __init__(self, ignore_hidden=True, max_depth=None, exclude=(), max_entries=None, workers=1,
+                 snapshot=None):
+        """
+        Args:
+            ignore_hidden (bool): Whether to ignore hidden files/folders (starting with .)
+            max_depth (int): Deepest level to list (1 lists only the root's entries; None for no limit)
+            exclude (iterable): Glob patterns matched against entry names and root-relative paths
+            max_entries (int): Maximum entries shown per directory (None for no limit)
+            workers (int): Threads used to prefetch sibling directory listings (1 walks serially)
+            snapshot (TreeSnapshot): Cached listings to reuse and refresh (None reads every directory)
+        """
+        self.ignore_hidden = ignore_hidden
+        self.max_depth = max_depth
+        self.max_entries = max_entries
+        self.workers = max(1, workers)
+        self.snapshot = snapshot
+        patterns = list(exclude)
+        self._exclude = re.compile("|".join(fnmatch.translate(p) for p in patterns)) if patterns else None
+        self._root = None
+        self._pool = None
+        self._pending = {}
+
+    def _visible(self, name, relative):
+        if self.ignore_hidden and name.startswith('.'):
+            return False
+        if self._exclude is None:
+            return True
+        return not (self._exclude.match(name) or self._exclude.match(relative))
+
+    def _scan(self, path):
+        """
+        Read one directory.
+
+        Returns:
+            tuple: (entries sorted directories first as (is_file, name, path), number of entries left out)
+        """
+        if self.snapshot is not None:
+            entries = self.snapshot.entries(path)
+        else:
+            entries = read_directory(path)
+
+        key = _relative(path, self._root)
+        visible = [(not is_dir, name, os.path.join(path, name))
+                   for name, is_dir, *_ in entries if self._visible(name, _join(key, name))]
+        if self.max_entries is None or len(visible) <= self.max_entries:
+            listing = sorted(visible)
+        else:
+            # Keep only the first max_entries in sort order instead of sorting the whole directory
+            listing = heapq.nsmallest(self.max_entries, visible)
+        return listing, len(visible) - len(listing)
+
+    def _listing(self, path):
+        future = self._pending.pop(path, None)
+        if future is not None:
+            return future.result()
+        return self._scan(path)
+
+    def _children(self, path, depth):
+        """Yield (label, directory to descend into or None, is_last, record) for each child of path"""
+        key = _relative(path, self._root)
+        try:
+            listing, omitted = self._listing(path)
+        except PermissionError:
+            yield "[Permission Denied]", None, True, {"path": key, "type": "error", "error": "Permission denied"}
+            return
+        except OSError as e:
+            yield f"[Error: {str(e)}]", None, True, {"path": key, "type": "error", "error": str(e)}
+            return
+
+        descend = self.max_depth is None or depth < self.max_depth
+        if descend and self._pool is not None:
+            # Prefetch upcoming sibling subtrees while this one is being printed
+            for is_file, _, child in listing:
+                if len(self._pending) >= self.workers * 8:
+                    break
+                if not is_file and child not in self._pending:
+                    self._pending[child] = self._pool.submit(self._scan, child)
+
+        for i, (is_file, name, child) in enumerate(listing):
+            is_last = i == len(listing) - 1 and not omitted
+            record = {"path": _join(key, name), "type": "file" if is_file else "dir", "depth": depth}
+            if is_file:
+                yield name, None, is_last, record
+            else:
+                yield f"{name}/", child if descend else None, is_last, record
+        if omitted:
+            yield (f"... ({omitted} more entries)", None, True,
+                   {"path": key, "type": "omitted", "count": omitted, "depth": depth})
+
+    def _walk(self, path, prefix="", is_last=False):
+        """Yield (line, record) pairs for the tree, the root first"""
+        if not os.path.exists(path):
+            yield f"Error: Path '{path}' does not exist.", {"path": path, "type": "error", "error": "Path does not exist"}
+            return
+
+        self._root = os.path.abspath(path)
+        root_label = f"{os.path.basename(self._root.rstrip(os.sep)) or self._root}/"
+        if prefix:
+            # Rendered as an entry of an enclosing tree that the caller is drawing
+            yield f"{prefix}{'└── ' if is_last else '├── '}{root_label}", {"path": "", "type": "dir", "depth": 0}
+            prefix = f"{prefix}{'    ' if is_last else '│   '}"
+        else:
+            yield root_label, {"path": "", "type": "dir", "depth": 0}
+        if self.max_depth is not None and self.max_depth < 1:
+            return
+
+        if self.workers > 1:
+            self._pool = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="tree")
+        complete = False
+        try:
+            stack = [(self._children(self._root, 1), prefix, 1)]
+            while stack:
+                children, prefix, depth = stack[-1]
+                child = next(children, None)
+                if child is None:
+                    stack.pop()
+                    continue
+                label, directory, is_last, record = child
+                yield f"{prefix}{'└── ' if is_last else '├── '}{label}", record
+                if directory is not None:
+                    stack.append((self._children(directory, depth + 1),
+                                  f"{prefix}{'    ' if is_last else '│   '}", depth + 1))
+            complete = True
+        finally:
+            if self._pool is not None:
+                self._pool.shutdown(wait=False, cancel_futures=True)
+                self._pool = None
+            self._pending.clear()
+            if self.snapshot is not None:
+                self.snapshot.commit(complete)
+
+    def walk(self, path, prefix="", is_last=False):
+        """
+        Stream the directory structure one line at a time.
+
+        Args:
+            path (str): Path to the directory to visualize
+            prefix (str): Prefix for the root line when it is drawn inside an enclosing tree
+            is_last (bool): Whether the root is the last item of that enclosing tree
+
+        Yields:
+            str: Lines of the tree, without trailing newlines
+        """
+        for line, _ in self._walk(path, prefix, is_last):
+            yield line
+
+    def records(self, path):
+        """
+        Stream the directory structure as machine-readable records.
+
+        Args:
+            path (str): Path to the directory to visualize
+
+        Yields:
+            dict: {"path", "type", "depth"} per entry, with "type" one of dir, file,
+                  omitted (plus "count") or error (plus "error"); paths are root-relative with "/"
+        """
+        for _, record in self._walk(path):
+            yield record
+
+    def changes(self, previous):
+        """
+        Compare the listings seen in the last walk with an earlier snapshot.
+
+        Both snapshots should come from walks with the same options; directories
+        the last walk did not visit are not compared.
+
+        Args:
+            previous (dict): TreeSnapshot.directories from before the walk
+
+        Returns:
+            list: {"path", "type", "change"} records with change "added", "removed" or
+                  "modified" (a file whose size or mtime changed; needs track_files), sorted by path
+        """
+        current = self.snapshot.directories
+        found = []
+
+        def compare(key, before, after):
+            # (name, is_dir) -> file stats, empty when not recorded
+            before = {entry[:2]: entry[2:] for entry in before}
+            after = {entry[:2]: entry[2:] for entry in after}
+            edited = [entry for entry in before.keys() & after.keys()
+                      if before[entry] and after[entry] and before[entry] != after[entry]]
+            for change, entries in (("removed", before.keys() - after.keys()),
+                                    ("added", after.keys() - before.keys()), ("modified", edited)):
+                for name, is_dir in entries:
+                    relative = _join(key, name)
+                    if not self._visible(name, relative):
+                        continue
+                    found.append({"path": relative, "type": "dir" if is_dir else "file", "change": change})
+                    if change == "removed" and is_dir:
+                        # The walk cannot see inside a removed directory; report its old contents
+                        for old_key, (_, old_entries) in previous.items():
+                            if old_key == relative or old_key.startswith(relative + "/"):
+                                compare(old_key, old_entries, ())
+
+        for key, (_, entries) in current.items():
+            compare(key, previous.get(key, (None, ()))[1], entries)
+        # A removed directory nested in another removed directory is reached twice
+        unique = {(record["path"], record["change"]): record for record in found}
+        return sorted(unique.values(), key=lambda record: (record["path"], record["change"]))
+
+
+def iter_directory_structure(path, prefix="", is_last=False, ignore_hidden=True, *,
+                             max_depth=None, exclude=(), max_entries=None, workers=1):
+    """
+    Stream a visual directory structure tree starting from the given path.
+
+    Args:
+        path (str): Path to the directory to visualize
+        prefix (str): Prefix for the root line when it is drawn inside an enclosing tree
+        is_last (bool): Whether the root is the last item of that enclosing tree
+        ignore_hidden (bool): Whether to ignore hidden files/folders (starting with .)
+        max_depth (int): Deepest level to list (None for no limit)
+        exclude (iterable): Glob patterns for entries to leave out
+        max_entries (int): Maximum entries shown per directory (None for no limit)
+        workers (int): Threads used to read sibling directories in parallel
+
+    Yields:
+        str: Lines of the tree, without trailing newlines
+    """
+    walker = TreeWalker(ignore_hidden=ignore_hidden, max_depth=max_depth, exclude=exclude,
+                        max_entries=max_entries, workers=workers)
+    return walker.walk(path, prefix, is_last)
+
+
+def get_directory_structure(path, prefix="", is_last=False, ignore_hidden=True, *,
+                            max_depth=None, exclude=(), max_entries=None, workers=1):
     """
     Generate a visual directory structure tree starting from the given path.
-    
+
     Args:
         path (str): Path to the directory to visualize
-        prefix (str): Prefix for the current line (used for recursion)
-        is_last (bool): Whether this is the last item in its parent directory
+        prefix (str): Prefix for the root line when it is drawn inside an enclosing tree
+        is_last (bool): Whether the root is the last item of that enclosing tree
         ignore_hidden (bool): Whether to ignore hidden files/folders (starting with .)
-        
+        max_depth (int): Deepest level to list (None for no limit)
+        exclude (iterable): Glob patterns for entries to leave out
+        max_entries (int): Maximum entries shown per directory (None for no limit)
+        workers (int): Threads used to read sibling directories in parallel
+
     Returns:
         str: Formatted string representation of the directory structure
     """
-    if not os.path.exists(path):
-        return f"Error: Path '{path}' does not exist."
-    
-    # Get the base directory name for the root level
-    base_name = os.path.basename(path.rstrip(os.sep))
-    
-    # Start with the root directory name
-    if prefix == "":
-        result = f"{base_name}/\n"
-        new_prefix = "│\n"
+    lines = iter_directory_structure(path, prefix, is_last, ignore_hidden, max_depth=max_depth,
+                                     exclude=exclude, max_entries=max_entries, workers=workers)
+    return "".join(f"{line}\n" for line in lines)
+
+
+def _render(items, output_format):
+    """Yield output chunks for pre-rendered text lines, or records as json or ndjson"""
+    if output_format == "ndjson":
+        for record in items:
+            yield json.dumps(record, ensure_ascii=False) + "\n"
+    elif output_format == "json":
+        # Written as it streams, but the whole output is still one valid JSON array
+        yield "["
+        for i, record in enumerate(items):
+            yield ("," if i else "") + "\n  " + json.dumps(record, ensure_ascii=False)
+        yield "\n]\n"
     else:
-        # For recursive calls, use the provided prefix
-        connector = "└── " if is_last else "├── "
-        result = f"{prefix}{connector}{base_name}/\n"
-        new_prefix = f"{prefix}{'    ' if is_last else '│   '}"
-        
-    # Get all items in the directory
-    try:
-        items = os.listdir(path)
-        # Sort items: directories first, then files
-        dirs = []
-        files = []
-        
-        for item in items:
-            if ignore_hidden and item.startswith('.'):
-                continue
-                
-            full_path = os.path.join(path, item)
-            if os.path.isdir(full_path):
-                dirs.append(item)
-            else:
-                files.append(item)
-                
-        dirs.sort()
-        files.sort()
-        all_items = dirs + files
-        
-        # Process each item
-        for i, item in enumerate(all_items):
-            full_path = os.path.join(path, item)
-            is_current_last = (i == len(all_items) - 1)
-            
-            if os.path.isdir(full_path):
-                # Recursively process directories
-                result += get_directory_structure(
-                    full_path, 
-                    new_prefix, 
-                    is_current_last,
-                    ignore_hidden
-                )
-            else:
-                # Add files
-                connector = "└── " if is_current_last else "├── "
-                result += f"{new_prefix}{connector}{item}\n"
-                
-        return result
-        
-    except PermissionError:
-        return f"{new_prefix}├── [Permission Denied]\n"
-    except Exception as e:
-        return f"{new_prefix}├── [Error: {str(e)}]\n"
+        for line in items:
+            yield line + "\n"
+
 
 def main():
     # Set up command line arguments
@@ -84,19 +449,63 @@ def main():
                       help='Path to the directory (defaults to current directory)')
     parser.add_argument('--show-hidden', action='store_true',
                       help='Show hidden files and directories')
-    
+    parser.add_argument('--max-depth', type=int, default=None,
+                      help='Only descend this many levels below the root')
+    parser.add_argument('--exclude', action='append', default=[], metavar='GLOB',
+                      help='Leave out entries whose name or relative path matches (repeatable)')
+    parser.add_argument('--max-entries', type=int, default=None,
+                      help='Show at most this many entries per directory')
+    parser.add_argument('--workers', type=int, default=1,
+                      help='Threads used to read sibling directories in parallel (helps on cold caches and network filesystems)')
+    parser.add_argument('--format', choices=['text', 'json', 'ndjson'], default='text',
+                      help='Output format (json and ndjson emit one record per entry)')
+    parser.add_argument('--snapshot', metavar='FILE',
+                      help='Reuse listings of unchanged directories from FILE and update it afterwards')
+    parser.add_argument('--changes', action='store_true',
+                      help='Print only entries added, removed or modified since the snapshot (requires --snapshot)')
+
     args = parser.parse_args()
-    
-    # Generate and print directory structure
-    structure = get_directory_structure(
-        args.path, 
-        prefix="", 
-        is_last=False, 
-        ignore_hidden=not args.show_hidden
+    if args.changes and not args.snapshot:
+        parser.error('--changes requires --snapshot')
+
+    # Reporting edited files needs their stats, which plain tree dumps skip
+    snapshot = TreeSnapshot.load(args.snapshot, args.path, track_files=args.changes) if args.snapshot else None
+    previous = dict(snapshot.directories) if snapshot is not None else {}
+    walker = TreeWalker(
+        ignore_hidden=not args.show_hidden,
+        max_depth=args.max_depth,
+        exclude=args.exclude,
+        max_entries=args.max_entries,
+        workers=args.workers,
+        snapshot=snapshot
     )
-    
-    print(structure)
+
+    if args.changes:
+        for _ in walker.records(args.path):
+            pass
+        changes = walker.changes(previous)
+        if args.format == 'text':
+            signs = {"added": "+", "removed": "-", "modified": "~"}
+            changes = [f"{signs[c['change']]} {c['path']}{'/' if c['type'] == 'dir' else ''}" for c in changes]
+        output = _render(changes, args.format)
+    elif args.format == 'text':
+        # Stream the directory structure as it is walked
+        output = _render(walker.walk(args.path), 'text')
+    else:
+        output = _render(walker.records(args.path), args.format)
+
+    try:
+        for chunk in output:
+            sys.stdout.write(chunk)
+        sys.stdout.flush()
+    except BrokenPipeError:
+        # The reader (e.g. head) went away; stop quietly without a flush error at exit
+        devnull = os.open(os.devnull, os.O_WRONLY)
+        os.dup2(devnull, sys.stdout.fileno())
+        sys.exit(1)
+
+    if snapshot is not None:
+        snapshot.save(args.snapshot)
 
 if __name__ == "__main__":
     main()
-    
\ No newline at end of file